@@ -0,0 +1,7 @@
+"""
+Benchmarki wydajności symulacji i wizualizacji.
+
+Uruchomienie (wyniki zapisywane do JSON, żeby porównywać commity):
+    python -m benchmarks.run
+    python -m benchmarks.run --cases rain168_agents synthetic_1000_vectorized --compare benchmarks/results/abc123.json
+"""
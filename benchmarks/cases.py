@@ -0,0 +1,254 @@
+"""
+Przypadki benchmarków. Każdy przypadek to funkcja case(timer) -> liczba jednostek pracy
+(godzin symulacji albo klatek), która mierzy swoje fazy przez timer.phase("nazwa").
+"""
+import glob
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+
+from model.batch import run_batch_files
+from model.model import SewerSystemModel
+from model.rain import load_rain_file
+
+from .networks import generate_network, synthetic_graph
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+RAIN_FILE = os.path.join(PROJECT_ROOT, "data", "rain.csv")
+EXPERIMENTS_DIR = os.path.join(PROJECT_ROOT, "data", "rain_experiments")
+LONG_RAIN_FILE = os.path.join(PROJECT_ROOT, "data", "opady_godzinowe.csv")
+MAP_IMAGE = os.path.join(PROJECT_ROOT, "visualisation", "map.png")
+DEBUG_OUTPUT = os.path.join(PROJECT_ROOT, "data", "debug_output.csv")
+
+
+class SkipCase(Exception):
+    """Przypadku nie da się uruchomić w tym środowisku (brak pliku / pakietu)."""
+
+
+# === POMIAR FAZ ===
+class PhaseTimer:
+    """Sumuje czas ścienny i liczbę wywołań nazwanych faz."""
+
+    def __init__(self):
+        self.seconds = {}
+        self.calls = {}
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - start
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+
+# ===============================================
+# Symulacja
+# ===============================================
+def run_model(timer, mode="agents", **model_kwargs):
+    """Jeden przebieg SewerSystemModel: mode = agents | vectorized | trajectory."""
+    with timer.phase("init"):
+        model = SewerSystemModel(vectorized=(mode == "vectorized"), **model_kwargs)
+    profiler = model.enable_profiling()
+    with timer.phase("simulate"):
+        if mode == "trajectory":
+            model.run_trajectory()
+        while model.running:
+            model.step()
+    with timer.phase("results"):
+        model.recorder.to_dataframe()
+    # fazy kroku z model.profiling.StepProfiler jako step.<faza>
+    for phase, seconds in profiler.seconds.items():
+        timer.seconds[f"step.{phase}"] = timer.seconds.get(f"step.{phase}", 0.0) + seconds
+        timer.calls[f"step.{phase}"] = timer.calls.get(f"step.{phase}", 0) + profiler.calls[phase]
+    return model.max_hours
+
+
+def experiments_sweep(timer, mode="agents"):
+    """Wszystkie scenariusze z data/rain_experiments po kolei."""
+    hours = 0
+    for path in sorted(glob.glob(os.path.join(EXPERIMENTS_DIR, "*.csv"))):
+        hours += run_model(timer, mode=mode, rain_file=path)
+    return hours
+
+
+def experiments_batch(timer):
+    """Wszystkie scenariusze z data/rain_experiments jednym run_batch()."""
+    paths = sorted(glob.glob(os.path.join(EXPERIMENTS_DIR, "*.csv")))
+    with timer.phase("simulate"):
+        result = run_batch_files(paths)
+    with timer.phase("results"):
+        result.summary()
+    return result.total_flow.size
+
+
+def long_run(timer, mode="agents"):
+    """Cała seria pomiarowa data/opady_godzinowe.csv."""
+    with timer.phase("load_rain"):
+        hours = len(load_rain_file(LONG_RAIN_FILE))
+    return run_model(timer, mode=mode, rain_file=LONG_RAIN_FILE, max_hours=hours)
+
+
+def synthetic_network(timer, n_nodes, mode="vectorized", hours=168):
+    """Losowe drzewo n_nodes przepływomierzy, opad z data/rain.csv."""
+    with timer.phase("graph"):
+        graph = synthetic_graph(n_nodes, seed=0)
+    return run_model(timer, mode=mode, graph=graph, rain_file=RAIN_FILE, max_hours=hours)
+
+
+def dendritic_network(timer, n_nodes, mode="vectorized", hours=168):
+    """Drzewiasta sieć z generate_network (parametry i profile średnich z data/), opad z data/rain.csv."""
+    with timer.phase("graph"):
+        inputs = generate_network(n_nodes, seed=0).inputs()
+    return run_model(timer, mode=mode, inputs=inputs, rain_file=RAIN_FILE, max_hours=hours)
+
+
+# ===============================================
+# Rysowanie (offscreen, SDL_VIDEODRIVER=dummy)
+# ===============================================
+def _init_pygame(size):
+    if not os.path.exists(MAP_IMAGE):
+        raise SkipCase("brak visualisation/map.png (python -m visualisation.map_download)")
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+    try:
+        import pygame
+    except ImportError:
+        raise SkipCase("brak pakietu pygame")
+    try:
+        from visualisation import graphics_functions
+    except ImportError as e:
+        raise SkipCase(f"brak pakietu {e.name}")
+    pygame.init()
+    # czcionki z poprzedniego przypadku są nieważne po pygame.quit()
+    graphics_functions.clear_render_caches()
+    return pygame, graphics_functions, pygame.display.set_mode(size)
+
+
+def render_map(timer, frames=300, zoom=False, step_every=10):
+    """
+    Okno mapy: draw_map + draw_control_bar co klatkę, krok modelu co step_every klatek.
+    Stan trafia do okna przez SnapshotChannel, jak w run_visualisation.py.
+    zoom=True zmienia skalę mapy w każdej klatce (przeciąganie / kółko myszy).
+    """
+    pygame, gf, screen = _init_pygame((900, 650))
+    from visualisation.shared_state import DashboardView, SnapshotChannel, StateLayout
+
+    rect = pygame.Rect(12, 12, 900 - 24, 650 - 100)
+    pause_evt, stop_evt = threading.Event(), threading.Event()
+    model = SewerSystemModel(rain_file=RAIN_FILE)
+    channel = SnapshotChannel.create(StateLayout.from_model(model), sim_interval=0.5, ui_slider_val=0.5)
+    channel.publish(model)
+    shared = DashboardView(channel, local={"map_scale": 1.0, "map_offset": (0, 0)})
+
+    try:
+        for frame in range(frames):
+            if frame % step_every == 0 and model.running:
+                with timer.phase("simulate"):
+                    model.step()
+                    channel.publish(model)
+            if zoom:
+                shared["map_scale"] = 1.0 + (frame % 50) / 25.0
+            with timer.phase("frame"):
+                with timer.phase("read_state"):
+                    shared.refresh()
+                screen.fill((252, 253, 255))
+                with timer.phase("draw_map"):
+                    gf.draw_map(screen, rect, shared)
+                with timer.phase("draw_control_bar"):
+                    gf.draw_control_bar(screen, screen.get_rect(), shared, pause_evt, stop_evt, 0.05, 1.5)
+                pygame.display.flip()
+    finally:
+        channel.close()
+        pygame.quit()
+    return frames
+
+
+def render_chart(timer, frames=300, step_every=10, history_hours=600, zoom=False):
+    """
+    Okno wykresów: draw_chart z historią history_hours godzin (policzoną trajektorią),
+    nowa godzina co step_every klatek. zoom=True zmienia zakres osi czasu w każdej klatce.
+    """
+    pygame, gf, screen = _init_pygame((900, 900))
+    from visualisation.chart_data import ChartHistory, ChartView
+
+    rect = pygame.Rect(12, 12, 900 - 24, 900 - 24)
+    with timer.phase("simulate"):
+        model = SewerSystemModel(rain_file=LONG_RAIN_FILE, max_hours=history_hours + frames // step_every)
+        df = model.run_trajectory()
+    columns = [df["Hour"].to_numpy(), df["TotalFlow"].to_numpy(), df["DivertedFlow"].to_numpy(),
+               df["RainIntensity"].to_numpy(), df["RainDepth"].to_numpy()]
+    history = ChartHistory.from_arrays(*(c[:history_hours] for c in columns))
+    view = ChartView()
+
+    for frame in range(frames):
+        if frame % step_every == 0:
+            i = len(history)
+            history.append(*(c[i] for c in columns))
+        if zoom:
+            view.reset()
+            view.zoom(1.0 / (1 + frame % 20), 1.0, history.first_hour, history.last_hour)
+        with timer.phase("frame"):
+            screen.fill((252, 253, 255))
+            with timer.phase("draw_chart"):
+                gf.draw_chart(screen, rect, history, model.max_capacity, view)
+            pygame.display.flip()
+    pygame.quit()
+    return frames
+
+
+# ===============================================
+# Start programu (zimny proces Pythona)
+# ===============================================
+def startup(timer, argv, runs=5):
+    """Czas od uruchomienia `python argv...` do zakończenia procesu, runs razy."""
+    keep_output = os.path.exists(DEBUG_OUTPUT)
+    for _ in range(runs):
+        with timer.phase("startup"):
+            subprocess.run([sys.executable, *argv], cwd=PROJECT_ROOT, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    # main.py bez --output zapisuje data/debug_output.csv – nie zostawiamy go po benchmarku
+    if not keep_output and os.path.exists(DEBUG_OUTPUT):
+        os.remove(DEBUG_OUTPUT)
+    return runs
+
+
+# ===============================================
+# Rejestr przypadków: nazwa → (funkcja, jednostka, faza liczona do tempa)
+# ===============================================
+CASES = {
+    "rain168_agents": (partial(run_model, mode="agents", rain_file=RAIN_FILE), "hours", "simulate"),
+    "rain168_vectorized": (partial(run_model, mode="vectorized", rain_file=RAIN_FILE), "hours", "simulate"),
+    "rain168_trajectory": (partial(run_model, mode="trajectory", rain_file=RAIN_FILE), "hours", "simulate"),
+    "experiments_sweep_agents": (partial(experiments_sweep, mode="agents"), "hours", "simulate"),
+    "experiments_sweep_vectorized": (partial(experiments_sweep, mode="vectorized"), "hours", "simulate"),
+    "experiments_batch": (experiments_batch, "hours", "simulate"),
+    "long_opady_agents": (partial(long_run, mode="agents"), "hours", "simulate"),
+    "long_opady_trajectory": (partial(long_run, mode="trajectory"), "hours", "simulate"),
+    "render_map": (render_map, "frames", "frame"),
+    "render_map_zoom": (partial(render_map, zoom=True), "frames", "frame"),
+    "render_chart": (render_chart, "frames", "frame"),
+    "render_chart_year": (partial(render_chart, history_hours=8760), "frames", "frame"),
+    "render_chart_year_zoom": (partial(render_chart, history_hours=8760, zoom=True), "frames", "frame"),
+    "startup_main": (partial(startup, argv=["main.py", "--quiet", "--max_hours", "1"]), "runs", "startup"),
+    "startup_import_graphics": (
+        partial(startup, argv=["-c", "import visualisation.graphics_functions"]), "runs", "startup"
+    ),
+    "startup_import_dashboard": (partial(startup, argv=["-c", "import run_visualisation"]), "runs", "startup"),
+}
+for _n in (100, 1000, 10000):
+    CASES[f"synthetic_{_n}_agents"] = (partial(synthetic_network, n_nodes=_n, mode="agents"), "hours", "simulate")
+    CASES[f"synthetic_{_n}_vectorized"] = (
+        partial(synthetic_network, n_nodes=_n, mode="vectorized"), "hours", "simulate"
+    )
+for _n in (1000, 10000, 100000):
+    if _n <= 10000:
+        CASES[f"dendritic_{_n}_agents"] = (partial(dendritic_network, n_nodes=_n, mode="agents"), "hours", "simulate")
+    CASES[f"dendritic_{_n}_vectorized"] = (
+        partial(dendritic_network, n_nodes=_n, mode="vectorized"), "hours", "simulate"
+    )
@@ -0,0 +1,236 @@
+"""
+Syntetyczne sieci do benchmarków i testów skalowania.
+
+    python -m benchmarks.networks --nodes 10000 --seed 0 --out_dir data/synthetic_10k
+    python main.py --data_dir data/synthetic_10k --quiet
+"""
+import argparse
+import csv
+import math
+import os
+from collections import deque
+
+import numpy as np
+
+PLANT_ID = "Oczyszczalnia"
+OVERFLOW_ID = "KP26"
+# okolice oczyszczalni, gdy w danych nie ma jej współrzędnych
+PLANT_LOCATION = (49.682, 19.213)
+
+
+# === SYNTETYCZNE SIECI DO BENCHMARKÓW ===
+def synthetic_graph(n_nodes, seed=0):
+    """
+    Losowe drzewo przepływomierzy (upstream → downstream) spływające do oczyszczalni.
+    Węzeł i odprowadza ścieki do losowego węzła o mniejszym numerze, więc graf jest
+    acykliczny, a jego głębokość rośnie logarytmicznie z liczbą węzłów.
+    """
+    rng = np.random.default_rng(seed)
+    names = [f"S{i:05d}" for i in range(n_nodes)]
+    graph = {names[0]: ["Oczyszczalnia"]}
+    for i in range(1, n_nodes):
+        graph[names[i]] = [names[int(rng.integers(0, i))]]
+    return graph
+
+
+# ===============================================
+# Drzewiaste sieci z parametrami i średnimi przepływami
+# ===============================================
+class SyntheticNetwork:
+    """
+    Wygenerowana sieć w formacie wejściowym modelu:
+      - nodes      – wiersze network.csv: (ID, typ, [następcy], {parametr: wartość albo None}),
+      - coords     – {ID: {"lat": ..., "lon": ...}} jak wspolrzedne.csv,
+      - sensor_ids – przepływomierze w kolejności kolumn mean_table,
+      - mean_table – średnie przepływy (12 miesięcy, 24 godziny, przepływomierz) jak mean_flows.csv.
+    """
+
+    def __init__(self, key, nodes, coords, sensor_ids, mean_table):
+        self.key = key
+        self.nodes = nodes
+        self.coords = coords
+        self.sensor_ids = sensor_ids
+        self.mean_table = mean_table
+
+    def __len__(self):
+        return len(self.sensor_ids)
+
+    def compile(self):
+        from model.network import compile_nodes
+        return compile_nodes(self.nodes, self.key)
+
+    def hourly_means(self):
+        """Tabela mean_flows.csv jako DataFrame (kolumny month, hour, przepływomierze)."""
+        import pandas as pd
+        months, hours = np.meshgrid(np.arange(1, 13), np.arange(24), indexing="ij")
+        head = pd.DataFrame({"month": months.ravel(), "hour": hours.ravel()}).astype("Int64")
+        values = pd.DataFrame(self.mean_table.reshape(12 * 24, -1), columns=self.sensor_ids)
+        return pd.concat([head, values], axis=1)
+
+    def inputs(self):
+        """ModelInputs bez plików: SewerSystemModel(inputs=net.inputs())."""
+        from model.inputs import ModelInputs
+        return ModelInputs(self.coords, None, None, self.hourly_means(), network=self.compile())
+
+    def write(self, data_dir):
+        """Zapisuje network.csv, mean_flows.csv i wspolrzedne.csv (do load_inputs(data_dir))."""
+        from model.network import PARAMS
+        os.makedirs(data_dir, exist_ok=True)
+        with open(os.path.join(data_dir, "network.csv"), "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["id", "type", "downstream", *PARAMS])
+            for nid, kind, downstream, values in self.nodes:
+                writer.writerow([nid, kind, ";".join(downstream),
+                                 *("" if values.get(p) is None else f"{values[p]:.4g}" for p in PARAMS)])
+        with open(os.path.join(data_dir, "wspolrzedne.csv"), "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["ID", "lat", "lon"])
+            for nid, loc in self.coords.items():
+                writer.writerow([nid, f"{loc['lat']:.6f}", f"{loc['lon']:.6f}"])
+        self.hourly_means().to_csv(os.path.join(data_dir, "mean_flows.csv"), index=False, float_format="%.3f")
+
+
+def _reference_profiles(data_dir):
+    """
+    Wzorce z prawdziwej sieci: kształty lokalnych średnich przepływów (12, 24, k) znormalizowane
+    do średniej 1, lokalny przepływ na km² oraz powierzchnie i współczynniki uszczelnienia węzłów.
+    """
+    from model.inputs import load_inputs
+    from model.model import SewerSystemModel
+
+    model = SewerSystemModel(rain_intensity=[], inputs=load_inputs(data_dir))
+    local = model.local_mean_flow_table.copy()
+    # miesiące bez pomiarów w mean_flows.csv dostają średni profil dobowy pozostałych miesięcy
+    missing = np.isnan(local)
+    local[missing] = np.broadcast_to(np.nanmean(local, axis=0), local.shape)[missing]
+    areas = np.array([model.sensors[sid].area for sid in model.sensor_ids])
+    impervious = np.array([model.sensors[sid].impervious_factor for sid in model.sensor_ids])
+    level = local.mean(axis=(0, 1))
+    used = level > 0
+    shapes = local[..., used] / level[used]
+    flow_per_km2 = level.sum() / areas.sum()
+    plant = model.coords.get(model.plant_id)
+    plant_location = (plant["lat"], plant["lon"]) if plant else PLANT_LOCATION
+    return shapes, flow_per_km2, areas, impervious, plant_location
+
+
+def _dendritic_tree(n_nodes, branching, max_depth, rng):
+    """
+    Rodzic każdego węzła (-1 dla kolektora przy oczyszczalni) i głębokość. Drzewo rośnie od ujścia
+    w górę sieci (BFS): węzeł dostaje Poisson(branching) dopływów, powyżej max_depth już żadnych.
+    Gdy wszystkie gałęzie wygasną za wcześnie, wzrost wraca do losowego płytszego węzła.
+    """
+    parent = np.full(n_nodes, -1, dtype=np.int64)
+    depth = np.zeros(n_nodes, dtype=np.int64)
+    queue = deque([0])
+    count = 1
+    while count < n_nodes:
+        if queue:
+            node = queue.popleft()
+            children = int(rng.poisson(branching))
+        else:
+            shallow = np.flatnonzero(depth[:count] < max_depth)
+            node = int(shallow[rng.integers(len(shallow))])
+            children = 1
+        if depth[node] >= max_depth:
+            continue
+        children = min(children, n_nodes - count)
+        parent[count:count + children] = node
+        depth[count:count + children] = depth[node] + 1
+        queue.extend(range(count, count + children))
+        count += children
+    return parent, depth
+
+
+def generate_network(n_nodes, seed=0, branching=1.5, max_depth=None, n_diversions=2,
+                     flow_scale=1.0, data_dir="data"):
+    """
+    Drzewiasta sieć n_nodes przepływomierzy odprowadzających do jednej oczyszczalni, deterministyczna dla seed.
+      - branching    – średnia liczba dopływów węzła (rozkład Poissona),
+      - max_depth    – największa głębokość drzewa (kolektor przy oczyszczalni = 0, domyślnie bez ograniczenia),
+      - n_diversions – węzły przelewowe kierujące nadmiar na wspólny przelew (wybierane spośród
+                       węzłów z największą zlewnią, jak KP16 / KP25 w sieci rzeczywistej),
+      - flow_scale   – mnożnik średnich przepływów.
+    Powierzchnie i uszczelnienie losowane są wokół wartości z data_dir, a średnie przepływy
+    (miesiąc × godzina) to przeskalowane lokalne profile prawdziwych przepływomierzy z mean_flows.csv,
+    zsumowane w dół sieci. Model obsługuje jedną oczyszczalnię i jeden przelew.
+    """
+    if n_nodes < 1:
+        raise ValueError("Sieć musi mieć co najmniej jeden przepływomierz")
+    max_depth = n_nodes if max_depth is None else max(1, int(max_depth))
+    rng = np.random.default_rng(seed)
+    shapes, flow_per_km2, ref_areas, ref_impervious, plant_location = _reference_profiles(data_dir)
+
+    parent, depth = _dendritic_tree(n_nodes, branching, max_depth, rng)
+    width = len(str(n_nodes - 1))
+    ids = [f"S{i:0{width}d}" for i in range(n_nodes)]
+
+    # --- parametry zlewni: log-normalnie wokół prawdziwych powierzchni, uszczelnienie z jitterem ---
+    area = np.exp(rng.normal(np.log(ref_areas).mean(), np.log(ref_areas).std() or 0.5, n_nodes)).clip(0.1).round(2)
+    impervious = np.clip(rng.choice(ref_impervious, n_nodes) + rng.normal(0.0, 0.03, n_nodes), 0.05, 0.95).round(3)
+
+    # --- średnie przepływy: lokalny profil węzła + suma dopływów (od liści do ujścia) ---
+    profile = rng.integers(shapes.shape[2], size=n_nodes)
+    mean_table = shapes[..., profile] * (flow_scale * flow_per_km2 * area)
+    for i in range(n_nodes - 1, 0, -1):  # dzieci mają większe numery niż rodzice
+        mean_table[..., parent[i]] += mean_table[..., i]
+
+    # --- węzły przelewowe: największe zlewnie poza kolektorem ---
+    subtree = np.ones(n_nodes, dtype=np.int64)
+    for i in range(n_nodes - 1, 0, -1):
+        subtree[parent[i]] += subtree[i]
+    candidates = np.argsort(-subtree[1:], kind="stable")[:max(0, n_diversions)] + 1
+    diverting = set(candidates.tolist())
+
+    # --- współrzędne: gałęzie rozchodzą się od oczyszczalni, krok maleje z głębokością ---
+    lat = np.empty(n_nodes)
+    lon = np.empty(n_nodes)
+    heading = rng.uniform(0.0, 2 * math.pi, n_nodes)
+    turn = rng.uniform(-0.9, 0.9, n_nodes)
+    step = 0.004 / np.sqrt(depth + 1)
+    for i in range(n_nodes):
+        p = parent[i]
+        if p >= 0:
+            heading[i] = heading[p] + turn[i]
+        base_lat, base_lon = (lat[p], lon[p]) if p >= 0 else plant_location
+        lat[i] = base_lat + step[i] * math.sin(heading[i])
+        lon[i] = base_lon + step[i] * math.cos(heading[i]) * 1.5
+
+    nodes = []
+    for i in range(n_nodes):
+        downstream = [PLANT_ID] if parent[i] < 0 else [ids[parent[i]]]
+        if i in diverting:
+            downstream.append(OVERFLOW_ID)
+        values = dict.fromkeys(("k_sensor", "alpha", "pipe_loss"))
+        values.update(area=float(area[i]), impervious=float(impervious[i]))
+        nodes.append((ids[i], "sensor", downstream, values))
+    nodes.append((OVERFLOW_ID, "overflow", [], {}))
+    nodes.append((PLANT_ID, "plant", [], {}))
+
+    coords = {ids[i]: {"lat": float(lat[i]), "lon": float(lon[i])} for i in range(n_nodes)}
+    coords[PLANT_ID] = {"lat": plant_location[0], "lon": plant_location[1]}
+    key = f"synthetic:{n_nodes}:{seed}:{branching}:{max_depth}:{n_diversions}:{flow_scale}"
+    return SyntheticNetwork(key, nodes, coords, ids, mean_table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generator drzewiastych sieci kanalizacyjnych (format katalogu data/).")
+    parser.add_argument("--nodes", type=int, required=True, help="Liczba przepływomierzy")
+    parser.add_argument("--out_dir", type=str, required=True, help="Katalog na network.csv, mean_flows.csv, wspolrzedne.csv")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--branching", type=float, default=1.5, help="Średnia liczba dopływów węzła")
+    parser.add_argument("--max_depth", type=int, default=None, help="Największa głębokość drzewa")
+    parser.add_argument("--diversions", type=int, default=2, help="Liczba węzłów przelewowych")
+    parser.add_argument("--flow_scale", type=float, default=1.0, help="Mnożnik średnich przepływów")
+    parser.add_argument("--data_dir", type=str, default="data", help="Katalog danych wzorcowych")
+    args = parser.parse_args()
+
+    net = generate_network(args.nodes, seed=args.seed, branching=args.branching, max_depth=args.max_depth,
+                           n_diversions=args.diversions, flow_scale=args.flow_scale, data_dir=args.data_dir)
+    net.write(args.out_dir)
+    compiled = net.compile()
+    print(f"[SIEĆ] {len(net)} przepływomierzy, {compiled.n_levels} poziomów → {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
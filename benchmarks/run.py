@@ -0,0 +1,137 @@
+"""
+Uruchamia benchmarki i zapisuje wyniki do JSON.
+
+    python -m benchmarks.run                                  # wszystkie przypadki
+    python -m benchmarks.run --cases rain168_agents render_map --repeat 5
+    python -m benchmarks.run --compare benchmarks/results/abc123.json
+
+Dla każdego przypadku raportowane są: tempo (godziny symulacji albo klatki na sekundę),
+czasy faz z najlepszego powtórzenia oraz szczytowe zużycie pamięci (tracemalloc,
+osobny przebieg, żeby śledzenie alokacji nie zaburzało czasów).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from model.log import configure_logging
+
+from .cases import CASES, PROJECT_ROOT, PhaseTimer, SkipCase
+
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(name, repeat=3, memory=True):
+    """Wynik jednego przypadku (słownik gotowy do JSON) albo {"skipped": powód}."""
+    fn, unit, rate_phase = CASES[name]
+    best = None
+    try:
+        for _ in range(max(1, repeat)):
+            timer = PhaseTimer()
+            start = time.perf_counter()
+            work = fn(timer)
+            total = time.perf_counter() - start
+            if best is None or total < best[1]:
+                best = (work, total, timer)
+
+        peak = None
+        if memory:
+            tracemalloc.start()
+            try:
+                fn(PhaseTimer())
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+    except SkipCase as e:
+        return {"skipped": str(e)}
+
+    work, total, timer = best
+    rate_seconds = timer.seconds.get(rate_phase, total)
+    return {
+        "unit": unit,
+        "work": work,
+        "seconds": total,
+        "rate_per_s": work / rate_seconds if rate_seconds > 0 else None,
+        "phases": {phase: {"seconds": s, "calls": timer.calls[phase]} for phase, s in timer.seconds.items()},
+        "peak_memory_mb": peak / 2 ** 20 if peak is not None else None,
+    }
+
+
+def _print_result(name, result, baseline=None):
+    if "skipped" in result:
+        print(f"[BENCH] {name:<30} pominięty: {result['skipped']}")
+        return
+    line = f"[BENCH] {name:<30} {result['rate_per_s']:>12.1f} {result['unit']}/s  {result['seconds']:8.3f} s"
+    if result["peak_memory_mb"] is not None:
+        line += f"  {result['peak_memory_mb']:8.1f} MB"
+    old = (baseline or {}).get(name)
+    if old and old.get("rate_per_s"):
+        line += f"  ×{result['rate_per_s'] / old['rate_per_s']:.2f} vs {baseline.get('_commit') or 'baseline'}"
+    print(line)
+    phases = ", ".join(f"{p}={v['seconds'] * 1000:.1f} ms" for p, v in result["phases"].items())
+    print(f"        fazy: {phases}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarki symulacji i rysowania.")
+    parser.add_argument("--cases", nargs="*", default=None,
+                        help=f"Przypadki do uruchomienia (domyślnie wszystkie): {', '.join(CASES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="Liczba powtórzeń (raportowane najlepsze)")
+    parser.add_argument("--no_memory", action="store_true", help="Bez pomiaru pamięci (tracemalloc)")
+    parser.add_argument("--out", type=str, default=None,
+                        help="Plik JSON z wynikami (domyślnie benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", type=str, default=None, help="Plik JSON z wcześniejszymi wynikami")
+    args = parser.parse_args(argv)
+    configure_logging(quiet=True)
+
+    names = args.cases or list(CASES)
+    unknown = [n for n in names if n not in CASES]
+    if unknown:
+        parser.error(f"Nieznane przypadki: {', '.join(unknown)}")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            data = json.load(f)
+        baseline = dict(data["cases"], _commit=data["meta"].get("commit"))
+
+    commit = _git_commit()
+    results = {}
+    for name in names:
+        results[name] = measure(name, repeat=args.repeat, memory=not args.no_memory)
+        _print_result(name, results[name], baseline)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{commit or 'local'}.json")
+    directory = os.path.dirname(out)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    meta = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+    }
+    with open(out, "w") as f:
+        json.dump({"meta": meta, "cases": results}, f, indent=2)
+    print(f"[BENCH] Zapisano wyniki: {out}")
+
+
+if __name__ == "__main__":
+    main()
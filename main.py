@@ -1,16 +1,74 @@
-from model.model import SewerSystemModel
+import argparse
 
-model = SewerSystemModel(rain_file="data/rain.csv")
+from model.log import configure_logging
 
-while model.running:
-    model.step()
 
-print("\n=== Symulacja zakończona ===")
+def main():
+    parser = argparse.ArgumentParser(description="Symulacja systemu kanalizacyjnego bez wizualizacji.")
+    parser.add_argument("--rain_file", type=str, default="data/rain.csv",
+                        help="Ścieżka do pliku z danymi deszczowymi")
+    parser.add_argument("--data_dir", type=str, default="data",
+                        help="Katalog z network.csv, mean_flows.csv i pozostałymi danymi sieci")
+    parser.add_argument("--log_level", type=str, default="INFO",
+                        help="Poziom logowania: DEBUG (diagnostyka węzłów), INFO (podsumowanie godziny), WARNING")
+    parser.add_argument("--quiet", action="store_true",
+                        help="Tryb headless: bez diagnostyki co godzinę")
+    parser.add_argument("--trace", type=str, default=None,
+                        help="Plik JSON Lines ze strukturalnym śladem pól diagnostycznych")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Plik wyników .parquet albo .arrow zapisywany porcjami w trakcie symulacji")
+    parser.add_argument("--max_hours", type=int, default=168,
+                        help="Czas trwania symulacji w godzinach")
+    parser.add_argument("--flush_every", type=int, default=720,
+                        help="Co ile godzin dopisywać porcję wyników do pliku --output")
+    parser.add_argument("--trajectory", action="store_true",
+                        help="Cały horyzont jednym przebiegiem tablicowym zamiast kroków godzina po godzinie")
+    parser.add_argument("--profile", action="store_true",
+                        help="Liczniki czasu faz step() wypisywane na końcu symulacji")
+    parser.add_argument("--profile_nodes", action="store_true",
+                        help="Dodatkowo czas każdego przepływomierza (z --profile)")
+    parser.add_argument("--profile_out", type=str, default=None,
+                        help="Plik JSON z wynikami profilowania (z --profile)")
+    args = parser.parse_args()
 
-results = model.datacollector.get_model_vars_dataframe()
-print("\n=== Podsumowanie danych ===")
-print(results.head(10))
+    # pandas i mesa ładowane dopiero po parse_args – --help i błędy argumentów bez ciężkich importów
+    from model.inputs import load_inputs
+    from model.model import SewerSystemModel
 
-results.to_csv("data/debug_output.csv")
-print("Zapisano debug_output.csv")
+    configure_logging(level=args.log_level, quiet=args.quiet, trace_path=args.trace)
 
+    model = SewerSystemModel(rain_file=args.rain_file, max_hours=args.max_hours, inputs=load_inputs(args.data_dir))
+
+    if args.output:
+        from model.output import ResultWriter
+        model.recorder.stream_to(ResultWriter(args.output), flush_every=args.flush_every)
+
+    profiler = model.enable_profiling(per_node=args.profile_nodes) if args.profile else None
+
+    if args.trajectory:
+        model.run_trajectory()
+    while model.running:
+        model.step()
+
+    print("\n=== Symulacja zakończona ===")
+
+    if profiler is not None:
+        print(profiler.report())
+        if args.profile_out:
+            profiler.dump(args.profile_out)
+            print(f"Zapisano profil do {args.profile_out}")
+
+    if args.output:
+        model.recorder.close()
+        print(f"Zapisano {model.recorder.flushed_rows} godzin wyników do {args.output}")
+    else:
+        results = model.recorder.to_dataframe()
+        print("\n=== Podsumowanie danych ===")
+        print(results.head(10))
+
+        results.to_csv("data/debug_output.csv")
+        print("Zapisano debug_output.csv")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,27 @@
+import logging
 from mesa import Agent
+from .log import get_logger, trace
+
+log = get_logger("agents")
 
 # === PUNKT POMIAROWY (węzeł grafu) ===
 class BaseSensorAgent(Agent):
+    # zadeklarowane pola siedzą w slotach, nie w słowniku instancji (mniej pamięci, szybszy dostęp);
+    # mesa.Agent nie ma __slots__, więc instancja nadal ma __dict__ – pusty, ale dostępny na dodatkowe atrybuty
+    __slots__ = (
+        "unique_id", "model", "location_id", "area", "base_flow_data", "location",
+        "mean_flow", "k_sensor", "alpha", "impervious_factor", "local_mean_flow", "storage", "rain_buffer",
+        "downstream_ids", "split", "pipe_loss", "diversion_target", "main_target", "_receivers",
+        "inflow_from_upstream", "local_flow", "current_flow", "status",
+    )
+
     def __init__(
         self, unique_id, model, location_id, flow_data, location, area,
         mean_flow, k_sensor=0.5, alpha=1.0, impervious_factor=0.5,
         downstream_ids=None,      # lista sąsiadów w dół rzeki
         split=None,               # dict: {target_id: udział [0..1]}  sum=1
-        pipe_loss=1.0             # tłumienie na wyjściu (np. 0.95)
+        pipe_loss=1.0,            # tłumienie na wyjściu (np. 0.95)
+        diversion_target=None     # ID przelewu, gdy węzeł może kierować na niego część odpływu
     ):
         self.unique_id = unique_id #unikalny numer agenta w modelu mesa
         self.model = model
@@ -15,7 +29,7 @@ class BaseSensorAgent(Agent):
         self.area = area or 3.0
 
         # dane i stan
-        self.base_flow_data = flow_data or [] #ewentualnie do testowania na danych rzeczywistych
+        self.base_flow_data = flow_data or () #ewentualnie do testowania na danych rzeczywistych
         self.location = location  # (lat, lon) - współrzędne GPS
 
         # progi / parametry hydrologiczne
@@ -25,12 +39,19 @@ class BaseSensorAgent(Agent):
         self.impervious_factor = impervious_factor # udział powierzchni nieprzepuszczalnych
         self.local_mean_flow = 0.0 # średni przepływ bez uwzględniania dopływów
         self.storage = 0.0
-        self.rain_buffer = [0.0]
+        self.rain_buffer = [0.0]  # bufor 1-godzinny, nadpisywany w miejscu
 
         # graf
         self.downstream_ids = downstream_ids or [] # sąsiedzi
         self.split = {target: 1.0 / len(self.downstream_ids) for target in self.downstream_ids} # do dopracowania - wykorzystywane w sytuacji przelewu
         self.pipe_loss = pipe_loss # można dodać do wzoru - jeśli zakładamy jakiś współczynnik strat między węzłami
+        # węzeł przelewowy (dawniej KP16 / KP25): przelew i drugi następca, do którego idzie reszta
+        self.diversion_target = diversion_target
+        self.main_target = None
+        if diversion_target is not None:
+            self.main_target = next(d for d in self.downstream_ids if d != diversion_target)
+        # metody receive() następców, ustalane przy pierwszym route() (oczyszczalnia i przelew powstają po węzłach)
+        self._receivers = None
 
         # bufory na godzinę
         self.inflow_from_upstream = 0.0  # suma dopływu z góry w danej godzinie
@@ -67,14 +88,14 @@ class BaseSensorAgent(Agent):
         rain_I_now = self.model.current_rain_intensity  # i(t)
         D = self.model.current_rain_depth  # D(t) – zostawiamy bez laga
 
-        # bufor 1-godzinny dla spływu powierzchniowego
-        self.rain_buffer.append(rain_I_now)
-        rain_I = self.rain_buffer.pop(0)  # i(t-1) – używane w Q_rain
+        # bufor 1-godzinny dla spływu powierzchniowego (seria i(t-1) policzona w modelu)
+        rain_I = self.model.current_rain_lagged  # i(t-1) – używane w Q_rain
+        self.rain_buffer[0] = rain_I_now
 
         # --- 2. Suchy przepływ + infiltracja ---
         # Q_base = Q_dry + gamma * D
         gamma = 0.015 #ewentualnie możemy jeszcze dokalibrować
-        self.storage = 0.9 * self.storage + D
+        self.storage = self.model.current_rain_storage  # 0.9 * storage + D, jedna seria dla wszystkich węzłów
         Q_base = self.local_mean_flow + gamma * self.storage
 
         # --- 3. Natychmiastowy spływ deszczowy (Rational/SWMM hybrid) ---
@@ -93,63 +114,78 @@ class BaseSensorAgent(Agent):
         else:
             self.status = "NORMAL"
 
-        print(
-            f"[{self.location_id}] Rain_now={rain_I_now:.2f} mm/h, Rain_eff={rain_I:.2f} mm/h, D={D:.2f} mm | "
-            f"Q_base={Q_base:.2f}, Q_rain={Q_rain:.2f}, "
-            f"Q_inflow={self.inflow_from_upstream:.2f} → Q_tot={self.current_flow:.2f}"
-        )
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(
+                "[%s] Rain_now=%.2f mm/h, Rain_eff=%.2f mm/h, D=%.2f mm | "
+                "Q_base=%.2f, Q_rain=%.2f, Q_inflow=%.2f → Q_tot=%.2f",
+                self.location_id, rain_I_now, rain_I, D, Q_base, Q_rain,
+                self.inflow_from_upstream, self.current_flow,
+                extra=trace(
+                    "sensor", hour=self.model.current_hour, id=self.location_id,
+                    rain_now=rain_I_now, rain_eff=rain_I, depth=D, q_base=Q_base, q_rain=Q_rain,
+                    q_inflow=self.inflow_from_upstream, q_total=self.current_flow, status=self.status,
+                ),
+            )
 
     # --- routing po grafie ---
     def route(self):
         """
         Wyślij strumień do następców wg 'split' i strat 'pipe_loss'.
         Specjalne węzły:
-          - 'Oczyszczalnia' → zwiększ plant.inflow_from_graph
-          - 'KP26' (przelew) → zwiększ overflow.inflow_from_graph
+          - oczyszczalnia (model.plant_id) → zwiększ plant.inflow_from_graph
+          - przelew (model.overflow_id) → zwiększ overflow.inflow_from_graph
         """
         if not self.downstream_ids:
             return
+        receivers = self._receivers
+        if receivers is None:
+            receivers = self._receivers = {target: self._resolve(target) for target in self.downstream_ids}
 
         # straty na wyjściu (np. nieszczelności)
         available = max(0.0, self.current_flow * self.pipe_loss)
 
-        # Specjalna logika TYLKO dla KP16 i KP25 (bo tylko one mogą iść do KP26):
-        if self.location_id in ("KP16", "KP25") and "KP26" in self.downstream_ids and "KP2" in self.downstream_ids:
+        # Specjalna logika TYLKO dla węzłów przelewowych (w sieci domyślnej KP16 i KP25 → KP2 / KP26):
+        if self.diversion_target is not None:
             # korzystamy z info z poprzedniej godziny:
             f_kp26 = max(0.0, min(getattr(self.model, "kp26_split_factor", 0.0), 1.0))
 
             if not self.model.overflow_point.active or f_kp26 <= 0.0:
-                # brak przeciążenia w poprzedniej godzinie → wszystko do KP2
-                split = {"KP2": 1.0, "KP26": 0.0}
-            else:
-                # część przepływu kierujemy na KP26, resztę do KP2
-                split = {"KP2": 1.0 - f_kp26, "KP26": f_kp26}
-        else:
-            # reszta węzłów: jeżeli mają jednego następcę, to wszystko do niego
-            if len(self.downstream_ids) == 1:
-                split = {self.downstream_ids[0]: 1.0}
+                # brak przeciążenia w poprzedniej godzinie → wszystko do drugiego następcy
+                self._send(receivers[self.main_target], available)
             else:
-                share = 1.0 / len(self.downstream_ids)
-                split = {d: share for d in self.downstream_ids}
-
-        for target_id, frac in split.items():
-            portion = max(0.0, available * float(frac))
-            if portion <= 0:
-                continue
-            if target_id == "Oczyszczalnia":
-                self.model.plant.receive(portion)
-            elif target_id == "KP26":
-                self.model.overflow_point.receive(portion)
-            else:
-                tgt = self.model.get_sensor_by_id(target_id)
-                if tgt is not None:
-                    tgt.receive(portion)
+                # część przepływu kierujemy na przelew, resztę dalej
+                self._send(receivers[self.main_target], available * (1.0 - f_kp26))
+                self._send(receivers[self.diversion_target], available * f_kp26)
+            return
+
+        # reszta węzłów: stałe udziały z self.split (przy jednym następcy – wszystko do niego)
+        for target_id, frac in self.split.items():
+            self._send(receivers[target_id], available * frac)
+
+    def _resolve(self, target_id):
+        """receive() następcy: oczyszczalni, przelewu albo przepływomierza (None, gdy go nie ma)."""
+        if target_id == self.model.plant_id:
+            return self.model.plant.receive
+        if target_id == self.model.overflow_id:
+            return self.model.overflow_point.receive
+        tgt = self.model.get_sensor_by_id(target_id)
+        return tgt.receive if tgt is not None else None
+
+    @staticmethod
+    def _send(receive, portion):
+        if receive is not None and portion > 0:
+            receive(portion)
 
     def advance(self):
         pass
 
 # === PRZELEW (KP26) ===
 class OverflowPointAgent(Agent):
+    __slots__ = (
+        "unique_id", "model", "location_id", "location", "capacity",
+        "inflow_from_graph", "active", "diverted_flow", "unhandled_overflow",
+    )
+
     def __init__(self, unique_id, model, location_id, location, capacity=800):
         self.unique_id = unique_id
         self.model = model
@@ -183,18 +219,38 @@ class OverflowPointAgent(Agent):
         self.diverted_flow = overflow
         self.unhandled_overflow = max(0.0, self.inflow_from_graph - self.capacity)
 
-        if overflow > 0:
-            print(f"Punkt przelewowy {self.location_id} otwarty → do rzeki {overflow:.2f} m³/h")
+        if not log.isEnabledFor(logging.DEBUG):
+            return
 
-        print("\n--- PRZELEW KP26 ---")
-        print(f"Dopływ do przelewu: {self.inflow_from_graph:.2f} m3/h")
-        print(f"Odprowadzono do rzeki: {self.diverted_flow:.2f} m3/h")
-        print(f"Niewyładowany nadmiar: {self.unhandled_overflow:.2f} m3/h")
-        print("---------------------\n")
+        if overflow > 0:
+            log.debug("Punkt przelewowy %s otwarty → do rzeki %.2f m³/h", self.location_id, overflow)
+
+        log.debug(
+            "\n--- PRZELEW KP26 ---\n"
+            "Dopływ do przelewu: %.2f m3/h\n"
+            "Odprowadzono do rzeki: %.2f m3/h\n"
+            "Niewyładowany nadmiar: %.2f m3/h\n"
+            "---------------------\n",
+            self.inflow_from_graph, self.diverted_flow, self.unhandled_overflow,
+            extra=trace(
+                "overflow", hour=self.model.current_hour, id=self.location_id,
+                inflow=self.inflow_from_graph, diverted=self.diverted_flow, unhandled=self.unhandled_overflow,
+            ),
+        )
 
 
 # === OCZYSZCZALNIA ===
 class SewagePlantAgent(Agent):
+    # tryby pracy (indeks = kod statusu w wynikach tablicowych)
+    STATUSES = ("NORMAL", "ACCELERATED", "EMERGENCY_OVERFLOW")
+    __slots__ = (
+        "unique_id", "model", "location", "max_capacity", "normal_flow", "k_rain_depth",
+        "nominal_capacity", "accelerated_capacity", "retention_capacity", "retention_release_rate",
+        "retention_volume", "max_accelerated_hours", "accelerated_hours_streak",
+        "inflow_from_graph", "estimated_flow", "retained_this_hour", "released_from_retention",
+        "flooding_volume", "total_inflow_this_hour", "treated_this_hour", "status", "warning_code",
+    )
+
     def __init__( self,
         unique_id,
         model,
@@ -245,6 +301,8 @@ class SewagePlantAgent(Agent):
         self.retained_this_hour = 0.0 # ścieki przekierowane do retencji w danej godzinie
         self.released_from_retention = 0.0 # ścieki, które zostały w danej godzinie przekierowane z retencji do oczyszcania
         self.flooding_volume = 0.0 # przekroczony poziom (zalanie obszarów przy oczyszczalni)
+        self.total_inflow_this_hour = 0.0 # dopływ całkowity (z grafu + składnik deszczowy)
+        self.treated_this_hour = 0.0 # ścieki oczyszczone w danej godzinie
         self.status = "NORMAL"
         self.warning_code = None
 
@@ -341,29 +399,7 @@ class SewagePlantAgent(Agent):
             self.accelerated_hours_streak = 0
             self.status = "NORMAL"
 
-            print("\n--- OCZYSZCZALNIA ---")
-            print(f"Dopływ całkowity: {inflow:.2f} m3/h")
-
-            print(f"Retencja aktualna: {self.retention_volume:.2f} / {self.retention_capacity} m3")
-            print(f"Do retencji w tej godzinie: {self.retained_this_hour:.2f} m3")
-            print(f"Z retencji uwolniono: {self.released_from_retention:.2f} m3")
-
-            print(f"Do oczyszczenia: {to_treat:.2f} m3/h")
-            print(f"Oczyszczono: {self.treated_this_hour:.2f} m3/h")
-
-            print(f"Tryb pracy: {self.status}")
-            print(f"Godzin pracy w trybie przyspieszonym: {self.accelerated_hours_streak}")
-
-            if self.model.overflow_point.active:
-                print("PRZELEW KP26: AKTYWNY")
-                print(f"Split KP26: {self.model.kp26_split_factor:.2f}")
-            else:
-                print("PRZELEW KP26: zamknięty")
-
-            if self.warning_code:
-                print(f"OSTRZEŻENIE: {self.warning_code}")
-
-            print("----------------------\n")
+            self._log_state(inflow, to_treat)
 
             return
 
@@ -380,29 +416,7 @@ class SewagePlantAgent(Agent):
             if self.accelerated_hours_streak >= self.max_accelerated_hours:
                 self.warning_code = "ENV_ACCEL_TOO_LONG"
 
-            print("\n--- OCZYSZCZALNIA ---")
-            print(f"Dopływ całkowity: {inflow:.2f} m3/h")
-
-            print(f"Retencja aktualna: {self.retention_volume:.2f} / {self.retention_capacity} m3")
-            print(f"Do retencji w tej godzinie: {self.retained_this_hour:.2f} m3")
-            print(f"Z retencji uwolniono: {self.released_from_retention:.2f} m3")
-
-            print(f"Do oczyszczenia: {to_treat:.2f} m3/h")
-            print(f"Oczyszczono: {self.treated_this_hour:.2f} m3/h")
-
-            print(f"Tryb pracy: {self.status}")
-            print(f"Godzin pracy w trybie przyspieszonym: {self.accelerated_hours_streak}")
-
-            if self.model.overflow_point.active:
-                print("PRZELEW KP26: AKTYWNY")
-                print(f"Split KP26: {self.model.kp26_split_factor:.2f}")
-            else:
-                print("PRZELEW KP26: zamknięty")
-
-            if self.warning_code:
-                print(f"OSTRZEŻENIE: {self.warning_code}")
-
-            print("----------------------\n")
+            self._log_state(inflow, to_treat)
 
             return
 
@@ -417,12 +431,10 @@ class SewagePlantAgent(Agent):
         excess_after_treatment = to_treat - self.accelerated_capacity
 
         if excess_after_treatment > 0:
-            kp16_agent = self.model.sensors.get("KP16")
-            kp25_agent = self.model.sensors.get("KP25")
-
-            kp16_available = kp16_agent.current_flow * kp16_agent.pipe_loss if kp16_agent else 0.0
-            kp25_available = kp25_agent.current_flow * kp25_agent.pipe_loss if kp25_agent else 0.0
-            available_for_diversion = kp16_available + kp25_available
+            # odpływ węzłów przelewowych (w sieci domyślnej KP16 i KP25)
+            available_for_diversion = 0.0
+            for agent in self.model.diversion_sensors:
+                available_for_diversion += agent.current_flow * agent.pipe_loss
 
             self.model.overflow_point.active = True
 
@@ -439,26 +451,41 @@ class SewagePlantAgent(Agent):
         if self.accelerated_hours_streak >= self.max_accelerated_hours:
             self.warning_code = "ENV_ACCEL_TOO_LONG"
 
-        print("\n--- OCZYSZCZALNIA ---")
-        print(f"Dopływ całkowity: {inflow:.2f} m3/h")
-
-        print(f"Retencja aktualna: {self.retention_volume:.2f} / {self.retention_capacity} m3")
-        print(f"Do retencji w tej godzinie: {self.retained_this_hour:.2f} m3")
-        print(f"Z retencji uwolniono: {self.released_from_retention:.2f} m3")
-
-        print(f"Do oczyszczenia: {to_treat:.2f} m3/h")
-        print(f"Oczyszczono: {self.treated_this_hour:.2f} m3/h")
-
-        print(f"Tryb pracy: {self.status}")
-        print(f"Godzin pracy w trybie przyspieszonym: {self.accelerated_hours_streak}")
+        self._log_state(inflow, to_treat)
 
-        if self.model.overflow_point.active:
-            print("PRZELEW KP26: AKTYWNY")
-            print(f"Split KP26: {self.model.kp26_split_factor:.2f}")
+    def _log_state(self, inflow, to_treat):
+        """Diagnostyka godziny (DEBUG) – formatowana tylko, gdy ktoś jej słucha."""
+        if not log.isEnabledFor(logging.DEBUG):
+            return
+        overflow_point = self.model.overflow_point
+        treated = self.treated_this_hour
+        lines = [
+            "\n--- OCZYSZCZALNIA ---",
+            f"Dopływ całkowity: {inflow:.2f} m3/h",
+            f"Retencja aktualna: {self.retention_volume:.2f} / {self.retention_capacity} m3",
+            f"Do retencji w tej godzinie: {self.retained_this_hour:.2f} m3",
+            f"Z retencji uwolniono: {self.released_from_retention:.2f} m3",
+            f"Do oczyszczenia: {to_treat:.2f} m3/h",
+            f"Oczyszczono: {treated:.2f} m3/h",
+            f"Tryb pracy: {self.status}",
+            f"Godzin pracy w trybie przyspieszonym: {self.accelerated_hours_streak}",
+        ]
+        if overflow_point.active:
+            lines.append("PRZELEW KP26: AKTYWNY")
+            lines.append(f"Split KP26: {self.model.kp26_split_factor:.2f}")
         else:
-            print("PRZELEW KP26: zamknięty")
-
+            lines.append("PRZELEW KP26: zamknięty")
         if self.warning_code:
-            print(f"OSTRZEŻENIE: {self.warning_code}")
-
-        print("----------------------\n")
\ No newline at end of file
+            lines.append(f"OSTRZEŻENIE: {self.warning_code}")
+        lines.append("----------------------\n")
+
+        log.debug(
+            "\n".join(lines),
+            extra=trace(
+                "plant", hour=self.model.current_hour, inflow=inflow, to_treat=to_treat,
+                retention_volume=self.retention_volume, retained=self.retained_this_hour,
+                released=self.released_from_retention, treated=treated, status=self.status,
+                accelerated_hours=self.accelerated_hours_streak, overflow_active=overflow_point.active,
+                kp26_split_factor=self.model.kp26_split_factor, warning=self.warning_code,
+            ),
+        )
@@ -0,0 +1,228 @@
+import os
+import numpy as np
+import pandas as pd
+
+from .model import SewerSystemModel
+from .rain import lagged_intensity, load_rain_file, pad_series, reservoir_depth, rolling_depth, storage_filter
+
+
+# === WYNIKI SYMULACJI WSADOWEJ ===
+class BatchResult:
+    """
+    Wyniki wszystkich scenariuszy jako tablice (scenariusze × godziny [× przepływomierze]).
+    Kolumny odpowiadają temu, co SewerSystemModel zbiera w DataCollectorze, plus stan oczyszczalni.
+    """
+
+    def __init__(self, sensor_ids, names, arrays):
+        self.sensor_ids = list(sensor_ids)
+        self.names = list(names)
+        self.total_flow = arrays["total_flow"]                  # (S, T) – plant.estimated_flow
+        self.overflow_active = arrays["overflow_active"]        # (S, T) bool
+        self.sensor_flow = arrays["sensor_flow"]                # (S, T, N)
+        self.sensor_alert = arrays["sensor_alert"]              # (S, T, N) bool
+        self.plant_inflow = arrays["plant_inflow"]              # (S, T)
+        self.treated = arrays["treated"]                        # (S, T)
+        self.retention_volume = arrays["retention_volume"]      # (S, T)
+        self.retained = arrays["retained"]                      # (S, T)
+        self.released_from_retention = arrays["released"]       # (S, T)
+        self.plant_status = arrays["plant_status"]              # (S, T) indeks w SewagePlantAgent.STATUSES
+        self.accel_warning = arrays["accel_warning"]            # (S, T) bool – ENV_ACCEL_TOO_LONG
+        self.kp26_split_factor = arrays["kp26_split_factor"]    # (S, T)
+        self.diverted_flow = arrays["diverted_flow"]            # (S, T)
+        self.unhandled_overflow = arrays["unhandled_overflow"]  # (S, T)
+        self.rain_intensity = arrays["rain_intensity"]          # (S, T)
+        self.rain_depth = arrays["rain_depth"]                  # (S, T)
+
+    def __len__(self):
+        return len(self.names)
+
+    def to_frame(self, scenario):
+        """DataFrame jednego scenariusza w układzie datacollector.get_model_vars_dataframe()."""
+        i = self.names.index(scenario) if isinstance(scenario, str) else int(scenario)
+        data = {
+            "TotalFlow": self.total_flow[i],
+            "OverflowActive": self.overflow_active[i].astype(int),
+        }
+        for j, sid in enumerate(self.sensor_ids):
+            data[f"{sid}_Flow"] = self.sensor_flow[i, :, j]
+        return pd.DataFrame(data)
+
+    def summary(self):
+        """Jedna linijka na scenariusz: szczyty i sumy najważniejszych wielkości."""
+        return pd.DataFrame({
+            "scenario": self.names,
+            "max_total_flow": self.total_flow.max(axis=1),
+            "max_retention": self.retention_volume.max(axis=1),
+            "overflow_hours": self.overflow_active.sum(axis=1),
+            "diverted_volume": self.diverted_flow.sum(axis=1),
+            "accelerated_hours": (self.plant_status > 0).sum(axis=1),
+        })
+
+
+def load_rain_series(paths):
+    """
+    Wczytuje pliki deszczu (kolumna rain_mm_h albo "Opady [mm/h]") do tablicy (scenariusze × godziny).
+    Krótsze serie są dopełniane zerami – tak samo model traktuje godziny po końcu pliku.
+    """
+    series = [load_rain_file(p) for p in paths]
+    length = max((len(s) for s in series), default=0)
+    rain = np.zeros((len(series), length))
+    for i, s in enumerate(series):
+        rain[i, :len(s)] = s
+    names = [os.path.splitext(os.path.basename(p))[0] for p in paths]
+    return rain, names
+
+
+# === SYMULACJA WSADOWA ===
+def run_batch(rain, names=None, max_hours=168, max_capacity=1700, start_month=1, graph=None, mean_flows=None,
+              inputs=None, rain_depth_method="window"):
+    """
+    Symuluje wiele scenariuszy opadowych jednocześnie.
+
+    rain – tablica (scenariusze × godziny) intensywności [mm/h]; godziny poza tablicą mają opad 0.
+    Stan sieci trzymany jest w tablicach (scenariusze × przepływomierze), a automat oczyszczalni
+    (retencja, tryb przyspieszony, przelew KP26) liczony jest maskami dla wszystkich scenariuszy naraz.
+    Dane wejściowe (średnie przepływy, powierzchnie, graf) wczytywane są tylko raz.
+    """
+    rain = np.atleast_2d(np.asarray(rain, dtype=float))
+    n_scen, n_rain = rain.shape
+    if names is None:
+        names = [f"scenario_{i}" for i in range(n_scen)]
+
+    # model-wzorzec: parametry sieci, macierze routingu i średnie przepływy
+    template = SewerSystemModel(
+        graph=graph, mean_flows=mean_flows, max_capacity=max_capacity, max_hours=max_hours,
+        start_month=start_month, vectorized=True, rain_intensity=[], inputs=inputs,
+        rain_depth_method=rain_depth_method,
+    )
+    engine = template.engine
+    plant = template.plant
+    overflow = template.overflow_point
+    n = len(engine.ids)
+
+    # średnie przepływy dla każdej godziny doby (miesiąc w modelu jest stały)
+    for hour_0_23 in range(24):
+        template._check_mean_table(hour_0_23)
+    month_idx = (template.current_month - 1) % 12
+    mean_by_hour = template.mean_flow_table[month_idx]
+    local_mean_by_hour = template.local_mean_flow_table[month_idx]
+
+    transfer_t = engine.transfer_matrix.T.tocsr()
+
+    # --- stan oczyszczalni / przelewu (scenariusze) ---
+    retention_volume = np.zeros(n_scen)
+    accel_streak = np.zeros(n_scen, dtype=int)
+    treated_prev = np.zeros(n_scen)
+
+    T = max_hours
+    out = {
+        "total_flow": np.zeros((n_scen, T)),
+        "overflow_active": np.zeros((n_scen, T), dtype=bool),
+        "sensor_flow": np.zeros((n_scen, T, n)),
+        "sensor_alert": np.zeros((n_scen, T, n), dtype=bool),
+        "plant_inflow": np.zeros((n_scen, T)),
+        "treated": np.zeros((n_scen, T)),
+        "retention_volume": np.zeros((n_scen, T)),
+        "retained": np.zeros((n_scen, T)),
+        "released": np.zeros((n_scen, T)),
+        "plant_status": np.zeros((n_scen, T), dtype=np.int8),
+        "accel_warning": np.zeros((n_scen, T), dtype=bool),
+        "kp26_split_factor": np.zeros((n_scen, T)),
+        "diverted_flow": np.zeros((n_scen, T)),
+        "unhandled_overflow": np.zeros((n_scen, T)),
+        "rain_intensity": np.zeros((n_scen, T)),
+        "rain_depth": np.zeros((n_scen, T)),
+    }
+
+    # --- serie opadowe (scenariusze × godziny) liczone raz dla całego horyzontu ---
+    rain_now = pad_series(rain, T)
+    if rain_depth_method == "reservoir":
+        depth = reservoir_depth(rain_now, template.rain_memory_lambda, n_rain)
+    else:
+        depth = rolling_depth(rain_now, template.rain_depth_window, n_rain)
+    rain_lagged = lagged_intensity(rain_now)
+    storage = storage_filter(depth, template.storage_decay)
+    out["rain_intensity"][:] = rain_now
+    out["rain_depth"][:] = depth
+
+    for t in range(T):
+        hour = t + 1
+
+        # --- 1. Średnie godziny ---
+        hour_0_23 = (hour - 1) % 24
+        mean_flow = mean_by_hour[hour_0_23]
+        local_mean_flow = local_mean_by_hour[hour_0_23]
+
+        # --- 2. Opady + hydrologia lokalna (storage wspólny dla węzłów scenariusza) ---
+        D = depth[:, t]
+        q_base = local_mean_flow + engine.GAMMA * storage[:, t, None]
+        q_rain = engine.runoff_coef * rain_lagged[:, t, None] ** engine.alpha
+        local_flow = np.maximum(0.0, q_base + q_rain)
+
+        # --- 3. Routing ---
+        # split KP26 jest zerowany przed routingiem (jak w SewerSystemModel.step()),
+        # więc przepływy nie zależą od stanu oczyszczalni: zawsze macierz transferu dla split = 0
+        flows = np.asarray(local_flow @ transfer_t)
+        plant_in = flows @ engine.to_plant
+        overflow_in = flows @ engine.to_overflow
+
+        # --- 4. Oczyszczalnia (SewagePlantAgent.step()) ---
+        inflow = plant_in + plant.k_rain_depth * D
+
+        excess = np.maximum(0.0, inflow - plant.accelerated_capacity)
+        free_retention = np.maximum(0.0, plant.retention_capacity - retention_volume)
+        retained = np.minimum(excess, free_retention)
+        retention_volume = retention_volume + retained
+        to_treat = inflow - retained
+
+        spare_capacity = np.maximum(0.0, plant.accelerated_capacity - to_treat)
+        released = np.minimum(np.minimum(retention_volume, plant.retention_release_rate), spare_capacity)
+        retention_volume = retention_volume - released
+        to_treat = to_treat + released
+
+        normal = to_treat <= plant.nominal_capacity
+        accelerated = ~normal & (to_treat <= plant.accelerated_capacity)
+        emergency = ~normal & ~accelerated
+
+        estimated = np.where(emergency, plant.accelerated_capacity, to_treat)
+        # w trybie przyspieszonym agent nie nadpisuje treated_this_hour – zostaje wartość z poprzedniej godziny
+        treated = np.where(normal, to_treat, np.where(accelerated, treated_prev, plant.accelerated_capacity))
+        treated_prev = treated
+        accel_streak = np.where(normal, 0, accel_streak + 1)
+        status = np.where(normal, 0, np.where(accelerated, 1, 2)).astype(np.int8)
+        accel_warning = ~normal & (accel_streak >= plant.max_accelerated_hours)
+
+        excess_after_treatment = to_treat - plant.accelerated_capacity
+        available_for_diversion = flows @ engine.plant_diversion_sources
+        overflow_active = emergency
+        with np.errstate(divide="ignore", invalid="ignore"):
+            split = np.clip(excess_after_treatment / available_for_diversion, 0.0, 1.0)
+        kp26_split = np.where(emergency & (available_for_diversion > 0), split, 0.0)
+
+        # --- 5. Przelew KP26 (OverflowPointAgent.step()) ---
+        diverted = np.where(overflow_active, np.minimum(overflow_in, overflow.capacity), 0.0)
+        unhandled = np.where(overflow_active, np.maximum(0.0, overflow_in - overflow.capacity), 0.0)
+
+        # --- 6. Zapis ---
+        out["total_flow"][:, t] = estimated
+        out["overflow_active"][:, t] = overflow_active
+        out["sensor_flow"][:, t] = flows
+        out["sensor_alert"][:, t] = flows > 1.5 * mean_flow
+        out["plant_inflow"][:, t] = plant_in
+        out["treated"][:, t] = treated
+        out["retention_volume"][:, t] = retention_volume
+        out["retained"][:, t] = retained
+        out["released"][:, t] = released
+        out["plant_status"][:, t] = status
+        out["accel_warning"][:, t] = accel_warning
+        out["kp26_split_factor"][:, t] = kp26_split
+        out["diverted_flow"][:, t] = diverted
+        out["unhandled_overflow"][:, t] = unhandled
+
+    return BatchResult(engine.ids, names, out)
+
+
+def run_batch_files(paths, **kwargs):
+    """Skrót: wczytuje pliki deszczu i uruchamia run_batch()."""
+    rain, names = load_rain_series(paths)
+    return run_batch(rain, names=names, **kwargs)
@@ -0,0 +1,294 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+
+import numpy as np
+from scipy import sparse
+
+from .network import OVERFLOW, PLANT, SENSOR
+
+# pule wątków routingu wspólne dla wszystkich silników procesu (liczba wątków → pula),
+# żeby seria modeli (ensemble, benchmarki) nie zostawiała za sobą bezczynnych wątków
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def _routing_pool(workers):
+    with _POOLS_LOCK:
+        pool = _POOLS.get(workers)
+        if pool is None:
+            pool = _POOLS[workers] = ThreadPoolExecutor(workers, thread_name_prefix="routing")
+        return pool
+
+
+# === TABLICOWY SILNIK KROKU (alternatywa dla pętli po agentach) ===
+class VectorizedEngine:
+    """
+    Trzyma stan wszystkich przepływomierzy w wektorach NumPy i liczy jedną godzinę
+    symulacji dla całej sieci naraz:
+      - lokalny spływ (baza + deszcz) liczony jest wektorowo dla wszystkich węzłów,
+      - akumulacja w dół sieci idzie poziomami zależności (network.levels()): węzły jednego
+        poziomu nie zależą od siebie, więc cały poziom to kilka operacji na wektorach,
+        a koszt kroku rośnie z liczbą poziomów, nie węzłów. Szerokie poziomy można
+        rozłożyć na wątki (workers > 1) – operacje NumPy na dużych tablicach zwalniają GIL.
+      - tryb trajektorii i run_batch mnożą przez macierz transferu T = (I - R)^-1
+        (R – macierz routingu z wbudowanymi pipe_loss i split), budowaną przy pierwszym użyciu.
+
+    Recorder i kanał dashboardu czytają przepływy wprost z wektorów (model.sensor_state()),
+    oczyszczalnia dostaje co godzinę tylko current_flow węzłów przelewowych, a pełny stan
+    agentów (current_flow, status, ...) kopiowany jest przy pierwszym odczycie model.sensors po kroku.
+    """
+
+    GAMMA = 0.015          # jak w BaseSensorAgent.step()
+    # poziom z co najmniej tyloma krawędziami dzielony jest między wątki (przy workers > 1)
+    PARALLEL_MIN_EDGES = 50_000
+
+    def __init__(self, model, workers=1):
+        self.model = model
+        self.workers = max(1, int(workers or 1))
+
+        # indeksy węzłów w kolejności topologicznej (upstream → downstream)
+        self.ids = list(model.sensor_ids)
+        self.index = {sid: i for i, sid in enumerate(self.ids)}
+        self.agents = [model._sensors[sid] for sid in self.ids]
+        n = len(self.ids)
+
+        # --- parametry węzłów ---
+        self.area = np.array([a.area for a in self.agents], dtype=float)
+        self.k_sensor = np.array([a.k_sensor for a in self.agents], dtype=float)
+        self.alpha = np.array([a.alpha for a in self.agents], dtype=float)
+        self.impervious = np.array([a.impervious_factor for a in self.agents], dtype=float)
+        self.pipe_loss = np.array([a.pipe_loss for a in self.agents], dtype=float)
+        self.runoff_coef = self.k_sensor * self.impervious * self.area
+
+        # --- stan ---
+        self.mean_flow = np.array([a.mean_flow for a in self.agents], dtype=float)
+        self.local_mean_flow = np.array([a.local_mean_flow for a in self.agents], dtype=float)
+        self.storage = np.array([a.storage for a in self.agents], dtype=float)
+        self.rain_buffer = np.array([a.rain_buffer[0] if a.rain_buffer else 0.0 for a in self.agents], dtype=float)
+        self.local_flow = np.zeros(n)
+        self.inflow_from_upstream = np.zeros(n)
+        self.current_flow = np.zeros(n)
+        self.alert = np.zeros(n, dtype=bool)
+
+        self._build_routing()
+        self._build_levels()
+
+        # węzły przelewowe: ich current_flow czyta oczyszczalnia co godzinę (SewagePlantAgent.step())
+        self._diversion_agents = [(a, self.index[a.location_id]) for a in model.diversion_sensors]
+        # stan pozostałych agentów kopiowany leniwie (model.sensors → sync_agents())
+        self.agents_synced = True
+
+    # ===============================================
+    # Routing
+    # ===============================================
+    def _build_routing(self):
+        """
+        Składa macierz routingu R (R[v, u] = pipe_loss[u] * split[u → v]) oraz
+        wektory odpływu do oczyszczalni i przelewu – te same reguły co BaseSensorAgent.route(),
+        prosto z krawędzi skompilowanej sieci (model.network, CSR), bez pętli po węzłach.
+        Węzły przelewowe (w sieci domyślnej KP16/KP25) mają split zależny od kp26_split_factor,
+        więc ich część przelewowa trzymana jest osobno jako poprawka liniowa w f.
+        """
+        net = self.model.network
+        n = len(self.ids)
+        # pozycja węzła sieci w wektorach silnika (-1 = nie przepływomierz)
+        pos = np.full(len(net), -1, dtype=np.int64)
+        pos[[net.index[sid] for sid in self.ids]] = np.arange(n)
+
+        src = pos[np.repeat(np.arange(len(net)), np.diff(net.indptr))]
+        tgt = net.indices
+        weight = self.pipe_loss[src] * net.share
+        kind = net.kind[tgt]
+
+        to_sensor = (kind == SENSOR) & (pos[tgt] >= 0)
+        rows, cols, vals = pos[tgt[to_sensor]], src[to_sensor], weight[to_sensor]
+        to_plant = np.zeros(n)
+        to_overflow = np.zeros(n)
+        np.add.at(to_plant, src[kind == PLANT], weight[kind == PLANT])
+        np.add.at(to_overflow, src[kind == OVERFLOW], weight[kind == OVERFLOW])
+
+        # poprawka dla węzłów przelewowych: R(f) = R0 - f * D, overflow(f) = overflow0 + f * d
+        div_nodes = np.flatnonzero(net.diversion >= 0)
+        div_src = pos[div_nodes]
+        diversion = np.zeros(n)
+        diversion[div_src] = self.pipe_loss[div_src]
+        div_rows, div_cols, div_vals = pos[net.diversion_main[div_nodes]], div_src, self.pipe_loss[div_src]
+
+        self.routing_matrix = sparse.csr_matrix((vals, (rows, cols)), shape=(n, n))
+        self.diversion_matrix = sparse.csr_matrix((div_vals, (div_rows, div_cols)), shape=(n, n))
+        self.to_plant = to_plant
+        self.to_overflow = to_overflow
+        self.diversion = diversion
+
+        # źródła, które oczyszczalnia bierze pod uwagę przy liczeniu splitu KP26 (SewagePlantAgent.step())
+        self.plant_diversion_sources = diversion.copy()
+
+    @cached_property
+    def transfer_matrix(self):
+        """T = (I - R)^-1 dla split = 0 (tryb trajektorii, run_batch); step() go nie potrzebuje."""
+        return self._transfer_matrix(self.routing_matrix)
+
+    @staticmethod
+    def _transfer_matrix(routing):
+        """T = (I - R)^-1 = I + R + R^2 + ... (graf jest acykliczny, więc szereg się kończy)."""
+        n = routing.shape[0]
+        transfer = sparse.identity(n, format="csr")
+        power = routing.copy()
+        for _ in range(n):
+            power.eliminate_zeros()
+            if power.nnz == 0:
+                break
+            transfer = transfer + power
+            power = routing @ power
+        return transfer.tocsr()
+
+    # ===============================================
+    # Routing poziomami
+    # ===============================================
+    def _build_levels(self):
+        """
+        Krawędzie przepływomierz → przepływomierz pogrupowane w bloki po poziomach źródła.
+        Wektory silnika są w kolejności network.order, więc poziom k to wycinek level_ptr[k]:level_ptr[k+1],
+        a jego dopływy trafiają wyłącznie do wyższych poziomów. Blok to zakres krawędzi [a:b)
+        posortowanych po celu i lista jego celów; slot krawędzi to numer celu w bloku (dla bincount).
+        Poziom z co najmniej PARALLEL_MIN_EDGES krawędziami dzielony jest na `workers` bloków
+        o rozłącznych celach, które można liczyć w osobnych wątkach.
+        """
+        routing = self.routing_matrix.tocoo()
+        level = np.repeat(np.arange(self.model.network.n_levels), np.diff(self.model.network.level_ptr))
+        edge_order = np.lexsort((routing.row, level[routing.col]))
+        src = routing.col[edge_order].astype(np.int64)
+        tgt = routing.row[edge_order].astype(np.int64)
+        weight = routing.data[edge_order]
+
+        # część krawędzi przelewowych (R(f) = R0 - f * D) w tym samym porządku krawędzi
+        diversion = self.diversion_matrix.tocoo()
+        main_target = np.full(len(self.ids), -1, dtype=np.int64)
+        main_target[diversion.col] = diversion.row
+        div_weight = np.where(main_target[src] == tgt, self.diversion[src], 0.0)
+
+        slot = np.empty(len(src), dtype=np.int64)
+        levels = []
+        bounds = np.searchsorted(level[src], np.arange(self.model.network.n_levels + 1))
+        for a, b in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            if a == b:
+                continue
+            n_parts = self.workers if b - a >= self.PARALLEL_MIN_EDGES else 1
+            targets, first = np.unique(tgt[a:b], return_index=True)
+            # podział po celach: krawędzie jednego celu zawsze w jednym bloku
+            cuts = [a + int(first[len(targets) * p // n_parts]) for p in range(n_parts)] + [b]
+            blocks = []
+            for lo, hi in zip(cuts[:-1], cuts[1:]):
+                if lo == hi:
+                    continue
+                block_targets, inverse = np.unique(tgt[lo:hi], return_inverse=True)
+                slot[lo:hi] = inverse
+                blocks.append((lo, hi, block_targets))
+            levels.append(blocks)
+
+        self._edge_src = src
+        self._edge_slot = slot
+        self._edge_weight = weight
+        self._edge_diversion = div_weight
+        self._levels = levels
+        self._pool = _routing_pool(self.workers) if any(len(blocks) > 1 for blocks in levels) else None
+
+    def _route_block(self, flow, weight, block):
+        lo, hi, targets = block
+        outflow = flow[self._edge_src[lo:hi]] * weight[lo:hi]
+        flow[targets] += np.bincount(self._edge_slot[lo:hi], outflow, minlength=len(targets))
+
+    def route(self, local_flow, split=0.0):
+        """
+        Przepływy wszystkich przepływomierzy dla lokalnych dopływów local_flow (= R(split) akumulowane
+        w dół sieci), poziom po poziomie. Wynik równy transfer_matrix @ local_flow dla split = 0.
+        """
+        weight = self._edge_weight if split <= 0.0 else self._edge_weight - split * self._edge_diversion
+        flow = np.array(local_flow, dtype=float)
+        for blocks in self._levels:
+            if len(blocks) == 1:
+                self._route_block(flow, weight, blocks[0])
+            else:
+                # bloki poziomu mają rozłączne cele i czytają tylko niższe poziomy
+                for future in [self._pool.submit(self._route_block, flow, weight, b) for b in blocks]:
+                    future.result()
+        return flow
+
+    def _effective_split(self):
+        """Ułamek kierowany na KP26 w tej godzinie (ta sama logika co w route())."""
+        f_kp26 = max(0.0, min(getattr(self.model, "kp26_split_factor", 0.0), 1.0))
+        if not self.model.overflow_point.active or f_kp26 <= 0.0:
+            return 0.0
+        return f_kp26
+
+    # ===============================================
+    # Średnie przepływy
+    # ===============================================
+    def set_mean_flows(self, mean_flow, local_mean_flow):
+        """Wiersze tablic mean_flow_table / local_mean_flow_table modelu dla bieżącej godziny."""
+        self.mean_flow = mean_flow
+        self.local_mean_flow = local_mean_flow
+
+    # ===============================================
+    # Krok
+    # ===============================================
+    def step(self):
+        model = self.model
+
+        # bufor 1-godzinny dla spływu i storage – serie policzone w modelu (wspólne dla węzłów)
+        rain_I = model.current_rain_lagged
+        self.rain_buffer.fill(model.current_rain_intensity)
+
+        # suchy przepływ + infiltracja
+        self.storage.fill(model.current_rain_storage)
+        q_base = self.local_mean_flow + self.GAMMA * model.current_rain_storage
+
+        # spływ deszczowy
+        q_rain = self.runoff_coef * rain_I ** self.alpha
+
+        self.local_flow = np.maximum(0.0, q_base + q_rain)
+
+        # akumulacja w dół sieci (poziomami)
+        split = self._effective_split()
+        self.current_flow = self.route(self.local_flow, split)
+        self.inflow_from_upstream = self.current_flow - self.local_flow
+        self.alert = self.current_flow > 1.5 * self.mean_flow
+
+        # odpływ do oczyszczalni i przelewu
+        outflow = np.maximum(self.current_flow, 0.0)
+        plant_in = float(self.to_plant @ outflow)
+        overflow_in = float((self.to_overflow + split * self.diversion) @ outflow)
+        self.model.plant.receive(plant_in)
+        self.model.overflow_point.receive(overflow_in)
+
+        current_flow = self.current_flow
+        for agent, i in self._diversion_agents:
+            agent.current_flow = float(current_flow[i])
+        self.agents_synced = False
+
+    def sync_agents(self):
+        """
+        Zapis stanu z wektorów do wszystkich agentów. Wołane przy odczycie model.sensors, nie co krok:
+        recorder i kanał dashboardu biorą przepływy wprost z wektorów (model.sensor_state()).
+        """
+        self.agents_synced = True
+        for agent, flow, local, inflow, storage, mean, local_mean, rain, alert in zip(
+            self.agents,
+            self.current_flow.tolist(),
+            self.local_flow.tolist(),
+            self.inflow_from_upstream.tolist(),
+            self.storage.tolist(),
+            self.mean_flow.tolist(),
+            self.local_mean_flow.tolist(),
+            self.rain_buffer.tolist(),
+            self.alert.tolist(),
+        ):
+            agent.current_flow = flow
+            agent.local_flow = local
+            agent.inflow_from_upstream = inflow
+            agent.storage = storage
+            agent.mean_flow = mean
+            agent.local_mean_flow = local_mean
+            agent.rain_buffer[0] = rain
+            agent.status = "ALERT" if alert else "NORMAL"
@@ -0,0 +1,253 @@
+"""
+Ensemble: równoległe uruchamianie wielu SewerSystemModel w puli procesów.
+
+Pliki CSV (mean_flows, areas, impervious, wspolrzedne) są wczytywane raz w procesie
+głównym i przekazywane do workerów przez pamięć współdzieloną – worker nie parsuje CSV.
+Wyniki spływają scenariusz po scenariuszu w kolejności ukończenia, a liczba zadań
+w locie jest ograniczona, więc pamięć nie rośnie z rozmiarem ensemble.
+
+Przykład:
+    python -m model.ensemble --rain_dir data/rain_experiments --synthetic 500 --workers 8
+"""
+import argparse
+import csv
+import glob
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from .inputs import ModelInputs, load_inputs
+from .log import configure_logging
+from .model import SewerSystemModel
+from .rain import load_rain_file
+
+
+# === PAMIĘĆ WSPÓŁDZIELONA DLA DANYCH WEJŚCIOWYCH ===
+class SharedInputs:
+    """
+    Pakuje liczbowe części ModelInputs do jednego bloku SharedMemory.
+    Do workerów trafia tylko mały opis układu (nazwy kolumn, ID, przesunięcia).
+    """
+
+    def __init__(self, shm, layout):
+        self.shm = shm
+        self.layout = layout
+
+    @classmethod
+    def create(cls, inputs):
+        blocks = {}
+        # skompilowana sieć jest mała i niezmienna – trafia do workerów razem z opisem układu
+        meta = {"mean_flows_path": inputs.mean_flows_path, "network": inputs.network}
+
+        if inputs.hourly_means is not None:
+            df_h = inputs.hourly_means
+            meta["hourly_columns"] = list(df_h.columns)
+            blocks["hourly_means"] = df_h.astype(float).to_numpy()
+            # tablice średnich (12, 24, …) liczone raz na modelu-wzorcu – workery ich nie przebudowują
+            tables = SewerSystemModel(rain_intensity=[], inputs=inputs).mean_tables
+            meta["mean_columns"] = tables["columns"]
+            blocks["mean_column_table"] = tables["column_table"]
+            blocks["mean_table_valid"] = tables["valid"].astype(float)
+            if inputs.network is not None:
+                # tablice przepływomierzy zależą od topologii – tylko dla sieci przekazywanej do workerów
+                blocks["mean_flow_table"] = tables["mean_flow_table"]
+                blocks["local_mean_flow_table"] = tables["local_mean_flow_table"]
+        for name in ("areas", "impervious"):
+            values = getattr(inputs, name)
+            if values is not None:
+                meta[f"{name}_ids"] = list(values.keys())
+                blocks[name] = np.array(list(values.values()), dtype=float)
+        meta["coords_ids"] = list(inputs.coords.keys())
+        blocks["coords"] = np.array(
+            [(c["lat"], c["lon"]) for c in inputs.coords.values()], dtype=float
+        ).reshape(-1, 2)
+
+        size = sum(a.nbytes for a in blocks.values())
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        offset = 0
+        arrays = {}
+        for name, arr in blocks.items():
+            view = np.ndarray(arr.shape, dtype=np.float64, buffer=shm.buf, offset=offset)
+            view[...] = arr
+            arrays[name] = (offset, arr.shape)
+            offset += arr.nbytes
+        meta["arrays"] = arrays
+        meta["shm_name"] = shm.name
+        return cls(shm, meta)
+
+    @staticmethod
+    def attach(layout):
+        """Buduje ModelInputs na widokach pamięci współdzielonej (bez kopiowania z CSV)."""
+        shm = shared_memory.SharedMemory(name=layout["shm_name"])
+        views = {
+            name: np.ndarray(shape, dtype=np.float64, buffer=shm.buf, offset=offset)
+            for name, (offset, shape) in layout["arrays"].items()
+        }
+
+        hourly_means = None
+        if "hourly_means" in views:
+            hourly_means = pd.DataFrame(views["hourly_means"], columns=layout["hourly_columns"], copy=False)
+            hourly_means["month"] = hourly_means["month"].astype("Int64")
+            hourly_means["hour"] = hourly_means["hour"].astype("Int64")
+
+        mean_tables = None
+        if "mean_column_table" in views:
+            mean_tables = {
+                "columns": layout["mean_columns"],
+                "column_table": views["mean_column_table"],
+                "valid": views["mean_table_valid"].astype(bool),
+            }
+            for name in ("mean_flow_table", "local_mean_flow_table"):
+                if name in views:
+                    mean_tables[name] = views[name]
+
+        def as_dict(name):
+            if name not in views:
+                return None
+            return dict(zip(layout[f"{name}_ids"], views[name].tolist()))
+
+        coords = {
+            pid: {"lat": lat, "lon": lon}
+            for pid, (lat, lon) in zip(layout["coords_ids"], views["coords"].tolist())
+        }
+        inputs = ModelInputs(coords, as_dict("areas"), as_dict("impervious"), hourly_means,
+                             layout["mean_flows_path"], layout.get("network"), mean_tables)
+        return shm, inputs
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+# === WORKER ===
+_worker_shm = None
+_worker_inputs = None
+
+
+def _init_worker(layout):
+    global _worker_shm, _worker_inputs
+    # diagnostyka modeli w workerach jest wyłączona (tylko ostrzeżenia)
+    configure_logging(quiet=True)
+    _worker_shm, _worker_inputs = SharedInputs.attach(layout)
+
+
+def _run_scenario(name, rain, model_kwargs, keep_series):
+    model = SewerSystemModel(inputs=_worker_inputs, rain_intensity=rain, **model_kwargs)
+    while model.running:
+        model.step()
+    results = model.recorder.to_dataframe()
+    summary = {
+        "scenario": name,
+        "hours": len(results),
+        "max_total_flow": float(results["TotalFlow"].max()),
+        "overflow_hours": int(results["OverflowActive"].sum()),
+        "final_retention": float(model.plant.retention_volume),
+    }
+    return summary, (results if keep_series else None)
+
+
+# === URUCHAMIANIE ===
+def run_ensemble(scenarios, workers=None, max_in_flight=None, keep_series=False, data_dir="data", **model_kwargs):
+    """
+    Generator: dla każdego scenariusza (nazwa, seria mm/h) zwraca (summary, results)
+    w kolejności ukończenia. `results` to DataFrame z ResultRecordera (tylko przy keep_series=True).
+
+    scenarios może być dowolnym iterowalnym (także generatorem) – zadania są wysyłane
+    porcjami po max_in_flight, więc całe ensemble nigdy nie leży w pamięci naraz.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+
+    shared = SharedInputs.create(load_inputs(data_dir))
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(shared.layout,)) as pool:
+            pending = set()
+            for name, rain in scenarios:
+                pending.add(pool.submit(_run_scenario, name, list(rain), model_kwargs, keep_series))
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        yield fut.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    yield fut.result()
+    finally:
+        shared.close()
+
+
+def rain_file_scenarios(paths):
+    for path in paths:
+        # ten sam odczyt co SewerSystemModel(rain_file=...): kolumny rain.csv i opady_godzinowe.csv
+        yield os.path.splitext(os.path.basename(path))[0], load_rain_file(path)
+
+
+def synthetic_storms(count, hours=168, seed=0):
+    """
+    Losowe burze do studiów Monte Carlo: blok opadu o losowym początku, czasie trwania
+    i intensywności, z trójkątnym rozkładem w czasie (jak triangular.csv).
+    """
+    rng = np.random.default_rng(seed)
+    for i in range(count):
+        rain = np.zeros(hours)
+        start = int(rng.integers(0, max(1, hours - 12)))
+        duration = int(rng.integers(1, 25))
+        peak = float(rng.gamma(2.0, 6.0))
+        t = np.arange(duration)
+        shape = 1.0 - np.abs(2.0 * (t + 0.5) / duration - 1.0)
+        end = min(hours, start + duration)
+        rain[start:end] = (peak * shape)[: end - start]
+        yield f"storm_{seed}_{i}", rain
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Równoległe uruchamianie wielu scenariuszy opadowych.")
+    parser.add_argument("--rain_dir", type=str, default=None,
+                        help="Katalog z plikami deszczu (*.csv, kolumna rain_mm_h)")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Liczba losowych burz Monte Carlo")
+    parser.add_argument("--seed", type=int, default=0, help="Ziarno generatora burz")
+    parser.add_argument("--workers", type=int, default=None, help="Liczba procesów (domyślnie: wszystkie rdzenie)")
+    parser.add_argument("--max_hours", type=int, default=168, help="Czas trwania symulacji w godzinach")
+    parser.add_argument("--max_capacity", type=int, default=1700, help="Maksymalna przepustowość oczyszczalni")
+    parser.add_argument("--vectorized", action="store_true", help="Użyj silnika tablicowego")
+    parser.add_argument("--out", type=str, default="data/ensemble_summary.csv", help="Plik z podsumowaniem")
+    parser.add_argument("--series_dir", type=str, default=None,
+                        help="Opcjonalny katalog na pełne wyniki godzinowe (CSV na scenariusz)")
+    args = parser.parse_args(argv)
+    configure_logging(quiet=True)
+
+    def scenarios():
+        if args.rain_dir:
+            yield from rain_file_scenarios(sorted(glob.glob(os.path.join(args.rain_dir, "*.csv"))))
+        if args.synthetic:
+            yield from synthetic_storms(args.synthetic, hours=args.max_hours, seed=args.seed)
+
+    if args.series_dir:
+        os.makedirs(args.series_dir, exist_ok=True)
+
+    fields = ["scenario", "hours", "max_total_flow", "overflow_hours", "final_retention"]
+    count = 0
+    with open(args.out, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for summary, results in run_ensemble(
+            scenarios(), workers=args.workers, keep_series=args.series_dir is not None,
+            max_hours=args.max_hours, max_capacity=args.max_capacity, vectorized=args.vectorized,
+        ):
+            writer.writerow(summary)
+            f.flush()
+            if results is not None:
+                results.to_csv(os.path.join(args.series_dir, f"{summary['scenario']}.csv"))
+            count += 1
+            print(f"[ENSEMBLE] {count}: {summary['scenario']} max={summary['max_total_flow']:.1f} m3/h")
+
+    print(f"[ENSEMBLE] Zapisano podsumowanie {count} scenariuszy: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os
+import pandas as pd
+
+from .log import get_logger
+from .network import load_network
+
+log = get_logger("inputs")
+
+
+# === DANE WEJŚCIOWE MODELU (wczytywane raz, współdzielone między modelami) ===
+class ModelInputs:
+    """
+    Stałe dane sieci potrzebne w SewerSystemModel.__init__:
+      - coords       – {ID: {"lat": ..., "lon": ...}} z wspolrzedne.csv
+      - areas        – {id_sensor: area_km2} z areas.csv (albo None)
+      - impervious   – {id_sensor: impervious} z impervious.csv (albo None)
+      - hourly_means – DataFrame z mean_flows.csv (kolumny month, hour, przepływomierze)
+      - network      – CompiledNetwork z network.csv (albo None – model użyje grafu domyślnego)
+      - mean_tables  – opcjonalnie gotowe tablice średnich policzone przez model-wzorzec
+                       (patrz SewerSystemModel.mean_tables); model nie przelicza ich wtedy z hourly_means
+    """
+
+    def __init__(self, coords, areas, impervious, hourly_means, mean_flows_path=None, network=None,
+                 mean_tables=None):
+        self.coords = coords
+        self.areas = areas
+        self.impervious = impervious
+        self.hourly_means = hourly_means
+        self.mean_flows_path = mean_flows_path
+        self.network = network
+        self.mean_tables = mean_tables
+
+
+def load_inputs(data_dir="data"):
+    """Wczytuje pliki CSV z katalogu danych do ModelInputs."""
+    # === Wczytanie współrzędnych z pliku CSV ===
+    coords_path = os.path.join(data_dir, "wspolrzedne.csv")
+    if os.path.exists(coords_path):
+        coords_df = pd.read_csv(coords_path)
+        coords = coords_df.set_index("ID")[["lat", "lon"]].to_dict(orient="index")
+        log.info("Wczytano %d współrzędnych z pliku: %s", len(coords), coords_path)
+    else:
+        log.warning("Brak pliku współrzędnych, używam wartości domyślnych.")
+        coords = {}
+
+    imp_path = os.path.join(data_dir, "impervious.csv")
+    if os.path.exists(imp_path):
+        impervious = pd.read_csv(imp_path).set_index("id_sensor")["impervious"].to_dict()
+    else:
+        impervious = None
+
+    area_path = os.path.join(data_dir, "areas.csv")
+    if os.path.exists(area_path):
+        areas = pd.read_csv(area_path).set_index("id_sensor")["area_km2"].to_dict()
+    else:
+        areas = None
+
+    # Średnie przepływy dla każdego miesiąca i godziny dla każdego przepływomierza
+    mean_flows_path = os.path.join(data_dir, "mean_flows.csv")
+    hourly_means = None
+    if os.path.exists(mean_flows_path):
+        df_h = pd.read_csv(mean_flows_path)
+        df_h.columns = df_h.columns.str.strip()
+        df_h["month"] = pd.to_numeric(df_h["month"], errors="coerce").astype("Int64")
+        df_h["hour"] = pd.to_numeric(df_h["hour"], errors="coerce").astype("Int64")
+        hourly_means = df_h
+
+    # Topologia sieci (skompilowana raz na treść pliku, patrz model.network)
+    network_path = os.path.join(data_dir, "network.csv")
+    network = load_network(network_path) if os.path.exists(network_path) else None
+
+    return ModelInputs(coords, areas, impervious, hourly_means, mean_flows_path, network)
@@ -0,0 +1,77 @@
+"""
+Logowanie modelu.
+
+Komunikaty modelu idą przez moduł logging (logger "sewer" i jego dzieci):
+  - DEBUG – diagnostyka per węzeł (przepływomierze, przelew, oczyszczalnia) co godzinę,
+  - INFO  – podsumowanie godziny i komunikaty przy tworzeniu modelu,
+  - WARNING i wyżej – problemy z danymi.
+
+Diagnostyka per węzeł jest formatowana tylko wtedy, gdy ktoś jej słucha
+(logger.isEnabledFor), więc w trybie cichym nie kosztuje nic poza jednym porównaniem.
+Opcjonalny ślad JSON Lines zapisuje te same pola jako strukturalne rekordy.
+"""
+import json
+import logging
+import sys
+
+ROOT_LOGGER = "sewer"
+
+
+def get_logger(name):
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def trace(event, **fields):
+    """Pola rekordu dla JsonTraceHandler – przekazywane jako extra=trace(...)."""
+    return {"trace_event": event, "trace_fields": fields}
+
+
+class JsonTraceHandler(logging.Handler):
+    """Zapisuje rekordy z polami trace(...) jako jedną linię JSON na rekord."""
+
+    def __init__(self, path):
+        super().__init__(level=logging.DEBUG)
+        self.stream = open(path, "w", encoding="utf-8")
+
+    def emit(self, record):
+        event = getattr(record, "trace_event", None)
+        if event is None:
+            return
+        try:
+            line = {"event": event, "level": record.levelname, **record.trace_fields}
+            self.stream.write(json.dumps(line, ensure_ascii=False) + "\n")
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        try:
+            self.stream.close()
+        finally:
+            super().close()
+
+
+def configure_logging(level="INFO", quiet=False, trace_path=None):
+    """
+    Konfiguruje logger "sewer":
+      level      – poziom komunikatów na konsoli (DEBUG pokazuje diagnostykę węzłów),
+      quiet      – tryb headless: na konsolę trafiają tylko ostrzeżenia i błędy,
+      trace_path – ścieżka pliku JSON Lines z rekordami DEBUG (niezależnie od konsoli).
+    """
+    logger = logging.getLogger(ROOT_LOGGER)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    logger.propagate = False
+
+    console_level = logging.WARNING if quiet else logging.getLevelName(str(level).upper())
+    console = logging.StreamHandler(sys.stdout)
+    console.setLevel(console_level)
+    console.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(console)
+
+    logger_level = console_level
+    if trace_path:
+        logger.addHandler(JsonTraceHandler(trace_path))
+        logger_level = logging.DEBUG
+    logger.setLevel(logger_level)
+    return logger
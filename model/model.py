@@ -1,9 +1,15 @@
 from mesa import Model
 from .agents import BaseSensorAgent, OverflowPointAgent, SewagePlantAgent
-from mesa.datacollection import DataCollector
+from .inputs import load_inputs
+from .log import get_logger, trace
+from .network import OVERFLOW, PLANT, SENSOR, compile_graph, load_network
+from .profiling import StepProfiler
+from .rain import RainSeries, load_rain_file
+from .recorder import ResultRecorder
+import logging
 import math
+import numpy as np
 import pandas as pd
-import os
 
 def _calculate_distance(loc1, loc2):
     lat1, lon1 = loc1
@@ -11,119 +17,110 @@ def _calculate_distance(loc1, loc2):
     return math.sqrt((lat1 - lat2) ** 2 + (lon1 - lon2) ** 2)
 
 
-# MODEL SYSTEMU KANALIZACYJNEGO
-class SewerSystemModel(Model):
-    def __init__(self, graph=None, mean_flows=None, max_capacity=1700, max_hours=168, rain_file="data/rain.csv", start_month=1,):
-
-        #graf przepływomierzy
-        default_graph = {
-            "KP1": ["M1"],
-            "KP2": ["M1"],
-            "KP4": ["M1"],
-            "KP6": ["M1"],
-            "KP7": ["KP16"],
-            "KP8": ["M1"],
-            "KP9": ["KP8"],
-            "KP10": ["KP8"],
-            "KP11": ["M1"],
-            "KP16": ["KP2", "KP26"],
-            "KP25": ["KP2", "KP26"],
-            "G-T1": ["M1"],
-            "ŁPA-P1": ["KP8"],
-            "LBT1": ["M1"],
-            "M1": ["Oczyszczalnia"],
-            }
-        import os
-        import pandas as pd
-        # === Wczytanie współrzędnych z pliku CSV ===
-        coords_path = os.path.join("data", "wspolrzedne.csv")
-        if os.path.exists(coords_path):
-            coords_df = pd.read_csv(coords_path)
-            coords = coords_df.set_index("ID")[["lat", "lon"]].to_dict(orient="index")
-            print(f"Wczytano {len(coords)} współrzędnych z pliku: {coords_path}")
-        else:
-            print("Brak pliku współrzędnych, używam wartości domyślnych.")
-            coords = {}
-        self.coords = coords
+def _node_param(network, name, k, table=None):
+    """Parametr węzła k: z pliku sieci, potem z tabeli (areas.csv / impervious.csv), na końcu domyślny."""
+    value = float(getattr(network, name)[k])
+    if not math.isnan(value):
+        return value
+    sensor_id = network.ids[k]
+    if table is not None and sensor_id in table:
+        return table[sensor_id]
+    return DEFAULT_SENSOR_PARAMS[name]
+
+
+log = get_logger("model")
+
+# graf przepływomierzy, gdy w danych nie ma pliku sieci (data/network.csv)
+DEFAULT_GRAPH = {
+    "KP1": ["M1"],
+    "KP2": ["M1"],
+    "KP4": ["M1"],
+    "KP6": ["M1"],
+    "KP7": ["KP16"],
+    "KP8": ["M1"],
+    "KP9": ["KP8"],
+    "KP10": ["KP8"],
+    "KP11": ["M1"],
+    "KP16": ["KP2", "KP26"],
+    "KP25": ["KP2", "KP26"],
+    "G-T1": ["M1"],
+    "ŁPA-P1": ["KP8"],
+    "LBT1": ["M1"],
+    "M1": ["Oczyszczalnia"],
+}
+# parametry przepływomierza, których nie podano w pliku sieci ani w areas.csv / impervious.csv
+DEFAULT_SENSOR_PARAMS = {"area": 3.0, "impervious": 0.5, "k_sensor": 0.8, "alpha": 1.2, "pipe_loss": 0.95}
 
-        imp_path = os.path.join("data", "impervious.csv")
-        if os.path.exists(imp_path):
-            df_imp = pd.read_csv(imp_path).set_index("id_sensor")
-        else:
-            df_imp = None
 
-        area_path = os.path.join("data", "areas.csv")
-        if os.path.exists(area_path):
-            df_area = pd.read_csv(area_path).set_index("id_sensor")
-        else:
-            df_area = None
+# MODEL SYSTEMU KANALIZACYJNEGO
+class SewerSystemModel(Model):
+    def __init__(self, graph=None, mean_flows=None, max_capacity=1700, max_hours=168, rain_file="data/rain.csv", start_month=1,
+                 vectorized=False, rain_intensity=None, inputs=None, rain_depth_method="window", network=None,
+                 routing_workers=1):
+
+        # === Dane wejściowe (współrzędne, powierzchnie, średnie przepływy) ===
+        # można je przekazać gotowe (np. ensemble), wtedy model nie czyta plików CSV
+        if inputs is None:
+            inputs = load_inputs("data")
+        self.inputs = inputs
+        self.coords = inputs.coords
+        areas = inputs.areas
+        impervious = inputs.impervious
 
         self.current_hour = 1
         self.current_month = start_month
         self.running = True
 
-        #Wczytujemy średnie przepływy dla każdej godziny dla każdego przepływomierza z pliku srednie_godzinowe.csv
+        #Wczytujemy średnie przepływy dla każdej godziny dla każdego przepływomierza z pliku mean_flows.csv
         if mean_flows is None:
-            import pandas as pd, os
-            file_path = os.path.join("data", "mean_flows.csv")
-            df_h = pd.read_csv(file_path)
-
-            # Normalizacja kolumny Godzina
-            # if pd.api.types.is_datetime64_any_dtype(df_h.get("Godzina", pd.Series([]))):
-            #     df_h["Godzina"] = pd.to_datetime(df_h["Godzina"]).dt.hour
-            # else:
-            #     df_h["Godzina"] = pd.to_numeric(df_h["Godzina"], errors="coerce").astype("Int64")
-
-            # całość tabeli średnich godzinowych (używana w każdym kroku)
-
-            df_h.columns = df_h.columns.str.strip()
-            df_h["month"] = pd.to_numeric(df_h["month"], errors="coerce").astype("Int64")
-            df_h["hour"] = pd.to_numeric(df_h["hour"], errors="coerce").astype("Int64")
-
-            self.hourly_means_df = df_h
+            file_path = inputs.mean_flows_path
+            if inputs.hourly_means is None:
+                raise FileNotFoundError(f"Brak pliku średnich przepływów: {file_path}")
+
+            # całość tabeli średnich godzinowych – przeliczana raz do tablicy (miesiąc, godzina, licznik)
+            self.hourly_means_df = inputs.hourly_means
+            shared_tables = getattr(inputs, "mean_tables", None)
+            if shared_tables is not None:
+                self._mean_columns = shared_tables["columns"]
+                self._mean_column_table = shared_tables["column_table"]
+                self._mean_table_valid = shared_tables["valid"]
+                self._mean_rows = {}
+            else:
+                self._build_hourly_mean_table(self.hourly_means_df)
 
             # Ustawienie mean_flows na startową godzinę symulacji
             # self.current_hour zaczyna się od 1 (czyli godzina pod względem doby to (1-1)%24 = 0)
-            # start_hour = (getattr(self, "current_hour", 1) - 1) % 24
-            # row = df_h.loc[df_h["Godzina"] == start_hour]
             start_hour = (self.current_hour - 1) % 24
-            row = df_h.loc[
-                (df_h["month"] == self.current_month) &
-                (df_h["hour"] == start_hour)
-                ]
-            if row.empty:
-                row = df_h.loc[
-                    (df_h["month"] == self.current_month) &
-                    (df_h["hour"] == 0)
-                    ]
-            if row.empty:
-                raise ValueError(
-                    f"Brak base flow dla month={self.current_month}, hour={start_hour} "
-                    f"w pliku {file_path}"
-                )
-            mean_flows = row.drop(columns=["month", "hour"]).iloc[0].to_dict()
-
-            print(
-                f"Wczytano base flow z {file_path}. "
-                f"Startowy miesiąc={self.current_month}, godzina={start_hour}."
+            mean_flows = self._select_means_for_hour(start_hour)
+
+            log.info(
+                "Wczytano base flow z %s. Startowy miesiąc=%s, godzina=%s.",
+                file_path, self.current_month, start_hour,
             )
-            print(f"Dostępne liczniki: {len(mean_flows)}")
+            log.info("Dostępne liczniki: %d", len(mean_flows))
         else:
+            shared_tables = None
             self.hourly_means_df = None
-            # if row.empty:
-            #     # jeśli brakuje wiersza, to 0
-            #     row = df_h.loc[df_h["Godzina"] == 0]
-            # słownik {przepływomierz: średni przepływ}
-        #     mean_flows = row.drop(columns=["Godzina"]).iloc[0].to_dict()
-        #
-        #     print(f"Wczytano średnie godzinowe z {file_path}. Startowa godzina={start_hour}.")
-        #     print(f"Dostępne liczniki: {len(mean_flows)}")
-        # else:
-        #     self.hourly_means_df = None
+            self._mean_columns = list(mean_flows.keys())
+            row = np.array([float(v) for v in mean_flows.values()])
+            self._mean_column_table = np.broadcast_to(row, (12, 24, len(row)))
+            self._mean_table_valid = np.ones((12, 24), dtype=bool)
+            self._mean_rows = {}
 
         self.mean_flows = mean_flows
 
-        self.graph = graph or default_graph
+        # === Sieć: gotowa CompiledNetwork, plik sieci, słownik graph albo data/network.csv ===
+        if isinstance(network, str):
+            network = load_network(network)
+        elif network is None:
+            if graph:
+                network = compile_graph(graph)
+            else:
+                network = getattr(inputs, "network", None) or compile_graph(DEFAULT_GRAPH)
+        self.network = network
+        self.graph = network.to_graph()
+        self.overflow_id = network.single(OVERFLOW)
+        self.plant_id = network.single(PLANT)
         self.max_capacity = max_capacity
         self.max_hours = max_hours
         self.kp26_split_factor = 0.0  # ułamek, jaka część powinna iść na KP26
@@ -132,24 +129,37 @@ class SewerSystemModel(Model):
         self.warning_threshold = 2000  # po tym zaczynamy wykorzystywać przelew KP26
 
         self.required_emergency_diversion = 0.0
-        self.diversion_candidates = {"KP16": 0.0, "KP25": 0.0}
 
-        # Intensywność deszczu
-        file_path = os.path.join(rain_file[0:rain_file.rfind("/")],rain_file[rain_file.rfind("/")+1:])
-        # file_path = os.path.join("data", "rain.csv") #standardowy plik csv - różne wartości opadów
-        # file_path = os.path.join("data/rain_experiments", "realistic.csv") # eksperymenty - nazwa pliku do podmiany
-        df_rain = pd.read_csv(file_path)
-        self.rain_intensity_data = df_rain["rain_mm_h"].tolist()
+        # Intensywność deszczu (gotowa seria mm/h ma pierwszeństwo przed plikiem)
+        if rain_intensity is not None:
+            self.rain_intensity_data = [float(v) for v in rain_intensity]
+        else:
+            # np. "data/rain.csv" albo "data/rain_experiments/realistic.csv"
+            self.rain_intensity_data = load_rain_file(rain_file).tolist()
 
         self.current_rain_intensity = 0.0
         self.current_rain_depth = 0.0
-        self.rain_memory_lambda = 0.92
+        self.current_rain_lagged = 0.0   # i(t-1) – opad opóźniony dla spływu
+        self.current_rain_storage = 0.0  # storage(t) = 0.9 * storage(t-1) + D(t)
+        self.rain_memory_lambda = 0.92  # do kalibracji (w literaturze typowo 0.9-0.98)
+        self.rain_depth_window = 6  # liczba godzin sumowanych do rain depth
+        self.storage_decay = 0.9
+
+        # serie opadowe dla całego horyzontu – krok tylko je indeksuje
+        # rain_depth_method: "window" (Kozłowski, suma z N godzin) albo "reservoir" (SWMM)
+        self.rain_depth_method = rain_depth_method
+        self.rain_series = RainSeries(
+            self.rain_intensity_data, max_hours, window=self.rain_depth_window, method=rain_depth_method,
+            memory_lambda=self.rain_memory_lambda, storage_decay=self.storage_decay,
+        )
 
         # --- PRZEPŁYWOMIERZE ---
-        self.sensors = {}
-        for i, (sensor_id, downstreams) in enumerate(self.graph.items()):
-            if sensor_id in ("KP26", "Oczyszczalnia"):
-                continue
+        # (przy silniku tablicowym stan agentów jest uzupełniany dopiero przy odczycie – patrz sensors)
+        self.engine = None
+        self._sensors = {}
+        ids = network.ids
+        for i, k in enumerate(network.nodes(SENSOR).tolist()):
+            sensor_id = ids[k]
 
             mean_flow = mean_flows.get(sensor_id, 50.0)
             if sensor_id in self.coords:
@@ -158,176 +168,268 @@ class SewerSystemModel(Model):
             else:
                 lat = 49.68 + i * 0.001
                 lon = 19.21 + i * 0.001
-            self.sensors[sensor_id] = BaseSensorAgent(
+            diversion = int(network.diversion[k])
+            self._sensors[sensor_id] = BaseSensorAgent(
                 unique_id=i,
                 model=self,
                 location_id=sensor_id,
                 flow_data=None,
                 location=(lat, lon),
-                area=df_area.loc[sensor_id]["area_km2"] if df_area is not None and sensor_id in df_area.index else 3.0,
+                area=_node_param(network, "area", k, areas),
                 mean_flow=mean_flow,
-                k_sensor=0.8,
-                alpha=1.2,
-                impervious_factor=df_imp.loc[sensor_id]["impervious"] if df_imp is not None and sensor_id in df_imp.index else 0.5,
-                downstream_ids=downstreams,
-                pipe_loss=0.95
+                k_sensor=_node_param(network, "k_sensor", k),
+                alpha=_node_param(network, "alpha", k),
+                impervious_factor=_node_param(network, "impervious", k, impervious),
+                downstream_ids=[ids[j] for j in network.downstream(k).tolist()],
+                pipe_loss=_node_param(network, "pipe_loss", k),
+                diversion_target=ids[diversion] if diversion >= 0 else None,
             )
+        # węzły, z których oczyszczalnia może kierować nadmiar na przelew (dawniej KP16 i KP25)
+        self.diversion_sensors = [a for a in self.sensors.values() if a.diversion_target is not None]
 
         self.upstreams = {}
         for src, downstreams in self.graph.items():
             for dst in downstreams:
-                if dst not in ("KP26", "Oczyszczalnia"):
+                if dst in self.sensors:
                     self.upstreams.setdefault(dst, []).append(src)
 
         # --- PRZELEW ---
-        if "KP26" in self.coords:
-            overflow_loc = (self.coords["KP26"]["lat"], self.coords["KP26"]["lon"])
+        if self.overflow_id in self.coords:
+            overflow_loc = (self.coords[self.overflow_id]["lat"], self.coords[self.overflow_id]["lon"])
         else:
             overflow_loc = (49.68, 19.22)
-        self.overflow_point = OverflowPointAgent(999, self, "KP26", overflow_loc)
+        self.overflow_point = OverflowPointAgent(999, self, self.overflow_id, overflow_loc)
         # --- OCZYSZCZALNIA ---
-        if "Oczyszczalnia" in self.coords:
-            plant_loc = (self.coords["Oczyszczalnia"]["lat"], self.coords["Oczyszczalnia"]["lon"])
+        if self.plant_id in self.coords:
+            plant_loc = (self.coords[self.plant_id]["lat"], self.coords[self.plant_id]["lon"])
         else:
             plant_loc = (49.682, 19.213)
         self.plant = SewagePlantAgent(1000, self, max_capacity, plant_loc, normal_flow=1200)
 
-        # --- KOLEJNOŚĆ topologiczna ---
-        self.sensor_order = self._sort_sensors_topologically()
+        # --- KOLEJNOŚĆ topologiczna (policzona przy kompilacji sieci) ---
+        self.sensor_order = [ids[k] for k in network.order.tolist()]
+        self.sensor_ids = list(self.sensor_order)
+
+        # --- ŚREDNIE PRZEPŁYWY (miesiąc × godzina × przepływomierz) ---
+        # gotowe tablice pasują tylko do tej samej skompilowanej sieci, z której je policzono
+        if shared_tables is not None and "mean_flow_table" in shared_tables and network is inputs.network:
+            self.mean_flow_table = shared_tables["mean_flow_table"]
+            self.local_mean_flow_table = shared_tables["local_mean_flow_table"]
+        else:
+            self._build_sensor_mean_tables()
+        self._sensor_agents = [self.sensors[sid] for sid in self.sensor_ids]
+
+        # --- SILNIK TABLICOWY (opcjonalnie zamiast pętli po agentach) ---
+        # routing_workers > 1: szerokie poziomy sieci liczone w puli wątków (duże sieci syntetyczne)
+        self.routing_workers = routing_workers
+        self.engine = self._make_engine() if vectorized else None
 
         # --- ZBIERANIE DANYCH ---
-        def make_sensor_lambda(sensor_id):
-            return lambda m: m.sensors[sensor_id].current_flow
-
-        self.datacollector = DataCollector(
-            model_reporters={
-                "TotalFlow": lambda m: m.plant.estimated_flow,
-                "OverflowActive": lambda m: int(m.overflow_point.active),
-                **{f"{sid}_Flow": make_sensor_lambda(sid) for sid in self.sensors}
-            }
-        )
+        # kolumnowy rejestr (przepływy i statusy wszystkich przepływomierzy + stan oczyszczalni)
+        self.recorder = ResultRecorder(list(self.sensors), capacity=max_hours)
+        self.datacollector = self.recorder  # zgodność ze starym API (get_model_vars_dataframe)
+        if self.engine is not None:
+            self._recorder_order = np.array([self.engine.index[sid] for sid in self.sensors])
+        self._recorder_agents = list(self.sensors.values())
+
+        # --- PROFILOWANIE (model.profiling.StepProfiler, domyślnie wyłączone) ---
+        self.profiler = None
 
     # ===============================================
     # Pomocnicze metody
     # ===============================================
 
+    def enable_profiling(self, per_node=False):
+        """Włącza liczniki czasu faz step() (i opcjonalnie węzłów); zwraca StepProfiler."""
+        self.profiler = StepProfiler(per_node=per_node)
+        return self.profiler
+
+    @property
+    def sensors(self):
+        """
+        {ID: BaseSensorAgent}. Silnik tablicowy nie kopiuje stanu do agentów co godzinę
+        (koszt rósłby z liczbą węzłów) – robi to dopiero tu, przy pierwszym odczycie po kroku.
+        """
+        engine = self.engine
+        if engine is not None and not engine.agents_synced:
+            engine.sync_agents()
+        return self._sensors
+
     def get_sensor_by_id(self, sensor_id):
         return self.sensors.get(sensor_id)
 
-    # Metoda do sortowania topologicznego przepływomierzy (dzięki niej gdy czujnik liczy swój przepływ ma zsumowane dopływy od poprzedników)
-    def _sort_sensors_topologically(self):
-        """Prosty topologiczny sort grafu (upstream → downstream)."""
-        visited = set()
-        order = []
-
-        def dfs(node):
-            if node in visited:
-                return
-            visited.add(node)
-            for nxt in self.graph.get(node, []):
-                if nxt not in ("KP26", "Oczyszczalnia"):
-                    dfs(nxt)
-            order.append(node)
-
-        for node in self.graph:
-            dfs(node)
-        return order[::-1]  # od najdalszego do najbliższego oczyszczalni
-
-    # def _select_means_for_hour(self, hour_0_23: int) -> dict:
-    #     if getattr(self, "hourly_means_df", None) is None:
-    #         return self.mean_flows
-    #     df_h = self.hourly_means_df
-    #     row = df_h.loc[df_h["Godzina"] == int(hour_0_23)]
-    #     if row.empty:
-    #         # fallback na 0, jeśli brakuje
-    #         row = df_h.loc[df_h["Godzina"] == 0]
-    #     return row.drop(columns=["Godzina"]).iloc[0].to_dict()
+    def sensor_state(self):
+        """Przepływy i statusy (0 = NORMAL, 1 = ALERT) przepływomierzy w kolejności self.sensors."""
+        if self.engine is not None:
+            order = self._recorder_order
+            return self.engine.current_flow[order], self.engine.alert[order]
+        agents = self._recorder_agents
+        return [a.current_flow for a in agents], [a.status == "ALERT" for a in agents]
+
+    def _make_engine(self):
+        # import dopiero tu – scipy.sparse nie jest potrzebne w trybie agentowym (krótszy start)
+        from .engine import VectorizedEngine
+        return VectorizedEngine(self, workers=self.routing_workers)
+
+    def _build_hourly_mean_table(self, df_h):
+        """
+        Przelicza tabelę mean_flows.csv do tablicy (12, 24, liczba kolumn).
+        Brakująca godzina w danym miesiącu dostaje wartości z godziny 0 (jak wcześniej przy filtrowaniu),
+        a miesiące bez żadnych danych są oznaczone jako niepoprawne w _mean_table_valid.
+        """
+        columns = [c for c in df_h.columns if c not in ("month", "hour")]
+        table = np.full((12, 24, len(columns)), np.nan)
+        valid = np.zeros((12, 24), dtype=bool)
+        values = df_h[columns].to_numpy(dtype=float)
+        for row, (month, hour) in enumerate(zip(df_h["month"], df_h["hour"])):
+            if pd.isna(month) or pd.isna(hour) or not (1 <= month <= 12 and 0 <= hour < 24):
+                continue
+            if not valid[month - 1, hour]:  # pierwszy pasujący wiersz, jak .iloc[0]
+                table[month - 1, hour] = values[row]
+                valid[month - 1, hour] = True
+        for m in range(12):
+            if valid[m, 0]:
+                missing = ~valid[m]
+                table[m, missing] = table[m, 0]
+                valid[m, missing] = True
+
+        self._mean_columns = columns
+        self._mean_column_table = table
+        self._mean_table_valid = valid
+        self._mean_rows = {}
+
+    def _build_sensor_mean_tables(self):
+        """
+        Tablice (12, 24, N) w kolejności self.sensor_ids:
+          - mean_flow_table       – średni przepływ w przepływomierzu,
+          - local_mean_flow_table – średni przepływ minus średnie dopływów (lokalna część).
+        Przepływomierze spoza pliku zachowują mean_flow nadany przy tworzeniu agenta.
+        """
+        col_index = {c: i for i, c in enumerate(self._mean_columns)}
+        table = self._mean_column_table
+        n = len(self.sensor_ids)
+        mean = np.empty((12, 24, n))
+        local_mean = np.empty((12, 24, n))
+        for j, sid in enumerate(self.sensor_ids):
+            if sid in col_index:
+                mean[..., j] = table[..., col_index[sid]]
+            else:
+                mean[..., j] = self.sensors[sid].mean_flow
+            mean_up = np.zeros((12, 24))
+            for u in self.upstreams.get(sid, []):
+                if u in col_index:
+                    mean_up = mean_up + table[..., col_index[u]]
+            local_mean[..., j] = np.maximum(mean[..., j] - mean_up, 0.0)
+        self.mean_flow_table = mean
+        self.local_mean_flow_table = local_mean
+
+    @property
+    def mean_tables(self):
+        """
+        Tablice średnich do ponownego użycia w innych modelach tej samej sieci
+        (ModelInputs.mean_tables, np. w workerach ensemble) – bez przeliczania mean_flows.csv.
+        """
+        if self.hourly_means_df is None:
+            return None
+        return {
+            "columns": self._mean_columns,
+            "column_table": self._mean_column_table,
+            "valid": self._mean_table_valid,
+            "mean_flow_table": self.mean_flow_table,
+            "local_mean_flow_table": self.local_mean_flow_table,
+        }
+
+    def _check_mean_table(self, hour_0_23):
+        if self.hourly_means_df is None:
+            return
+        month = self.current_month
+        if not (1 <= month <= 12) or not self._mean_table_valid[month - 1, hour_0_23]:
+            raise ValueError(
+                f"Brak danych base flow dla month={month}, hour={hour_0_23}"
+            )
+
     def _select_means_for_hour(self, hour_0_23: int) -> dict:
         if getattr(self, "hourly_means_df", None) is None:
             return self.mean_flows
 
-        df_h = self.hourly_means_df
-
-        row = df_h.loc[
-            (df_h["month"] == self.current_month) &
-            (df_h["hour"] == int(hour_0_23))
-            ]
-
-        if row.empty:
-            row = df_h.loc[
-                (df_h["month"] == self.current_month) &
-                (df_h["hour"] == 0)
-                ]
-
-        if row.empty:
-            raise ValueError(
-                f"Brak danych base flow dla month={self.current_month}, hour={hour_0_23}"
-            )
-
-        return row.drop(columns=["month", "hour"]).iloc[0].to_dict()
+        self._check_mean_table(hour_0_23)
+        key = (self.current_month, int(hour_0_23))
+        row = self._mean_rows.get(key)
+        if row is None:
+            values = self._mean_column_table[self.current_month - 1, int(hour_0_23)].tolist()
+            row = dict(zip(self._mean_columns, values))
+            self._mean_rows[key] = row
+        return row
 
     # do aktualizacji godziny i przepływów dla danej godziny
     def refresh_mean_flows_for_current_hour(self):
         hour_0_23 = (self.current_hour - 1) % 24
         self.mean_flows = self._select_means_for_hour(hour_0_23)
 
-        # 1) Aktualizacja mean_flow na podstawie pliku srednie_godinowe.csv
-        for sid, agent in self.sensors.items():
-            if sid in self.mean_flows:
-                agent.mean_flow = float(self.mean_flows[sid])
-
-        # 2) Obliczenie local_mean_flow na podstawie mean_flow dla danej godziny
-        for sid, agent in self.sensors.items():
-            upstream_ids = self.upstreams.get(sid, [])
-            mean_up = sum(
-                float(self.mean_flows[u]) for u in upstream_ids
-                if u in self.mean_flows
-            )
-            agent.local_mean_flow = max(agent.mean_flow - mean_up, 0.0)
+        # mean_flow i local_mean_flow to gotowe wiersze tablic (bez filtrowania DataFrame co krok)
+        month_idx = (self.current_month - 1) % 12
+        mean = self.mean_flow_table[month_idx, hour_0_23]
+        local_mean = self.local_mean_flow_table[month_idx, hour_0_23]
+
+        if self.engine is not None:
+            self.engine.set_mean_flows(mean, local_mean)
+            return
+
+        for agent, m, lm in zip(self._sensor_agents, mean.tolist(), local_mean.tolist()):
+            agent.mean_flow = m
+            agent.local_mean_flow = lm
 
     # ===============================================
     # Pojedynczy krok symulacji
     # ===============================================
     def step(self):
-        print(f"\n===== Godzina {self.current_hour} =====")
+        prof = self.profiler
+        if prof is not None:
+            t = prof.start()
+        log.info("\n===== Godzina %d =====", self.current_hour)
 
         # --- 1. Reset buforów ---
-        for sensor in self.sensors.values():
-            sensor.reset_buffers()
+        if self.engine is None:
+            for sensor in self.sensors.values():
+                sensor.reset_buffers()
         self.plant.reset_buffers()
         self.overflow_point.reset_buffers()
         self.kp26_split_factor = 0.0
+        if prof is not None:
+            t = prof.lap("reset", t)
 
         self.refresh_mean_flows_for_current_hour()
+        if prof is not None:
+            t = prof.lap("mean_flows", t)
 
-        # --- 2. Ustawiamy warunki pogodowe ---
-        if self.current_hour <= len(self.rain_intensity_data):
-            #pobieramy intensywność opadów w obecnej godzinie
-            self.current_rain_intensity = self.rain_intensity_data[self.current_hour - 1]
-            ''' Rain depth - podejście Kozłowskiego - suma z ostatnich N godzin '''
-            window = 6
-            idx = self.current_hour - 1
-            start = max(0, idx - window + 1)
-            D = sum(self.rain_intensity_data[start: idx + 1])
-            self.current_rain_depth = D
-
-            ''' Alternatywa - w ramach porównania - podejście modelu SWMM - rezerwuar nieliniowy '''
-            # lam = self.rain_memory_lambda #do kalibracji (w literaturze typowo 0.9-0.98)
-            # self.current_rain_depth = (
-            #     self.rain_memory_lambda * self.current_rain_depth + self.current_rain_intensity
-            # )
-        else:
-            self.current_rain_intensity = 0.0
-            self.current_rain_depth = 0.0
+        # --- 2. Ustawiamy warunki pogodowe (serie policzone w __init__) ---
+        (self.current_rain_intensity, self.current_rain_depth,
+         self.current_rain_lagged, self.current_rain_storage) = self.rain_series.at(self.current_hour - 1)
+        if prof is not None:
+            t = prof.lap("rain", t)
 
         # --- 3. Obliczenie przepływów w każdym sensorze (upstream → downstream) ---
-        for sid in self.sensor_order:
-            sensor = self.sensors[sid]
-            sensor.step()   # liczy lokalny przepływ
-            sensor.route()  # przekazuje dalej (uwzględnia przelew, straty)
+        if self.engine is not None:
+            self.engine.step()  # cała sieć naraz (wektory, routing poziomami)
+        elif prof is not None and prof.per_node:
+            for sid in self.sensor_order:
+                sensor = self.sensors[sid]
+                node_start = prof.start()
+                sensor.step()
+                sensor.route()
+                prof.node(sid, prof.start() - node_start)
+        else:
+            for sid in self.sensor_order:
+                sensor = self.sensors[sid]
+                sensor.step()   # liczy lokalny przepływ
+                sensor.route()  # przekazuje dalej (uwzględnia przelew, straty)
+        if prof is not None:
+            t = prof.lap("sensors", t)
 
         # --- 4. Obliczenie stanu oczyszczalni i przelewu ---
         self.plant.step()
+        if prof is not None:
+            t = prof.lap("plant", t)
         self.overflow_point.step()
         if self.overflow_point.active:
             diverted = self.overflow_point.diverted_flow
@@ -340,21 +442,205 @@ class SewerSystemModel(Model):
             # print(f"  przelew KP26: {diverted:.2f} m3/h")
             # print(f"  nadmiar NIEWYŁADOWANY: {remaining:.2f} m3/h")
 
+        if prof is not None:
+            t = prof.lap("overflow", t)
+
         # --- 5. Zebranie danych ---
-        self.datacollector.collect(self)
+        self.recorder.collect(self)
+        if prof is not None:
+            t = prof.lap("collect", t)
 
         # --- 6. Aktualizacja godziny ---
         self.current_hour += 1
         if self.current_hour > self.max_hours:
             self.running = False
 
-        print("\n=== PODSUMOWANIE GODZINY ===")
-
-        print(f"Dopływ do oczyszczalni: {self.plant.inflow_from_graph:.2f} m3/h")
-        print(f"Oczyszczono: {self.plant.treated_this_hour:.2f} m3/h")
-        print(f"W retencji: {self.plant.retention_volume:.2f} m3")
+        if log.isEnabledFor(logging.INFO):
+            hour = self.current_hour - 1
+            log.info(
+                "\n=== PODSUMOWANIE GODZINY ===\n"
+                "Dopływ do oczyszczalni: %.2f m3/h\n"
+                "Oczyszczono: %.2f m3/h\n"
+                "W retencji: %.2f m3\n"
+                "Przelew KP26 aktywny: %s\n"
+                "Do rzeki: %.2f m3/h\n"
+                "============================\n",
+                self.plant.inflow_from_graph, self.plant.treated_this_hour,
+                self.plant.retention_volume, self.overflow_point.active, self.overflow_point.diverted_flow,
+                extra=trace(
+                    "hour", hour=hour, plant_inflow=self.plant.inflow_from_graph,
+                    treated=self.plant.treated_this_hour,
+                    retention_volume=self.plant.retention_volume,
+                    overflow_active=self.overflow_point.active, diverted=self.overflow_point.diverted_flow,
+                    rain_intensity=self.current_rain_intensity, rain_depth=self.current_rain_depth,
+                ),
+            )
+        if prof is not None:
+            prof.lap("log", t)
+            prof.step_done()
 
-        print(f"Przelew KP26 aktywny: {self.overflow_point.active}")
-        print(f"Do rzeki: {self.overflow_point.diverted_flow:.2f} m3/h")
+    # ===============================================
+    # Cały horyzont naraz (tryb trajektorii)
+    # ===============================================
+    def run_trajectory(self):
+        """
+        Symuluje wszystkie pozostałe godziny (current_hour..max_hours) jednym przebiegiem
+        i zwraca te same wyniki co kolejne wywołania step() (recorder.to_dataframe()).
+
+        Hydrologia przepływomierzy jest liniowym filtrem serii opadowej: przepływy lokalne
+        (godziny × przepływomierze) liczone są z tablic średnich i serii opadowych, a akumulacja
+        w dół sieci to jedno mnożenie przez macierz transferu. Split KP26 jest zerowany przed
+        routingiem w każdej godzinie (jak w step()), więc przepływy nie zależą od stanu
+        oczyszczalni – w pętli zostaje tylko automat oczyszczalni i przelewu.
+        Po przebiegu stan agentów odpowiada ostatniej godzinie.
+        """
+        first = self.current_hour
+        if first > self.max_hours:
+            return self.recorder.to_dataframe()
+        hours = np.arange(first, self.max_hours + 1)
+        engine = self.engine if self.engine is not None else self._make_engine()
+        plant = self.plant
+        overflow = self.overflow_point
+
+        # --- 1. Średnie przepływy (godziny × przepływomierze) ---
+        hour_0_23 = (hours - 1) % 24
+        for h in np.unique(hour_0_23).tolist():
+            self._check_mean_table(h)
+        month_idx = (self.current_month - 1) % 12
+        mean = self.mean_flow_table[month_idx][hour_0_23]
+        local_mean = self.local_mean_flow_table[month_idx][hour_0_23]
+
+        # --- 2. Opady i hydrologia lokalna ---
+        intensity, depth, lagged, storage = self.rain_series.window(first - 1, self.max_hours)
+        q_base = local_mean + engine.GAMMA * storage[:, None]
+        q_rain = engine.runoff_coef * lagged[:, None] ** engine.alpha
+        local_flow = np.maximum(0.0, q_base + q_rain)
+
+        # --- 3. Akumulacja w dół sieci (split KP26 = 0 przy routingu) ---
+        flows = np.asarray(engine.transfer_matrix @ local_flow.T).T
+        alert = flows > 1.5 * mean
+        plant_in = flows @ engine.to_plant
+        overflow_in = flows @ engine.to_overflow
+        available = flows @ engine.plant_diversion_sources
+        inflow = plant_in + plant.k_rain_depth * depth
+
+        # --- 4. Oczyszczalnia i przelew (SewagePlantAgent.step(), OverflowPointAgent.step()) ---
+        T = len(hours)
+        estimated = np.zeros(T)
+        treated = np.zeros(T)
+        retention = np.zeros(T)
+        retained_out = np.zeros(T)
+        released_out = np.zeros(T)
+        split_out = np.zeros(T)
+        diverted_out = np.zeros(T)
+        unhandled_out = np.zeros(T)
+        status_out = np.zeros(T, dtype=np.int32)
+        active_out = np.zeros(T, dtype=np.int32)
+        warning_out = np.zeros(T, dtype=np.int32)
+
+        nominal = plant.nominal_capacity
+        accelerated = plant.accelerated_capacity
+        retention_capacity = plant.retention_capacity
+        release_rate = plant.retention_release_rate
+        max_accel = plant.max_accelerated_hours
+        overflow_capacity = overflow.capacity
+
+        volume = plant.retention_volume
+        streak = plant.accelerated_hours_streak
+        treated_now = plant.treated_this_hour
+        for t, (q_in, avail, q_overflow) in enumerate(zip(inflow.tolist(), available.tolist(), overflow_in.tolist())):
+            retained = min(max(0.0, q_in - accelerated), max(0.0, retention_capacity - volume))
+            volume += retained
+            to_treat = q_in - retained
+            released = min(volume, release_rate, max(0.0, accelerated - to_treat))
+            volume -= released
+            to_treat += released
+
+            if to_treat <= nominal:
+                estimated[t] = to_treat
+                treated_now = to_treat
+                streak = 0
+            elif to_treat <= accelerated:
+                # w trybie przyspieszonym treated_this_hour zostaje z poprzedniej godziny
+                estimated[t] = to_treat
+                streak += 1
+                status_out[t] = 1
+                warning_out[t] = streak >= max_accel
+            else:
+                estimated[t] = accelerated
+                treated_now = accelerated
+                streak += 1
+                status_out[t] = 2
+                active_out[t] = 1
+                warning_out[t] = streak >= max_accel
+                if avail > 0:
+                    split_out[t] = max(0.0, min((to_treat - accelerated) / avail, 1.0))
+                diverted_out[t] = min(q_overflow, overflow_capacity)
+                unhandled_out[t] = max(0.0, q_overflow - overflow_capacity)
+
+            treated[t] = treated_now
+            retention[t] = volume
+            retained_out[t] = retained
+            released_out[t] = released
+
+        # --- 5. Zapis do recordera ---
+        order = np.array([engine.index[sid] for sid in self.recorder.sensor_ids], dtype=int)
+        self.recorder.extend(
+            floats={
+                "TotalFlow": estimated,
+                "PlantInflow": inflow,
+                "TreatedThisHour": treated,
+                "RetentionVolume": retention,
+                "RetainedThisHour": retained_out,
+                "ReleasedFromRetention": released_out,
+                "DivertedFlow": diverted_out,
+                "UnhandledOverflow": unhandled_out,
+                "KP26SplitFactor": split_out,
+                "RainIntensity": intensity,
+                "RainDepth": depth,
+            },
+            ints={
+                "Hour": hours,
+                "OverflowActive": active_out,
+                "PlantStatus": status_out,
+                "AccelWarning": warning_out,
+            },
+            sensor_flow=flows[:, order],
+            sensor_status=alert[:, order],
+        )
 
-        print("============================\n")
+        # --- 6. Stan modelu po ostatniej godzinie ---
+        engine.set_mean_flows(mean[-1], local_mean[-1])
+        engine.local_flow = local_flow[-1]
+        engine.current_flow = flows[-1]
+        engine.inflow_from_upstream = flows[-1] - local_flow[-1]
+        engine.alert = alert[-1]
+        engine.storage.fill(storage[-1])
+        engine.rain_buffer.fill(intensity[-1])
+        engine.sync_agents()
+
+        last = T - 1
+        plant.inflow_from_graph = float(plant_in[last])
+        plant.total_inflow_this_hour = float(inflow[last])
+        plant.estimated_flow = float(estimated[last])
+        plant.treated_this_hour = treated_now
+        plant.retention_volume = volume
+        plant.retained_this_hour = float(retained_out[last])
+        plant.released_from_retention = float(released_out[last])
+        plant.accelerated_hours_streak = streak
+        plant.status = SewagePlantAgent.STATUSES[status_out[last]]
+        plant.warning_code = "ENV_ACCEL_TOO_LONG" if warning_out[last] else None
+        overflow.inflow_from_graph = float(overflow_in[last])
+        overflow.active = bool(active_out[last])
+        overflow.diverted_flow = float(diverted_out[last])
+        overflow.unhandled_overflow = float(unhandled_out[last])
+
+        self.kp26_split_factor = float(split_out[last])
+        (self.current_rain_intensity, self.current_rain_depth,
+         self.current_rain_lagged, self.current_rain_storage) = self.rain_series.at(self.max_hours - 1)
+        self.mean_flows = self._select_means_for_hour(int(hour_0_23[last]))
+        self.current_hour = self.max_hours + 1
+        self.running = False
+
+        log.info("[SIM] Trajektoria: godziny %d–%d policzone jednym przebiegiem", first, self.max_hours)
+        return self.recorder.to_dataframe()
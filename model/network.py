@@ -0,0 +1,313 @@
+"""
+Topologia sieci kanalizacyjnej skompilowana do postaci indeksowej.
+
+Plik sieci (CSV, np. data/network.csv) opisuje węzły jeden pod drugim:
+
+    id,type,downstream,area,impervious,k_sensor,alpha,pipe_loss
+    KP16,sensor,KP2;KP26,,,,,
+    KP26,overflow,,,,,,
+    Oczyszczalnia,plant,,,,,,
+
+  - type        – sensor (przepływomierz), overflow (przelew) albo plant (oczyszczalnia),
+  - downstream  – następcy oddzieleni ";" (tylko przepływomierze mają odpływ),
+  - parametry   – puste pole = wartość domyślna modelu (areas.csv / impervious.csv / stałe).
+
+Przepływomierz z odpływem do dokładnie jednego przelewu i jednego przepływomierza jest węzłem
+przelewowym: przy aktywnym przelewie część jego odpływu trafia na przelew (dawniej KP16 / KP25).
+
+Kompilacja (walidacja, lista następców CSR, kolejność topologiczna z poziomami, tablice typów i parametrów)
+odbywa się raz na treść pliku: wynik jest trzymany w procesie, a przy podanym cache_dir
+(albo zmiennej SEWER_NETWORK_CACHE) także na dysku jako network_<hash treści>.npz.
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+
+FORMAT_VERSION = 2
+
+SENSOR, OVERFLOW, PLANT = 0, 1, 2
+KINDS = ("sensor", "overflow", "plant")
+PARAMS = ("area", "impervious", "k_sensor", "alpha", "pipe_loss")
+
+# skompilowane sieci w tym procesie (klucz = hash treści)
+_MEMO_SIZE = 16
+_memo = {}
+
+
+class NetworkError(ValueError):
+    """Niepoprawny opis sieci (nieznany węzeł, powtórzone ID, zły typ, ...)."""
+
+
+# === SKOMPILOWANA SIEĆ ===
+class CompiledNetwork:
+    """
+    Niezmienna, indeksowa postać sieci (tablice tylko do odczytu):
+      - ids              – ID węzłów w kolejności z pliku,
+      - kind             – typ węzła (SENSOR / OVERFLOW / PLANT),
+      - indptr, indices  – następcy węzła i: indices[indptr[i]:indptr[i + 1]] (CSR),
+      - share            – udział krawędzi w odpływie węzła (przy zamkniętym przelewie),
+      - order            – przepływomierze w kolejności topologicznej (upstream → downstream),
+                           ułożone poziomami: order[level_ptr[k]:level_ptr[k + 1]] to poziom k,
+      - level            – poziom węzła (-1 dla przelewów i oczyszczalni),
+      - diversion        – dla węzła przelewowego indeks przelewu, inaczej -1,
+      - diversion_main   – dla węzła przelewowego indeks następcy-przepływomierza, inaczej -1,
+      - area, impervious, k_sensor, alpha, pipe_loss – parametry (NaN = domyślne modelu).
+    """
+
+    ARRAYS = ("kind", "indptr", "indices", "share", "order", "level_ptr", "level", "diversion",
+              "diversion_main") + PARAMS
+
+    def __init__(self, key, ids, **arrays):
+        self.key = key
+        self.ids = tuple(ids)
+        self.index = {nid: i for i, nid in enumerate(self.ids)}
+        for name in self.ARRAYS:
+            value = np.array(arrays[name])
+            value.setflags(write=False)
+            setattr(self, name, value)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nodes(self, kind):
+        """Indeksy węzłów danego typu w kolejności z pliku."""
+        return np.flatnonzero(self.kind == kind)
+
+    def downstream(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    @property
+    def n_levels(self):
+        return len(self.level_ptr) - 1
+
+    def levels(self):
+        """Węzły kolejnych poziomów – w poziomie nie ma zależności między węzłami."""
+        return [self.order[self.level_ptr[k]:self.level_ptr[k + 1]] for k in range(self.n_levels)]
+
+    def single(self, kind):
+        """ID jedynego węzła danego typu (model obsługuje jedną oczyszczalnię i jeden przelew)."""
+        found = self.nodes(kind)
+        if len(found) != 1:
+            raise NetworkError(f"Sieć musi mieć dokładnie jeden węzeł typu {KINDS[kind]} (jest {len(found)})")
+        return self.ids[found[0]]
+
+    def to_graph(self):
+        """{ID przepływomierza: [ID następców]} – dawny słownik model.graph."""
+        ids = self.ids
+        return {ids[i]: [ids[j] for j in self.downstream(i)] for i in self.nodes(SENSOR)}
+
+    # ===============================================
+    # Cache na dysku
+    # ===============================================
+    def save(self, path):
+        arrays = {name: getattr(self, name) for name in self.ARRAYS}
+        tmp = path + ".part"
+        with open(tmp, "wb") as f:
+            np.savez(f, ids=np.array(self.ids, dtype=str), **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, key):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(key, data["ids"].tolist(), **{name: data[name] for name in cls.ARRAYS})
+
+
+# ===============================================
+# Kompilacja
+# ===============================================
+def topological_levels(kind, indptr, indices, ids=None):
+    """
+    Kolejność przepływomierzy upstream → downstream (Kahn, bez rekurencji) i poziomy zależności:
+    poziom 0 – węzły bez dopływu z innych przepływomierzy, poziom k – najdłuższa droga z poziomu 0.
+    Węzły jednego poziomu nie zależą od siebie. Zwraca (order, level_ptr, level):
+      - order                       – węzły posortowane poziomami (w poziomie – kolejność z pliku),
+      - order[level_ptr[k]:level_ptr[k + 1]] – węzły poziomu k,
+      - level                       – poziom każdego węzła (-1 dla przelewów i oczyszczalni).
+    Cykl w sieci przepływomierzy → NetworkError z węzłami cyklu.
+    """
+    n = len(kind)
+    sensor = (kind == SENSOR).tolist()
+    ptr, nxt = indptr.tolist(), indices.tolist()
+    # następcy-przepływomierze każdego węzła (kolejność krawędzi z pliku)
+    succ = [[v for v in nxt[ptr[u]:ptr[u + 1]] if sensor[v]] if sensor[u] else [] for u in range(n)]
+    indegree = [0] * n
+    for targets in succ:
+        for v in targets:
+            indegree[v] += 1
+
+    level = [-1] * n
+    frontier = [u for u in range(n) if sensor[u] and indegree[u] == 0]
+    order, level_ptr = [], [0]
+    depth = 0
+    while frontier:
+        order.extend(frontier)
+        level_ptr.append(len(order))
+        ready = []
+        for u in frontier:
+            level[u] = depth
+            for v in succ[u]:
+                indegree[v] -= 1
+                if indegree[v] == 0:
+                    ready.append(v)
+        frontier = sorted(ready)
+        depth += 1
+
+    if len(order) < sum(sensor):
+        blocked = [u for u in range(n) if sensor[u] and level[u] < 0]
+        raise NetworkError(_describe_cycle(blocked, succ, ids))
+    return (np.array(order, dtype=np.int64), np.array(level_ptr, dtype=np.int64),
+            np.array(level, dtype=np.int64))
+
+
+def _describe_cycle(blocked, succ, ids):
+    """Komunikat z jednym cyklem wśród węzłów, których Kahn nie zdjął (iteracyjnie, po poprzednikach)."""
+    remaining = set(blocked)
+    pred = {u: [] for u in blocked}
+    for u in blocked:
+        for v in succ[u]:
+            if v in remaining:
+                pred[v].append(u)
+    node, path, seen = blocked[0], [], {}
+    while node not in seen:
+        seen[node] = len(path)
+        path.append(node)
+        # każdy węzeł bez poziomu ma poprzednika bez poziomu (inaczej Kahn by go zdjął)
+        node = pred[node][0]
+    # ścieżka idzie pod prąd – odwracamy, żeby cykl był w kierunku przepływu
+    cycle = path[seen[node]:][::-1]
+    start = cycle.index(min(cycle))  # od węzła najwcześniej w pliku
+    cycle = cycle[start:] + cycle[:start + 1]
+    name = (lambda i: ids[i]) if ids is not None else str
+    return (f"Cykl w sieci: {' → '.join(name(i) for i in cycle)} "
+            f"({len(remaining)} węzłów bez kolejności: w cyklu albo poniżej)")
+
+
+def compile_nodes(nodes, key):
+    """
+    nodes – lista (ID, typ, [ID następców], {parametr: wartość albo None}) w kolejności z pliku.
+    Zwraca CompiledNetwork albo rzuca NetworkError.
+    """
+    ids = [nid for nid, _, _, _ in nodes]
+    index = {}
+    for i, nid in enumerate(ids):
+        if not nid:
+            raise NetworkError(f"Węzeł nr {i + 1} nie ma ID")
+        if nid in index:
+            raise NetworkError(f"Powtórzone ID węzła: {nid}")
+        index[nid] = i
+
+    n = len(nodes)
+    kind = np.empty(n, dtype=np.int8)
+    params = {name: np.full(n, np.nan) for name in PARAMS}
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    indices, share = [], []
+    diversion = np.full(n, -1, dtype=np.int64)
+    diversion_main = np.full(n, -1, dtype=np.int64)
+
+    for i, (nid, node_kind, downstream, values) in enumerate(nodes):
+        if node_kind not in KINDS:
+            raise NetworkError(f"{nid}: nieznany typ węzła {node_kind!r} (dozwolone: {', '.join(KINDS)})")
+        kind[i] = KINDS.index(node_kind)
+        if downstream and kind[i] != SENSOR:
+            raise NetworkError(f"{nid}: węzeł typu {node_kind} nie może mieć odpływu")
+        unknown = [d for d in downstream if d not in index]
+        if unknown:
+            raise NetworkError(f"{nid}: nieznane węzły w odpływie: {', '.join(unknown)}")
+        for name, value in values.items():
+            if value is not None:
+                params[name][i] = value
+
+        targets = [index[d] for d in downstream]
+        indices.extend(targets)
+        indptr[i + 1] = len(indices)
+        if targets:
+            share.extend([1.0 / len(targets)] * len(targets))
+
+    kind_of = kind.tolist()
+    for i in np.flatnonzero(kind == SENSOR).tolist():
+        targets = indices[indptr[i]:indptr[i + 1]]
+        if len(targets) == 2 and sorted(kind_of[t] for t in targets) == [SENSOR, OVERFLOW]:
+            # węzeł przelewowy: przy zamkniętym przelewie wszystko do drugiego następcy
+            main, overflow = targets if kind_of[targets[0]] == SENSOR else targets[::-1]
+            diversion[i], diversion_main[i] = overflow, main
+            for e in range(indptr[i], indptr[i + 1]):
+                share[e] = 1.0 if indices[e] == main else 0.0
+
+    indices = np.array(indices, dtype=np.int64)
+    order, level_ptr, level = topological_levels(kind, indptr, indices, ids)
+    return CompiledNetwork(
+        key, ids, kind=kind, indptr=indptr, indices=indices, share=np.array(share, dtype=float),
+        order=order, level_ptr=level_ptr, level=level, diversion=diversion, diversion_main=diversion_main, **params,
+    )
+
+
+def _remember(network):
+    if len(_memo) >= _MEMO_SIZE:
+        _memo.pop(next(iter(_memo)))
+    _memo[network.key] = network
+    return network
+
+
+def _content_key(data):
+    return hashlib.sha256(f"v{FORMAT_VERSION}:".encode() + data).hexdigest()[:16]
+
+
+def parse_network_csv(text):
+    """Wiersze pliku sieci → lista węzłów dla compile_nodes()."""
+    reader = csv.DictReader(io.StringIO(text))
+    missing = {"id", "type"} - set(reader.fieldnames or ())
+    if missing:
+        raise NetworkError(f"Brak kolumn w pliku sieci: {', '.join(sorted(missing))}")
+    nodes = []
+    for line, row in enumerate(reader, start=2):
+        nid = (row.get("id") or "").strip()
+        downstream = [d.strip() for d in (row.get("downstream") or "").split(";") if d.strip()]
+        values = {}
+        for name in PARAMS:
+            raw = (row.get(name) or "").strip()
+            try:
+                values[name] = float(raw) if raw else None
+            except ValueError:
+                raise NetworkError(f"Wiersz {line} ({nid}): {name}={raw!r} nie jest liczbą") from None
+        nodes.append((nid, (row.get("type") or "").strip(), downstream, values))
+    return nodes
+
+
+def load_network(path, cache_dir=None):
+    """Wczytuje i kompiluje plik sieci (raz na treść pliku; cache w procesie i opcjonalnie na dysku)."""
+    with open(path, "rb") as f:
+        data = f.read()
+    key = _content_key(data)
+    if key in _memo:
+        return _memo[key]
+
+    cache_dir = cache_dir or os.environ.get("SEWER_NETWORK_CACHE")
+    cache_path = os.path.join(cache_dir, f"network_{key}.npz") if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        return _remember(CompiledNetwork.load(cache_path, key))
+
+    network = compile_nodes(parse_network_csv(data.decode("utf-8-sig")), key)
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        network.save(cache_path)
+    return _remember(network)
+
+
+def compile_graph(graph, plant_id="Oczyszczalnia", overflow_id="KP26"):
+    """
+    Dawny słownik {przepływomierz: [następcy]} jako CompiledNetwork. Cele plant_id i overflow_id
+    są oczyszczalnią i przelewem (dodawane zawsze, także gdy nikt do nich nie odprowadza).
+    """
+    key = _content_key(json.dumps([graph, plant_id, overflow_id], sort_keys=False).encode())
+    if key in _memo:
+        return _memo[key]
+    empty = dict.fromkeys(PARAMS)
+    nodes = [(sid, "sensor", list(downstream), empty)
+             for sid, downstream in graph.items() if sid not in (plant_id, overflow_id)]
+    nodes.append((overflow_id, "overflow", [], empty))
+    nodes.append((plant_id, "plant", [], empty))
+    return _remember(compile_nodes(nodes, key))
@@ -0,0 +1,141 @@
+"""
+Zapis wyników do plików kolumnowych w trakcie symulacji.
+
+ResultRecorder oddaje co flush_every godzin porcję wierszy do ResultWriter, który dopisuje
+ją jako osobną grupę wierszy (Parquet) albo rekord-batch (Arrow IPC). Dzięki temu
+wielolatowe przebiegi godzinowe nie muszą trzymać całej historii w pamięci.
+Format wybierany jest po rozszerzeniu: .parquet albo .arrow / .feather.
+
+Wymaga pakietu pyarrow.
+"""
+import os
+
+# typy kolumn w pliku (reszta kolumn – przepływy – to float64)
+INT8_SUFFIXES = ("_Status",)
+INT8_COLUMNS = ("OverflowActive", "PlantStatus", "AccelWarning")
+INT32_COLUMNS = ("Hour",)
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise ImportError("Zapis wyników do Parquet/Arrow wymaga pakietu pyarrow (pip install pyarrow)") from e
+    return pa
+
+
+def _column_type(pa, name):
+    if name in INT8_COLUMNS or name.endswith(INT8_SUFFIXES):
+        return pa.int8()
+    if name in INT32_COLUMNS:
+        return pa.int32()
+    return pa.float64()
+
+
+def _is_arrow_ipc(path):
+    return os.path.splitext(path)[1].lower() in (".arrow", ".feather", ".ipc")
+
+
+# === ZAPIS PORCJAMI ===
+class ResultWriter:
+    """Dopisuje porcje kolumn (słownik nazwa → tablica) do pliku Parquet albo Arrow IPC."""
+
+    def __init__(self, path, compression="zstd"):
+        self.pa = _require_pyarrow()
+        self.path = path
+        self.compression = compression
+        self.schema = None
+        self._writer = None
+        self.rows_written = 0
+
+    def _open(self, names):
+        pa = self.pa
+        self.schema = pa.schema([(name, _column_type(pa, name)) for name in names])
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if _is_arrow_ipc(self.path):
+            self._writer = pa.ipc.new_file(self.path, self.schema)
+        else:
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(self.path, self.schema, compression=self.compression)
+
+    def write(self, columns):
+        if not columns:
+            return
+        if self._writer is None:
+            self._open(list(columns))
+        pa = self.pa
+        arrays = [pa.array(columns[field.name], type=field.type) for field in self.schema]
+        batch = pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+        if batch.num_rows == 0:
+            return
+        if _is_arrow_ipc(self.path):
+            self._writer.write_batch(batch)
+        else:
+            self._writer.write_table(pa.Table.from_batches([batch]))  # jedna grupa wierszy na porcję
+        self.rows_written += batch.num_rows
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# === ODCZYT ===
+def read_results(path, columns=None, hours=None):
+    """
+    Wczytuje wyniki z pliku Parquet / Arrow IPC jako DataFrame.
+
+    columns – lista kolumn (None = wszystkie),
+    hours   – (od, do) zakres godzin symulacji, lewostronnie domknięty; grupy wierszy
+              spoza zakresu są pomijane na podstawie statystyk kolumny Hour.
+    """
+    pa = _require_pyarrow()
+    if columns is not None:
+        columns = list(columns)
+        read_columns = columns if hours is None or "Hour" in columns else columns + ["Hour"]
+    else:
+        read_columns = None
+
+    if _is_arrow_ipc(path):
+        import pyarrow.compute as pc
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            batches = []
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                if hours is not None:
+                    hour = batch.column(batch.schema.get_field_index("Hour"))
+                    if pc.max(hour).as_py() < hours[0] or pc.min(hour).as_py() >= hours[1]:
+                        continue
+                if read_columns is not None:
+                    batch = batch.select(read_columns)
+                batches.append(batch)
+            if batches:
+                table = pa.Table.from_batches(batches)
+            else:
+                schema = reader.schema
+                table = schema.empty_table() if read_columns is None else pa.schema(
+                    [schema.field(c) for c in read_columns]).empty_table()
+    else:
+        import pyarrow.parquet as pq
+        filters = None
+        if hours is not None:
+            filters = [("Hour", ">=", hours[0]), ("Hour", "<", hours[1])]
+        table = pq.read_table(path, columns=read_columns, filters=filters)
+
+    if hours is not None:
+        import pyarrow.compute as pc
+        hour = table.column("Hour")
+        mask = pc.and_(pc.greater_equal(hour, hours[0]), pc.less(hour, hours[1]))
+        table = table.filter(mask)
+    if columns is not None:
+        table = table.select(columns)
+    return table.to_pandas()
@@ -0,0 +1,93 @@
+"""
+Wbudowane liczniki czasu dla SewerSystemModel.step().
+
+    model = SewerSystemModel(...)
+    profiler = model.enable_profiling(per_node=True)
+    while model.running:
+        model.step()
+    print(profiler.report())
+    profiler.dump("data/profile.json")
+
+Wyłączony profiler (model.profiler = None) nic nie kosztuje – step() sprawdza tylko jedną zmienną.
+"""
+import json
+import time
+
+
+# === LICZNIKI FAZ KROKU ===
+class StepProfiler:
+    """
+    Czas ścienny i liczba wywołań każdej fazy kroku (reset, mean_flows, rain, sensors,
+    plant, overflow, collect, log) oraz opcjonalnie czas step()+route() każdego przepływomierza
+    (tylko pętla po agentach – silnik tablicowy liczy całą sieć jednym wywołaniem).
+    """
+
+    PHASES = ("reset", "mean_flows", "rain", "sensors", "plant", "overflow", "collect", "log")
+
+    def __init__(self, per_node=False):
+        self.per_node = per_node
+        self.reset()
+
+    def reset(self):
+        self.seconds = {}
+        self.calls = {}
+        self.node_seconds = {}
+        self.node_calls = {}
+        self.steps = 0
+
+    # --- pomiar ---
+    @staticmethod
+    def start():
+        return time.perf_counter()
+
+    def lap(self, phase, started):
+        """Dolicza czas od `started` do fazy i zwraca bieżący czas (początek następnej fazy)."""
+        now = time.perf_counter()
+        self.seconds[phase] = self.seconds.get(phase, 0.0) + now - started
+        self.calls[phase] = self.calls.get(phase, 0) + 1
+        return now
+
+    def node(self, node_id, seconds):
+        self.node_seconds[node_id] = self.node_seconds.get(node_id, 0.0) + seconds
+        self.node_calls[node_id] = self.node_calls.get(node_id, 0) + 1
+
+    def step_done(self):
+        self.steps += 1
+
+    # --- wyniki ---
+    def stats(self):
+        """Słownik gotowy do JSON: fazy (sekundy, wywołania, średnio ms, udział) i węzły."""
+        total = sum(self.seconds.values())
+        order = [p for p in self.PHASES if p in self.seconds] + [p for p in self.seconds if p not in self.PHASES]
+        phases = {
+            p: {
+                "seconds": self.seconds[p],
+                "calls": self.calls[p],
+                "mean_ms": 1000.0 * self.seconds[p] / self.calls[p],
+                "share": self.seconds[p] / total if total > 0 else 0.0,
+            }
+            for p in order
+        }
+        nodes = {
+            n: {"seconds": s, "calls": self.node_calls[n], "mean_us": 1e6 * s / self.node_calls[n]}
+            for n, s in sorted(self.node_seconds.items(), key=lambda item: -item[1])
+        }
+        return {"steps": self.steps, "total_seconds": total, "phases": phases, "nodes": nodes}
+
+    def report(self, top_nodes=10):
+        """Tabela tekstowa (fazy od najdroższej, do top_nodes najwolniejszych węzłów)."""
+        stats = self.stats()
+        lines = [f"=== PROFIL KROKU: {stats['steps']} godzin, {stats['total_seconds']:.3f} s ==="]
+        for phase, s in sorted(stats["phases"].items(), key=lambda item: -item[1]["seconds"]):
+            lines.append(
+                f"{phase:<12} {s['seconds']:9.4f} s  {s['mean_ms']:9.4f} ms/wywołanie  {100 * s['share']:5.1f}%"
+            )
+        if stats["nodes"]:
+            lines.append("--- najwolniejsze węzły (step + route) ---")
+            for node_id, s in list(stats["nodes"].items())[:top_nodes]:
+                lines.append(f"{node_id:<12} {s['seconds']:9.4f} s  {s['mean_us']:9.1f} µs/krok")
+        return "\n".join(lines)
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump(self.stats(), f, indent=2)
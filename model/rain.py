@@ -0,0 +1,156 @@
+"""
+Serie opadowe liczone z góry dla całego horyzontu symulacji.
+
+Seria deszczu jest znana przed startem, więc wielkości, które model liczył co godzinę
+(rain depth z ostatnich N godzin, opad opóźniony o godzinę dla spływu, zbiornik
+infiltracji storage = decay * storage + D) liczymy raz, wektorowo, a krok tylko je indeksuje.
+Funkcje działają wzdłuż ostatniej osi, więc obsługują też tablice (scenariusze × godziny).
+"""
+import numpy as np
+import pandas as pd
+
+# długość bloku filtru rekurencyjnego; dla małych decay skracana, żeby decay ** -(blok - 1)
+# nie przekroczyło FILTER_MAX_SCALE (inaczej inf / NaN we float64)
+FILTER_BLOCK = 32
+FILTER_MAX_SCALE = 1e100
+
+# nazwy kolumny z intensywnością w plikach opadów (rain.csv / eksperymenty, opady_godzinowe.csv)
+RAIN_COLUMNS = ("rain_mm_h", "Opady [mm/h]")
+
+
+def load_rain_file(path):
+    """
+    Wczytuje godzinową serię opadu [mm/h] z pliku CSV.
+    Obsługuje format rain.csv (kolumna rain_mm_h) i pomiary w formacie opady_godzinowe.csv.
+    """
+    df = pd.read_csv(path, encoding="utf-8-sig")
+    df.columns = df.columns.str.strip()
+    for column in RAIN_COLUMNS:
+        if column in df.columns:
+            return pd.to_numeric(df[column], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+    raise ValueError(f"Brak kolumny z opadem ({', '.join(RAIN_COLUMNS)}) w pliku: {path}")
+
+
+def first_order_filter(x, decay):
+    """
+    y(t) = decay * y(t-1) + x(t), y(-1) = 0 – wzdłuż ostatniej osi.
+    Zamiast scipy.signal.lfilter (import scipy.signal to ~0.5 s startu): w bloku FILTER_BLOCK godzin
+    y(j) = decay^j * cumsum(x(i) * decay^-i) + decay^(j+1) * y(przed blokiem), bloki po kolei.
+    Blok jest tak krótki, żeby decay^-i nie wyszło poza FILTER_MAX_SCALE (przy bloku 1 to zwykła rekurencja).
+    """
+    x = np.asarray(x, dtype=float)
+    if decay == 0:
+        return x.copy()
+    block_len = FILTER_BLOCK
+    log_decay = abs(np.log(abs(decay)))
+    if log_decay > 0:
+        block_len = int(max(1, min(FILTER_BLOCK, np.log(FILTER_MAX_SCALE) // log_decay + 1)))
+    y = np.empty_like(x)
+    k = np.arange(block_len)
+    up = decay ** k
+    down = decay ** -k.astype(float)
+    carry = np.zeros(x.shape[:-1] + (1,))
+    for start in range(0, x.shape[-1], block_len):
+        stop = min(start + block_len, x.shape[-1])
+        n = stop - start
+        block = up[:n] * np.cumsum(x[..., start:stop] * down[:n], axis=-1) + carry * (decay * up[:n])
+        y[..., start:stop] = block
+        carry = block[..., -1:]
+    return y
+
+
+def pad_series(intensity, horizon):
+    """Seria intensywności przycięta / dopełniona zerami do `horizon` godzin."""
+    intensity = np.asarray(intensity, dtype=float)
+    out = np.zeros(intensity.shape[:-1] + (horizon,))
+    k = min(horizon, intensity.shape[-1])
+    out[..., :k] = intensity[..., :k]
+    return out
+
+
+def rolling_depth(intensity, window, n_data):
+    """
+    Rain depth – podejście Kozłowskiego: suma opadu z ostatnich `window` godzin
+    (sumy prefiksowe zamiast sumowania okna co godzinę). Po końcu danych D = 0, jak w modelu.
+    """
+    intensity = np.asarray(intensity, dtype=float)
+    prefix = np.concatenate(
+        [np.zeros(intensity.shape[:-1] + (1,)), np.cumsum(intensity, axis=-1)], axis=-1
+    )
+    hours = np.arange(intensity.shape[-1])
+    start = np.maximum(0, hours - window + 1)
+    depth = prefix[..., hours + 1] - prefix[..., start]
+    # różnica sum prefiksowych może dać -1e-13 zamiast 0 – opad nie jest ujemny
+    depth = np.maximum(depth, 0.0)
+    depth[..., n_data:] = 0.0
+    return depth
+
+
+def reservoir_depth(intensity, memory_lambda, n_data):
+    """
+    Alternatywa – podejście modelu SWMM (rezerwuar nieliniowy):
+    D(t) = lambda * D(t-1) + i(t). Po końcu danych D = 0, jak w modelu.
+    """
+    intensity = np.asarray(intensity, dtype=float)
+    depth = first_order_filter(intensity, memory_lambda)
+    depth[..., n_data:] = 0.0
+    return depth
+
+
+def lagged_intensity(intensity):
+    """i(t-1) – bufor 1-godzinny dla spływu powierzchniowego (na starcie 0)."""
+    intensity = np.asarray(intensity, dtype=float)
+    lagged = np.zeros_like(intensity)
+    lagged[..., 1:] = intensity[..., :-1]
+    return lagged
+
+
+def storage_filter(depth, decay=0.9):
+    """storage(t) = decay * storage(t-1) + D(t), storage(-1) = 0."""
+    return first_order_filter(depth, decay)
+
+
+# === SERIE DLA JEDNEGO MODELU ===
+class RainSeries:
+    """
+    Intensywność, rain depth, opad opóźniony i storage dla godzin 0..horizon-1.
+    method: "window" (suma z ostatnich `window` godzin) albo "reservoir" (rezerwuar SWMM).
+    """
+
+    def __init__(self, intensity, horizon, window=6, method="window", memory_lambda=0.92, storage_decay=0.9):
+        self.n_data = len(intensity)
+        # +1: opad opóźniony w pierwszej godzinie po końcu danych to jeszcze ostatnia wartość
+        self.horizon = max(int(horizon), self.n_data) + 1
+        self.storage_decay = storage_decay
+
+        self.intensity = pad_series(intensity, self.horizon)
+        self.intensity[self.n_data:] = 0.0
+        if method == "window":
+            self.depth = rolling_depth(self.intensity, window, self.n_data)
+        elif method == "reservoir":
+            self.depth = reservoir_depth(self.intensity, memory_lambda, self.n_data)
+        else:
+            raise ValueError(f"Nieznana metoda rain depth: {method}")
+        self.lagged = lagged_intensity(self.intensity)
+        self.storage = storage_filter(self.depth, storage_decay)
+
+    def window(self, start, stop):
+        """Serie (intensywność, depth, opad opóźniony, storage) dla indeksów godzin start..stop-1."""
+        n = max(0, stop - start)
+        inside = max(0, min(stop, self.horizon) - start)
+        out = tuple(np.zeros(n) for _ in range(4))
+        for dst, src in zip(out, (self.intensity, self.depth, self.lagged, self.storage)):
+            dst[:inside] = src[start:start + inside]
+        if inside < n:
+            beyond = np.arange(start + inside, stop) - self.horizon + 1
+            out[3][inside:] = self.storage[-1] * self.storage_decay ** beyond
+        return out
+
+    def at(self, idx):
+        """(intensywność, depth, opad opóźniony, storage) dla godziny o indeksie idx (od 0)."""
+        if idx < self.horizon:
+            return (float(self.intensity[idx]), float(self.depth[idx]),
+                    float(self.lagged[idx]), float(self.storage[idx]))
+        # poza horyzontem nie pada, a storage już tylko zanika
+        storage = float(self.storage[-1]) * self.storage_decay ** (idx - self.horizon + 1)
+        return 0.0, 0.0, 0.0, storage
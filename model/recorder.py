@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+
+from .agents import SewagePlantAgent
+
+
+# === KOLUMNOWY REJESTR WYNIKÓW (zamiast DataCollectora z lambdami) ===
+class ResultRecorder:
+    """
+    Zapisuje wyniki każdej godziny do prealokowanych tablic NumPy.
+
+    Kolumny skalarne (po jednej wartości na godzinę) i przepływy/statusy wszystkich
+    przepływomierzy trzymane są kolumnowo; DataFrame (albo tabela Arrow) powstaje
+    dopiero na żądanie. Gdy godzin jest więcej niż miejsca, tablice rosną porcjami.
+    """
+
+    # kolumny skalarne (jedna wartość na godzinę)
+    FLOAT_COLUMNS = (
+        "TotalFlow",                # plant.estimated_flow
+        "PlantInflow",              # dopływ do oczyszczalni (z grafu + składnik deszczowy)
+        "TreatedThisHour",
+        "RetentionVolume",
+        "RetainedThisHour",
+        "ReleasedFromRetention",
+        "DivertedFlow",             # przelew KP26 → rzeka
+        "UnhandledOverflow",
+        "KP26SplitFactor",
+        "RainIntensity",
+        "RainDepth",
+    )
+    INT_COLUMNS = (
+        "Hour",
+        "OverflowActive",
+        "PlantStatus",              # indeks w SewagePlantAgent.STATUSES
+        "AccelWarning",             # 1 gdy ENV_ACCEL_TOO_LONG
+    )
+    SENSOR_STATUSES = ("NORMAL", "ALERT")
+
+    def __init__(self, sensor_ids, capacity=168, chunk_size=1024):
+        self.sensor_ids = list(sensor_ids)
+        self.chunk_size = max(1, int(chunk_size))
+        self.size = 0
+        self.flushed_rows = 0   # wiersze już oddane do sink (nie ma ich w pamięci)
+        self.sink = None
+        self.flush_every = None
+        self._allocate(max(1, int(capacity)))
+
+    def _allocate(self, capacity):
+        n = len(self.sensor_ids)
+        self.capacity = capacity
+        self.floats = {name: np.zeros(capacity) for name in self.FLOAT_COLUMNS}
+        self.ints = {name: np.zeros(capacity, dtype=np.int32) for name in self.INT_COLUMNS}
+        self.sensor_flow = np.zeros((capacity, n))
+        self.sensor_status = np.zeros((capacity, n), dtype=np.int8)
+
+    def _grow(self, needed=1):
+        extra = max(self.chunk_size, needed)
+        self.capacity += extra
+        for name, arr in self.floats.items():
+            self.floats[name] = np.concatenate([arr, np.zeros(extra)])
+        for name, arr in self.ints.items():
+            self.ints[name] = np.concatenate([arr, np.zeros(extra, dtype=arr.dtype)])
+        self.sensor_flow = np.concatenate([self.sensor_flow, np.zeros((extra, self.sensor_flow.shape[1]))])
+        self.sensor_status = np.concatenate(
+            [self.sensor_status, np.zeros((extra, self.sensor_status.shape[1]), dtype=np.int8)]
+        )
+
+    def __len__(self):
+        return self.size
+
+    # ===============================================
+    # Zapis strumieniowy
+    # ===============================================
+    def stream_to(self, sink, flush_every=720):
+        """
+        Co flush_every godzin oddaje zebrane wiersze do sink (np. model.output.ResultWriter)
+        i zwalnia bufor – w pamięci zostaje najwyżej flush_every wierszy.
+        """
+        self.sink = sink
+        self.flush_every = max(1, int(flush_every))
+        if self.size == 0 and self.capacity > self.flush_every:
+            self._allocate(self.flush_every)
+
+    def flush(self):
+        if self.sink is None or self.size == 0:
+            return
+        self.sink.write(self.columns())
+        self.flushed_rows += self.size
+        self.size = 0
+
+    def close(self):
+        """Dopisuje ostatnią porcję i zamyka sink."""
+        if self.sink is None:
+            return
+        self.flush()
+        self.sink.close()
+
+    # ===============================================
+    # Zapis
+    # ===============================================
+    def collect(self, model):
+        if self.size == self.capacity:
+            self._grow()
+        i = self.size
+        plant = model.plant
+        overflow = model.overflow_point
+
+        f = self.floats
+        f["TotalFlow"][i] = plant.estimated_flow
+        f["PlantInflow"][i] = plant.total_inflow_this_hour
+        f["TreatedThisHour"][i] = plant.treated_this_hour
+        f["RetentionVolume"][i] = plant.retention_volume
+        f["RetainedThisHour"][i] = plant.retained_this_hour
+        f["ReleasedFromRetention"][i] = plant.released_from_retention
+        f["DivertedFlow"][i] = overflow.diverted_flow
+        f["UnhandledOverflow"][i] = overflow.unhandled_overflow
+        f["KP26SplitFactor"][i] = model.kp26_split_factor
+        f["RainIntensity"][i] = model.current_rain_intensity
+        f["RainDepth"][i] = model.current_rain_depth
+
+        c = self.ints
+        c["Hour"][i] = model.current_hour
+        c["OverflowActive"][i] = int(overflow.active)
+        c["PlantStatus"][i] = SewagePlantAgent.STATUSES.index(plant.status)
+        c["AccelWarning"][i] = int(plant.warning_code == "ENV_ACCEL_TOO_LONG")
+
+        flows, alerts = model.sensor_state()
+        self.sensor_flow[i] = flows
+        self.sensor_status[i] = alerts
+
+        self.size += 1
+        if self.flush_every is not None and self.size >= self.flush_every:
+            self.flush()
+
+    def extend(self, floats, ints, sensor_flow, sensor_status):
+        """
+        Dopisuje wiele godzin naraz (np. z SewerSystemModel.run_trajectory()).
+        floats / ints – słowniki kolumna → tablica długości T, sensor_flow / sensor_status – (T, N)
+        w kolejności self.sensor_ids. Przy zapisie strumieniowym porcje są oddawane co flush_every.
+        """
+        total = len(sensor_flow)
+        start = 0
+        while start < total:
+            room = total - start if self.flush_every is None else self.flush_every - self.size
+            stop = min(total, start + room)
+            k = stop - start
+            if self.size + k > self.capacity:
+                self._grow(self.size + k - self.capacity)
+            i = self.size
+            for name in self.FLOAT_COLUMNS:
+                self.floats[name][i:i + k] = floats[name][start:stop]
+            for name in self.INT_COLUMNS:
+                self.ints[name][i:i + k] = ints[name][start:stop]
+            self.sensor_flow[i:i + k] = sensor_flow[start:stop]
+            self.sensor_status[i:i + k] = sensor_status[start:stop]
+            self.size += k
+            start = stop
+            if self.flush_every is not None and self.size >= self.flush_every:
+                self.flush()
+
+    # ===============================================
+    # Odczyt
+    # ===============================================
+    def columns(self):
+        """Słownik kolumna → tablica (widok na zapisane wiersze, bez kopiowania)."""
+        n = self.size
+        data = {
+            "TotalFlow": self.floats["TotalFlow"][:n],
+            "OverflowActive": self.ints["OverflowActive"][:n],
+        }
+        for j, sid in enumerate(self.sensor_ids):
+            data[f"{sid}_Flow"] = self.sensor_flow[:n, j]
+        for name in self.FLOAT_COLUMNS[1:]:
+            data[name] = self.floats[name][:n]
+        for name in self.INT_COLUMNS:
+            if name != "OverflowActive":
+                data[name] = self.ints[name][:n]
+        for j, sid in enumerate(self.sensor_ids):
+            data[f"{sid}_Status"] = self.sensor_status[:n, j]
+        return data
+
+    def to_dataframe(self):
+        """Wiersze obecne w pamięci (przy zapisie strumieniowym – tylko te jeszcze nieoddane)."""
+        index = pd.RangeIndex(self.flushed_rows, self.flushed_rows + self.size)
+        return pd.DataFrame(self.columns(), index=index)
+
+    def to_arrow(self):
+        import pyarrow as pa
+        return pa.table(self.columns())
+
+    # zgodność z mesa.DataCollector
+    def get_model_vars_dataframe(self):
+        return self.to_dataframe()
@@ -0,0 +1,352 @@
+"""
+Serwer symulacji bez okien: lokalne API HTTP + strumień stanu (Server-Sent Events).
+
+    python run_server.py --port 8765
+
+Każda sesja ma własny model, SimulationThread i SnapshotChannel – tak samo jak dashboard,
+tylko zamiast okien pygame stan czytają klienci HTTP. Wszystko na bibliotece standardowej.
+
+    POST   /sessions                  utworzenie sesji, body JSON (opcjonalnie): rain_file, max_hours,
+                                      max_capacity, rain_depth_method, vectorized, interval_sec
+    GET    /sessions                  lista sesji
+    GET    /sessions/<id>             bieżący stan
+    GET    /sessions/<id>/layout      część stała (ID i położenia węzłów, połączenia)
+    GET    /sessions/<id>/stream      SSE: zdarzenie "snapshot" po każdej godzinie symulacji
+    POST   /sessions/<id>/start       wznowienie
+    POST   /sessions/<id>/pause       pauza
+    POST   /sessions/<id>/reset       nowy model (po resecie pauza)
+    POST   /sessions/<id>/speed       body {"interval_sec": 0.2}
+    DELETE /sessions/<id>             zatrzymanie i usunięcie sesji
+
+    curl -X POST localhost:8765/sessions -d '{"max_hours": 48}'
+    curl -N localhost:8765/sessions/<id>/stream
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from model.log import configure_logging
+from model.model import SewerSystemModel
+from visualisation.shared_state import SnapshotChannel, StateLayout
+from visualisation.simulation_engine import SimulationThread
+
+# ====== KONFIGURACJA ======
+DEFAULT_INTERVAL = 0.5
+MIN_INTERVAL = 0.01
+MAX_INTERVAL = 10.0
+STREAM_POLL = 0.02  # jak często strumień sprawdza licznik sekwencji kanału [s]
+STREAM_KEEPALIVE = 15.0  # komentarz SSE co tyle sekund ciszy (pauza), żeby proxy nie zamykało połączenia
+
+# parametry SewerSystemModel, które klient może podać przy tworzeniu sesji
+MODEL_OPTIONS = ("rain_file", "max_hours", "max_capacity", "rain_depth_method", "vectorized")
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# ====== SESJA ======
+class Session:
+    """Jeden model z własnym wątkiem symulacji; start w pauzie, jak dashboard."""
+
+    def __init__(self, session_id, options, interval_sec=DEFAULT_INTERVAL):
+        self.id = session_id
+        self.options = options
+        self.created = time.time()
+
+        self.stop_evt = threading.Event()
+        self.pause_evt = threading.Event()
+        self.pause_evt.set()
+
+        model = self.model_factory()
+        self.channel = SnapshotChannel.create(StateLayout.from_model(model), sim_interval=interval_sec)
+        self.thread = SimulationThread(self.model_factory, interval_sec, self.channel,
+                                       self.stop_evt, self.pause_evt, model=model)
+        self.thread.start()
+
+    def model_factory(self):
+        return SewerSystemModel(**self.options)
+
+    # --- sterowanie ---
+    def start(self):
+        self.pause_evt.clear()
+
+    def pause(self):
+        self.pause_evt.set()
+
+    def reset(self):
+        self.channel.controls["reset_cmd"] = True
+
+    def set_interval(self, interval_sec):
+        self.channel.controls["sim_interval"] = interval_sec
+
+    def close(self):
+        self.stop_evt.set()
+        self.thread.join(timeout=2.0)
+        self.channel.close()
+
+    @property
+    def closed(self):
+        return self.stop_evt.is_set()
+
+    # --- stan w JSON ---
+    def snapshot(self):
+        state = self.channel.read()
+        oid, _, _, active, diverted = state["overflow"]
+        point = state["point"]
+        return {
+            "session": self.id,
+            "seq": self.channel.version,
+            "hour": state["hour"],
+            "max_hours": state["max_hours"],
+            "running": state["running"],
+            "paused": self.pause_evt.is_set(),
+            "interval_sec": self.channel.controls["sim_interval"],
+            "timestamp": point[0].isoformat() if point else None,
+            "rain": state["rain"],
+            "plant": {"flow": state["plant"][2], **state["plant_params"]},
+            "overflow": {"id": oid, "active": active, "diverted": diverted},
+            "sensors": {sid: {"flow": flow, "status": status} for sid, _, _, flow, status in state["sensors"]},
+        }
+
+    def layout(self):
+        layout = self.channel.layout
+        return {
+            "sensors": [{"id": sid, "lat": lat, "lon": lon} for sid, lat, lon in layout.sensors],
+            "overflow": dict(zip(("id", "lat", "lon"), layout.overflow)),
+            "plant": dict(zip(("lat", "lon"), layout.plant)),
+            "connections": [{"start": list(start), "end": list(end),
+                             "sensor": layout.sensors[i][0] if i >= 0 else None}
+                            for start, end, i in layout.connections],
+            "extra_points": [{"id": pid, "lat": lat, "lon": lon} for pid, lat, lon in layout.extra_points],
+        }
+
+    def info(self):
+        return {
+            "id": self.id,
+            "options": self.options,
+            "created": self.created,
+            "hour": self.channel.read()["hour"],
+            "paused": self.pause_evt.is_set(),
+        }
+
+
+class SessionRegistry:
+    def __init__(self, max_sessions=8):
+        self.max_sessions = max_sessions
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def create(self, params):
+        options = {k: params[k] for k in MODEL_OPTIONS if k in params}
+        unknown = set(params) - set(MODEL_OPTIONS) - {"interval_sec"}
+        if unknown:
+            raise ApiError(400, f"Nieznane parametry: {', '.join(sorted(unknown))}")
+        interval = _parse_interval(params.get("interval_sec", DEFAULT_INTERVAL))
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                raise ApiError(429, f"Osiągnięto limit sesji ({self.max_sessions})")
+            session_id = uuid.uuid4().hex[:8]
+            # miejsce rezerwujemy od razu – budowa modelu trwa, a inne żądania nie czekają na blokadę
+            self._sessions[session_id] = None
+        session = None
+        try:
+            session = Session(session_id, options, interval_sec=interval)
+        except (OSError, ValueError, TypeError) as e:
+            raise ApiError(400, f"Nie udało się utworzyć modelu: {e}")
+        finally:
+            # zarezerwowane miejsce wraca przy każdym błędzie, nie tylko przy błędnych parametrach
+            with self._lock:
+                if session is None:
+                    del self._sessions[session_id]
+                else:
+                    self._sessions[session_id] = session
+        print(f"[SERVER] Sesja {session_id} utworzona ({options or 'domyślne parametry'})")
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is None:
+            raise ApiError(404, f"Brak sesji: {session_id}")
+        return session
+
+    def all(self):
+        with self._lock:
+            return [s for s in self._sessions.values() if s is not None]
+
+    def remove(self, session_id):
+        session = self.get(session_id)
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        session.close()
+        print(f"[SERVER] Sesja {session_id} usunięta")
+
+    def close_all(self):
+        for session in self.all():
+            self.remove(session.id)
+
+
+def _parse_interval(value):
+    try:
+        interval = float(value)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"Niepoprawny interwał: {value!r}")
+    if not MIN_INTERVAL <= interval <= MAX_INTERVAL:
+        raise ApiError(400, f"Interwał poza zakresem [{MIN_INTERVAL}, {MAX_INTERVAL}] s")
+    return interval
+
+
+# ====== OBSŁUGA HTTP ======
+class SimulationRequestHandler(BaseHTTPRequestHandler):
+    server_version = "SewerSimulation/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def registry(self):
+        return self.server.registry
+
+    # --- pomocnicze ---
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            data = json.loads(self.rfile.read(length))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise ApiError(400, "Niepoprawny JSON w treści żądania")
+        if not isinstance(data, dict):
+            raise ApiError(400, "Treść żądania musi być obiektem JSON")
+        return data
+
+    def _route(self, method):
+        parts = [p for p in self.path.split("?", 1)[0].split("/") if p]
+        try:
+            if not parts or parts[0] != "sessions" or len(parts) > 3:
+                raise ApiError(404, f"Nieznany adres: {self.path}")
+            if len(parts) == 1:
+                if method == "GET":
+                    return self._send_json(200, [s.info() for s in self.registry.all()])
+                if method == "POST":
+                    session = self.registry.create(self._read_json())
+                    return self._send_json(201, session.info())
+                raise ApiError(405, "Dozwolone: GET, POST")
+
+            if len(parts) == 2:
+                if method == "GET":
+                    return self._send_json(200, self.registry.get(parts[1]).snapshot())
+                if method == "DELETE":
+                    self.registry.remove(parts[1])
+                    return self._send_json(200, {"deleted": parts[1]})
+                raise ApiError(405, "Dozwolone: GET, DELETE")
+
+            session = self.registry.get(parts[1])
+            action = parts[2]
+            if method == "GET" and action == "layout":
+                return self._send_json(200, session.layout())
+            if method == "GET" and action == "stream":
+                return self._stream(session)
+            if method == "POST" and action in ("start", "pause", "reset", "speed"):
+                if action == "speed":
+                    session.set_interval(_parse_interval(self._read_json().get("interval_sec")))
+                else:
+                    getattr(session, action)()
+                return self._send_json(200, session.snapshot())
+            raise ApiError(404, f"Nieznana akcja: {method} {action}")
+        except ApiError as e:
+            self._send_json(e.status, {"error": str(e)})
+
+    def _stream(self, session):
+        """SSE: jedno zdarzenie na każdy nowy stan w kanale sesji (licznik sekwencji)."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        last_seq = None
+        last_sent = time.monotonic()
+        try:
+            while not session.closed and not self.server.stopping.is_set():
+                seq = session.channel.sequence()
+                if seq != last_seq and seq % 2 == 0:
+                    snapshot = session.snapshot()
+                    last_seq = snapshot["seq"]
+                    message = f"id: {last_seq}\nevent: snapshot\ndata: {json.dumps(snapshot, ensure_ascii=False)}\n\n"
+                    self.wfile.write(message.encode("utf-8"))
+                    self.wfile.flush()
+                    last_sent = time.monotonic()
+                elif time.monotonic() - last_sent > STREAM_KEEPALIVE:
+                    self.wfile.write(b": keepalive\n\n")
+                    self.wfile.flush()
+                    last_sent = time.monotonic()
+                time.sleep(STREAM_POLL)
+            self.wfile.write(b"event: closed\ndata: {}\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # klient się rozłączył
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_DELETE(self):
+        self._route("DELETE")
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            print(f"[SERVER] {self.address_string()} {format % args}")
+
+
+class SimulationServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, max_sessions=8, verbose=False):
+        super().__init__(address, SimulationRequestHandler)
+        self.registry = SessionRegistry(max_sessions=max_sessions)
+        self.stopping = threading.Event()
+        self.verbose = verbose
+
+    def shutdown(self):
+        self.stopping.set()
+        super().shutdown()
+
+    def server_close(self):
+        self.stopping.set()
+        super().server_close()
+        self.registry.close_all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serwer symulacji systemu kanalizacyjnego (HTTP + SSE).")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Adres nasłuchu (domyślnie tylko lokalnie)")
+    parser.add_argument("--port", type=int, default=8765, help="Port HTTP")
+    parser.add_argument("--max_sessions", type=int, default=8, help="Maksymalna liczba równoległych sesji")
+    parser.add_argument("--verbose", action="store_true", help="Loguj każde żądanie HTTP")
+    args = parser.parse_args()
+    configure_logging(level="WARNING")
+
+    server = SimulationServer((args.host, args.port), max_sessions=args.max_sessions, verbose=args.verbose)
+    print(f"[SERVER] Nasłuch na http://{args.host}:{args.port} (Ctrl+C kończy)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print("[SERVER] stop")
@@ -1,6 +1,8 @@
 from visualisation.graphics_functions import *
-from model.model import SewerSystemModel
 from visualisation.simulation_engine import SimulationThread
+from visualisation.shared_state import DashboardView, SnapshotChannel, StateLayout
+from visualisation.replay import MAX_PLAYBACK_RATE, ReplayThread, SnapshotLogReader, SnapshotLogWriter
+from model.log import configure_logging
 import sys
 import argparse
 
@@ -11,7 +13,6 @@ os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "1"
 warnings.filterwarnings("ignore", category=UserWarning, message=".*pkg_resources is deprecated.*")
 
 import pygame
-from collections import deque
 import multiprocessing as mp
 
 # ====== KONFIGURACJA PRĘDKOŚCI SYMULACJI ======
@@ -24,8 +25,33 @@ def place_window(x: int, y: int):
     os.environ["SDL_VIDEO_WINDOW_POS"] = f"{x},{y}"
 
 
+# ====== Klawisze odtwarzania zapisu ======
+def handle_replay_key(event, shared):
+    """Strzałki ←/→ – godzina wstecz / naprzód (z Shift – doba), Home/End – początek / koniec,
+    ↑/↓ – szybciej / wolniej (rekordy na klatkę), R – odtwarzanie wstecz."""
+    pos = int(shared["replay_pos"])
+    rate = int(shared["playback_rate"]) or 1
+    jump = 24 if event.mod & pygame.KMOD_SHIFT else 1
+    # seek_cmd = indeks rekordu + 1 (0 = brak polecenia)
+    if event.key == pygame.K_RIGHT:
+        shared["seek_cmd"] = pos + jump + 1
+    elif event.key == pygame.K_LEFT:
+        shared["seek_cmd"] = max(0, pos - jump) + 1
+    elif event.key == pygame.K_HOME:
+        shared["seek_cmd"] = 1
+    elif event.key == pygame.K_END:
+        shared["seek_cmd"] = 10 ** 9  # wątek odtwarzania przycina do ostatniego rekordu
+    elif event.key in (pygame.K_UP, pygame.K_DOWN):
+        speed = min(MAX_PLAYBACK_RATE, abs(rate) * 2) if event.key == pygame.K_UP else max(1, abs(rate) // 2)
+        shared["playback_rate"] = speed if rate > 0 else -speed
+        print(f"[REPLAY] Tempo: {shared['playback_rate']:+.0f} h/klatkę")
+    elif event.key == pygame.K_r:
+        shared["playback_rate"] = -rate
+        print("[REPLAY] Wstecz" if rate > 0 else "[REPLAY] Naprzód")
+
+
 # ====== Pętla okna MAPY ======
-def map_window_loop(shared, lock, pause_evt, stop_evt, pos=(0, 50)):
+def map_window_loop(channel, pause_evt, stop_evt, pos=(0, 50), replay=False):
     place_window(*pos)
     pygame.init()
     pygame.display.set_caption("SewerSystem — MAP & CONTROL")
@@ -33,14 +59,12 @@ def map_window_loop(shared, lock, pause_evt, stop_evt, pos=(0, 50)):
     MAP_ONLY_RECT = pygame.Rect(12, 12, WIN_W - 24, WIN_H - 100)
 
     screen = pygame.display.set_mode((WIN_W, WIN_H))
-    clock = pygame.time.Clock()
-    font = pygame.font.SysFont(None, 20)
+    gate = FrameGate()
 
-    with lock:
-        shared["map_scale"] = shared.get("map_scale", 1.0)
-        shared["map_offset"] = shared.get("map_offset", (0, 0))
-        shared["ui_slider_val"] = 0.5
-        shared["sim_interval"] = MAX_INTERVAL - 0.5 * (MAX_INTERVAL - MIN_INTERVAL)
+    # stan z pamięci współdzielonej; skala i przesunięcie mapy są lokalne dla tego okna
+    shared = DashboardView(channel, local={"map_scale": 1.0, "map_offset": (0, 0)})
+    shared["ui_slider_val"] = 0.5
+    shared["sim_interval"] = MAX_INTERVAL - 0.5 * (MAX_INTERVAL - MIN_INTERVAL)
 
     dragging = False
     last_pos = None
@@ -48,7 +72,8 @@ def map_window_loop(shared, lock, pause_evt, stop_evt, pos=(0, 50)):
 
     running = True
     while running and not stop_evt.is_set():
-        events = pygame.event.get()
+        # w pauzie i po końcu symulacji okno czeka na zdarzenia zamiast rysować 60 klatek/s
+        events = gate.poll(idle=pause_evt.is_set() or not shared["running"])
         for event in events:
             if event.type == pygame.QUIT:
                 running = False
@@ -64,6 +89,8 @@ def map_window_loop(shared, lock, pause_evt, stop_evt, pos=(0, 50)):
                 else:
                     pause_evt.set()
                     print("[MAP] Pauza (Spacja)")
+            elif replay and event.type == pygame.KEYDOWN:
+                handle_replay_key(event, shared)
 
             if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
                 if MAP_ONLY_RECT.collidepoint(event.pos):
@@ -77,45 +104,49 @@ def map_window_loop(shared, lock, pause_evt, stop_evt, pos=(0, 50)):
                 lx, ly = last_pos
                 dx, dy = mx - lx, my - ly
                 last_pos = (mx, my)
-                with lock:
-                    s = shared["map_scale"]
-                    ox, oy = shared["map_offset"]
-                    sw, sh = MAP_ONLY_RECT.width * s, MAP_ONLY_RECT.height * s
-                    ox = min(0, max(MAP_ONLY_RECT.width - sw, ox + dx))
-                    oy = min(0, max(MAP_ONLY_RECT.height - sh, oy + dy))
-                    shared["map_offset"] = (ox, oy)
+                s = shared["map_scale"]
+                ox, oy = shared["map_offset"]
+                sw, sh = MAP_ONLY_RECT.width * s, MAP_ONLY_RECT.height * s
+                ox = min(0, max(MAP_ONLY_RECT.width - sw, ox + dx))
+                oy = min(0, max(MAP_ONLY_RECT.height - sh, oy + dy))
+                shared["map_offset"] = (ox, oy)
             elif event.type == pygame.MOUSEWHEEL:
                 mx, my = pygame.mouse.get_pos()
                 if MAP_ONLY_RECT.collidepoint((mx, my)):
-                    with lock:
-                        s_old = shared["map_scale"]
-                        ox, oy = shared["map_offset"]
-                        s_new = min(6.0, max(1.0, s_old * (1.1 if event.y > 0 else 1 / 1.1)))
-                        if s_new != s_old:
-                            rx = mx - MAP_ONLY_RECT.left
-                            ry = my - MAP_ONLY_RECT.top
-                            u = rx - ox
-                            v = ry - oy
-                            ox = rx - u * (s_new / s_old)
-                            oy = ry - v * (s_new / s_old)
-                            sw, sh = MAP_ONLY_RECT.width * s_new, MAP_ONLY_RECT.height * s_new
-                            ox = min(0, max(MAP_ONLY_RECT.width - sw, ox))
-                            oy = min(0, max(MAP_ONLY_RECT.height - sh, oy))
-                            shared["map_scale"] = s_new
-                            shared["map_offset"] = (ox, oy)
+                    s_old = shared["map_scale"]
+                    ox, oy = shared["map_offset"]
+                    s_new = min(6.0, max(1.0, s_old * (1.1 if event.y > 0 else 1 / 1.1)))
+                    if s_new != s_old:
+                        rx = mx - MAP_ONLY_RECT.left
+                        ry = my - MAP_ONLY_RECT.top
+                        u = rx - ox
+                        v = ry - oy
+                        ox = rx - u * (s_new / s_old)
+                        oy = ry - v * (s_new / s_old)
+                        sw, sh = MAP_ONLY_RECT.width * s_new, MAP_ONLY_RECT.height * s_new
+                        ox = min(0, max(MAP_ONLY_RECT.width - sw, ox))
+                        oy = min(0, max(MAP_ONLY_RECT.height - sh, oy))
+                        shared["map_scale"] = s_new
+                        shared["map_offset"] = (ox, oy)
+
+        shared.refresh()
+        view_key = (channel.version, shared["map_scale"], shared["map_offset"], pause_evt.is_set(),
+                    shared["ui_slider_val"])
+        if not gate.should_draw(view_key, events):
+            continue
 
         screen.fill((252, 253, 255))
-        draw_map(screen, MAP_ONLY_RECT, shared, lock)
+        draw_map(screen, MAP_ONLY_RECT, shared)
         ui_elements = draw_control_bar(screen, screen.get_rect(), shared, pause_evt, stop_evt, MIN_INTERVAL,
                                        MAX_INTERVAL)
         pygame.display.flip()
-        clock.tick(FPS)
+        gate.tick()
 
     pygame.quit()
 
 
 # ====== Pętla okna WYKRESU ======
-def chart_window_loop(shared, lock, pause_evt, stop_evt, pos=(980, 50)):
+def chart_window_loop(channel, pause_evt, stop_evt, pos=(980, 50), replay_path=None):
     place_window(*pos)
     pygame.init()
     pygame.display.set_caption("SewerSystem — CHART & RAIN")
@@ -125,16 +156,26 @@ def chart_window_loop(shared, lock, pause_evt, stop_evt, pos=(980, 50)):
     CHART_ONLY_RECT = pygame.Rect(12, 12, WIN_W - 24, WIN_H - 24)
 
     screen = pygame.display.set_mode((WIN_W, WIN_H))
-    clock = pygame.time.Clock()
+    gate = FrameGate()
 
-    points_est, points_div = deque(maxlen=CHART_MAX_POINTS), deque(maxlen=CHART_MAX_POINTS)
-    points_rain_int = deque(maxlen=CHART_MAX_POINTS)
-    points_rain_dep = deque(maxlen=CHART_MAX_POINTS)
+    # pełna historia przebiegu (bez obcinania) i widoczny zakres godzin
+    history = ChartHistory()
+    view = ChartView()
+    plot = None  # (prostokąt osi czasu, pierwsza, ostatnia godzina) z ostatniej klatki
+    dragging = False
+    last_x = None
     last_hour_check = -1
+    last_ts = None
+    # przy odtwarzaniu historia wykresu pochodzi wprost z pliku zapisu (przewijanie w obie strony)
+    reader = SnapshotLogReader(replay_path) if replay_path else None
+    history_version = None
 
     running = True
+    state = channel.read()
     while running and not stop_evt.is_set():
-        for event in pygame.event.get():
+        events = gate.poll(idle=pause_evt.is_set() or not state["running"])
+        view_changed = False
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
             elif event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
@@ -142,42 +183,66 @@ def chart_window_loop(shared, lock, pause_evt, stop_evt, pos=(980, 50)):
                     pause_evt.clear()
                 else:
                     pause_evt.set()
-
-        screen.fill((252, 253, 255))
-
-        with lock:
-            pt = shared.get("point")
-            max_capacity = shared.get("max_capacity")
-            rain_data = shared.get("rain", {})
-            hour = shared.get("hour", 0)
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_HOME:
+                view.reset()
+                view_changed = True
+            elif plot is not None and event.type == pygame.MOUSEWHEEL:
+                # zoom osi czasu wokół kursora
+                rect, first, last = plot
+                mx = pygame.mouse.get_pos()[0]
+                anchor = min(1.0, max(0.0, (mx - rect.left) / rect.width))
+                view.zoom(1 / 1.25 if event.y > 0 else 1.25, anchor, history.first_hour, history.last_hour)
+                view_changed = True
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and plot is not None:
+                dragging = True
+                last_x = event.pos[0]
+            elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+                dragging = False
+            elif event.type == pygame.MOUSEMOTION and dragging and plot is not None:
+                rect, first, last = plot
+                hours_per_px = max(1, last - first) / rect.width
+                shift = int(round((last_x - event.pos[0]) * hours_per_px))
+                if shift:
+                    view.pan(shift, history.first_hour, history.last_hour)
+                    last_x = event.pos[0]
+                    view_changed = True
+
+        state = channel.read()  # bez blokad; kopia tylko gdy symulacja zapisała nowy stan
+        pt = state["point"]
+        max_capacity = state["max_capacity"]
+        rain_data = state["rain"]
+        hour = state["hour"]
+
+        if reader is not None:
+            if channel.version != history_version:
+                history_version = channel.version
+                history = ChartHistory.from_arrays(*reader.history(int(channel.controls["replay_pos"])))
 
         # Wykrywanie RESETU
-        if hour < last_hour_check:
-            points_est.clear()
-            points_div.clear()
-            points_rain_int.clear()
-            points_rain_dep.clear()
+        elif hour < last_hour_check:
+            history.clear()
+            view.reset()
+            last_ts = None
         last_hour_check = hour
 
-        if pt is not None:
+        if reader is None and pt is not None:
             ts, est, div = pt
-            if not points_est or points_est[-1][0] != ts:
-                points_est.append((ts, est))
-                points_div.append((ts, div))
-
+            if ts != last_ts:
+                last_ts = ts
                 # Pobieranie danych o deszczu (Intensywność i Głębokość)
-                r_int = rain_data.get("intensity", 0.0)
-                r_dep = rain_data.get("depth", 0.0)
+                history.append(hour, est, div, rain_data.get("intensity", 0.0), rain_data.get("depth", 0.0))
 
-                points_rain_int.append((ts, r_int))
-                points_rain_dep.append((ts, r_dep))
+        # wykres zmienia się tylko z nowym stanem symulacji, zmianą zakresu albo po odsłonięciu okna
+        window_events = [e for e in events if e.type not in (pygame.MOUSEMOTION, pygame.MOUSEWHEEL)]
+        if not gate.should_draw((channel.version, view.span, view.end), window_events or view_changed):
+            continue
 
         # Rysowanie wykresów
-        draw_chart(screen, CHART_ONLY_RECT, points_est, points_div,
-                   points_rain_int, points_rain_dep, max_capacity, hour)
+        screen.fill((252, 253, 255))
+        plot = draw_chart(screen, CHART_ONLY_RECT, history, max_capacity, view)
 
         pygame.display.flip()
-        clock.tick(FPS)
+        gate.tick()
 
     pygame.quit()
 
@@ -185,7 +250,7 @@ def chart_window_loop(shared, lock, pause_evt, stop_evt, pos=(980, 50)):
 # ====== Uruchomienie ======
 def run_two_windows_dashboard(interval_sec: float = DEFAULT_INTERVAL, rain_file: str = "data/rain.csv",
                               max_hours: int = 168, max_interval: float = None, min_interval: float = None,
-                              max_capacity: int = 2000):
+                              max_capacity: int = 2000, record_path: str = None, replay_path: str = None):
     # if min_interval <= interval_sec <= max_interval:
     #     if max_interval is not None:
     #         MAX_INTERVAL = max_interval
@@ -194,44 +259,40 @@ def run_two_windows_dashboard(interval_sec: float = DEFAULT_INTERVAL, rain_file:
 
     mp.set_start_method("spawn", force=True)
 
-    manager = mp.Manager()
-    shared = manager.dict({
-        "sensors": [],
-        "overflow": None,
-        "plant": None,
-        "point": None,
-        "plant_params": {},
-        "rain": {"intensity": 0.0, "depth": 0.0},
-        "connections": [],
-        "extra_points": [],
-        "max_capacity": max_capacity,
-        "running": True,
-        "hour": 0,
-        "max_hours": max_hours,
-        "reset_cmd": False,
-        "sim_interval": interval_sec,
-        "ui_slider_val": 0.5
-    })
-    lock = manager.RLock()
-    stop_evt = manager.Event()
-    pause_evt = manager.Event()
+    stop_evt = mp.Event()
+    pause_evt = mp.Event()
 
     pause_evt.set()
 
+    # mapa i jej granice przed startem okien (wcześniej działo się to przy imporcie graphics_functions)
+    map_bounds()
+
     def model_factory():
+        # import tutaj – procesy okien (spawn) importują ten moduł od nowa i nie potrzebują mesa
+        from model.model import SewerSystemModel
         return SewerSystemModel(max_capacity= max_capacity, max_hours=max_hours, rain_file=rain_file)
 
-    temp_model = model_factory()
-    shared["max_capacity"] = temp_model.max_capacity
-    del temp_model
-
-    sim_thread = SimulationThread(model_factory, interval_sec, shared, lock, stop_evt, pause_evt)
+    if replay_path:
+        # odtwarzanie zapisu zamiast modelu – okna te same, stan z pliku
+        reader = SnapshotLogReader(replay_path)
+        channel = SnapshotChannel.create(reader.layout, sim_interval=interval_sec, ui_slider_val=0.5,
+                                         playback_rate=1)
+        sim_thread = ReplayThread(reader, interval_sec, channel, stop_evt, pause_evt)
+    else:
+        # stan symulacji dla okien – pamięć współdzielona zamiast mp.Manager().dict()
+        model = model_factory()
+        channel = SnapshotChannel.create(StateLayout.from_model(model), sim_interval=interval_sec, ui_slider_val=0.5)
+        recorder = SnapshotLogWriter(record_path, channel.layout, channel.record_size) if record_path else None
+        sim_thread = SimulationThread(model_factory, interval_sec, channel, stop_evt, pause_evt, model=model,
+                                      recorder=recorder)
     sim_thread.start()
 
     map_pos = (0, 50)
     chart_pos = (50 + 900 + 30, 50)
-    p_map = mp.Process(target=map_window_loop, args=(shared, lock, pause_evt, stop_evt, map_pos), daemon=True)
-    p_ch = mp.Process(target=chart_window_loop, args=(shared, lock, pause_evt, stop_evt, chart_pos), daemon=True)
+    p_map = mp.Process(target=map_window_loop, args=(channel, pause_evt, stop_evt, map_pos, bool(replay_path)),
+                       daemon=True)
+    p_ch = mp.Process(target=chart_window_loop, args=(channel, pause_evt, stop_evt, chart_pos, replay_path),
+                      daemon=True)
 
     p_map.start()
     p_ch.start()
@@ -244,6 +305,7 @@ def run_two_windows_dashboard(interval_sec: float = DEFAULT_INTERVAL, rain_file:
     finally:
         stop_evt.set()
         sim_thread.join(timeout=2.0)
+        channel.close()
 
 
 if __name__ == "__main__":
@@ -260,12 +322,18 @@ if __name__ == "__main__":
                         help="Czas trwania symulacji w godzinach")
     parser.add_argument("--max_capacity", type=int, default=2000,
                         help="Maksymalna przepustowość oczyszczalni")
+    parser.add_argument("--record", type=str, default=None,
+                        help="Zapisuj każdy stan symulacji do pliku (do późniejszego --replay)")
+    parser.add_argument("--replay", type=str, default=None,
+                        help="Odtwórz zapisany przebieg zamiast liczyć model "
+                             "(←/→ godzina, Shift – doba, Home/End, ↑/↓ tempo, R – wstecz)")
     # parser.add_argument("--min_interval", type=float, default=MIN_INTERVAL,
     #                     help=f"Minimalny dozwolony interwał (domyślnie: {MIN_INTERVAL})")
     # parser.add_argument("--max_interval", type=float, default=MAX_INTERVAL,
     #                     help=f"Maksymalny dozwolony interwał (domyślnie: {MAX_INTERVAL})")
 
     args = parser.parse_args()
+    configure_logging(level="INFO")
 
     print("\n=== Symulacja rozpoczęta ===")
     if len(sys.argv)>1:
@@ -275,7 +343,9 @@ if __name__ == "__main__":
             interval_sec=args.interval_sec,
             rain_file=args.rain_file,
             max_hours=args.max_hours -1,
-            max_capacity=args.max_capacity
+            max_capacity=args.max_capacity,
+            record_path=args.record,
+            replay_path=args.replay,
         )
     else:
         # konfiguracja rain_file i domyślnego interwału
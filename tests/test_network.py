@@ -0,0 +1,23 @@
+import pytest
+
+from model.network import NetworkError, compile_graph
+
+
+def test_cycle_is_reported_by_name():
+    with pytest.raises(NetworkError, match="Cykl w sieci: A → B → C → A"):
+        compile_graph({"A": ["B"], "B": ["C"], "C": ["A", "Oczyszczalnia"]})
+
+
+def test_cycle_with_node_below_it():
+    # C leży poniżej cyklu A ↔ B – Kahn go nie zdejmuje, ale C nie ma następcy w cyklu
+    with pytest.raises(NetworkError) as error:
+        compile_graph({"C": ["Oczyszczalnia"], "A": ["B", "C"], "B": ["A"]})
+    message = str(error.value)
+    assert "Cykl w sieci: A → B → A" in message
+    assert "3 węzłów" in message
+
+
+def test_levels_follow_longest_path():
+    network = compile_graph({"A": ["C"], "B": ["C"], "C": ["D"], "D": ["Oczyszczalnia"], "E": ["D"]})
+    levels = [[network.ids[i] for i in level] for level in network.levels()]
+    assert levels == [["A", "B", "E"], ["C"], ["D"]]
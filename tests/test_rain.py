@@ -0,0 +1,19 @@
+import numpy as np
+import pytest
+from scipy.signal import lfilter
+
+from model.rain import first_order_filter
+
+
+@pytest.mark.parametrize("decay", [0.9, 0.5, 0.1, 1e-3, 1e-12, 1e-200, 1.0])
+def test_first_order_filter_matches_lfilter(decay):
+    x = np.random.default_rng(0).gamma(0.5, 4.0, (3, 200))
+    expected = lfilter([1.0], [1.0, -decay], x, axis=-1)
+    result = first_order_filter(x, decay)
+    assert np.all(np.isfinite(result))
+    np.testing.assert_allclose(result, expected, rtol=1e-10, atol=1e-12)
+
+
+def test_first_order_filter_small_decay_on_ones():
+    result = first_order_filter(np.ones(40), 1e-12)
+    np.testing.assert_allclose(result, lfilter([1.0], [1.0, -1e-12], np.ones(40)))
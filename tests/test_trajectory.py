@@ -0,0 +1,44 @@
+import os
+
+import numpy as np
+import pytest
+
+from model.model import SewerSystemModel
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+@pytest.fixture(autouse=True)
+def project_root(monkeypatch):
+    # model czyta dane z katalogu data/ względem katalogu roboczego
+    monkeypatch.chdir(PROJECT_ROOT)
+
+
+def _storm(hours=200):
+    """Długi, silny opad: oczyszczalnia przechodzi w tryb awaryjny na dłużej niż max_accelerated_hours."""
+    rain = np.zeros(hours)
+    rain[10:120] = 25.0
+    rain[140:170] = 40.0
+    return rain.tolist()
+
+
+def test_trajectory_matches_agent_steps_in_overflow():
+    rain = _storm()
+    stepped = SewerSystemModel(rain_intensity=rain, max_hours=len(rain))
+    while stepped.running:
+        stepped.step()
+    expected = stepped.recorder.to_dataframe()
+
+    trajectory = SewerSystemModel(rain_intensity=rain, max_hours=len(rain))
+    result = trajectory.run_trajectory()
+
+    # burza musi dojść do przelewu i długiej pracy w trybie awaryjnym
+    assert (expected["PlantStatus"] == 2).sum() > stepped.plant.max_accelerated_hours
+    assert expected["AccelWarning"].any()
+
+    assert list(result.columns) == list(expected.columns)
+    for column in expected.columns:
+        np.testing.assert_allclose(
+            result[column].to_numpy(dtype=float), expected[column].to_numpy(dtype=float),
+            rtol=1e-9, atol=1e-9, err_msg=column,
+        )
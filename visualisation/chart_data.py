@@ -0,0 +1,163 @@
+"""
+Dane okna wykresów: pełna historia przebiegu w tablicach NumPy, zakres czasu (zoom / przesuwanie)
+i zmniejszanie liczby punktów do szerokości wykresu w pikselach metodą LTTB
+(Largest-Triangle-Three-Buckets, Steinarsson 2013) – zostają punkty, które najbardziej zmieniają
+kształt krzywej, więc szczyty przepływu i opadu nie giną przy wielotygodniowych przebiegach.
+"""
+import numpy as np
+
+# najkrótszy zakres po przybliżeniu [h]
+MIN_SPAN_HOURS = 12
+
+
+def lttb(x, y, n_out):
+    """Indeksy n_out punktów wybranych z (x, y) metodą LTTB (pierwszy i ostatni zawsze zostają)."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # n_out - 2 kubełków na punktach 1..n-2; sąsiedni kubełek reprezentuje jego średnia
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts
+    mean_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts
+    # dla ostatniego kubełka "następnym" jest ostatni punkt serii
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    out = np.empty(n_out, dtype=int)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        # podwojone pole trójkąta (poprzednio wybrany punkt, kandydat, średnia następnego kubełka)
+        area = np.abs((ax - next_x[i]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (next_y[i] - ay))
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+# === PEŁNA HISTORIA ===
+class ChartHistory:
+    """
+    Godzina, przepływ do oczyszczalni, przelew, intensywność i depth dla każdej godziny przebiegu.
+    Tablice rosną przez podwajanie, więc dopisywanie kosztuje stały czas, a nic nie jest obcinane.
+    """
+
+    COLUMNS = ("hour", "plant_flow", "diverted", "rain_intensity", "rain_depth")
+
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.data = np.zeros((len(self.COLUMNS), max(1, int(capacity))))
+        self._downsampled_key = None
+        self._downsampled = None
+
+    @classmethod
+    def from_arrays(cls, hour, plant_flow, diverted, rain_intensity, rain_depth):
+        history = cls(capacity=len(hour))
+        history.size = len(hour)
+        for row, values in enumerate((hour, plant_flow, diverted, rain_intensity, rain_depth)):
+            history.data[row, :history.size] = values
+        return history
+
+    def __len__(self):
+        return self.size
+
+    def append(self, hour, plant_flow, diverted, rain_intensity, rain_depth):
+        if self.size == self.data.shape[1]:
+            self.data = np.concatenate([self.data, np.zeros_like(self.data)], axis=1)
+        self.data[:, self.size] = (hour, plant_flow, diverted, rain_intensity, rain_depth)
+        self.size += 1
+
+    def clear(self):
+        self.size = 0
+        self._downsampled_key = None
+
+    def column(self, name):
+        return self.data[self.COLUMNS.index(name), :self.size]
+
+    @property
+    def first_hour(self):
+        return int(self.data[0, 0]) if self.size else 0
+
+    @property
+    def last_hour(self):
+        return int(self.data[0, self.size - 1]) if self.size else 0
+
+    def window(self, start_hour, end_hour):
+        """Wycinek [start_hour, end_hour] – słownik kolumn (widoki, bez kopiowania)."""
+        hours = self.column("hour")
+        lo = np.searchsorted(hours, start_hour, side="left")
+        hi = np.searchsorted(hours, end_hour, side="right")
+        return {name: self.data[row, lo:hi] for row, name in enumerate(self.COLUMNS)}
+
+    def downsampled(self, start_hour, end_hour, n_out):
+        """
+        Serie wycinka zmniejszone do n_out punktów (LTTB osobno dla każdej serii).
+        Zwraca słownik: nazwa → (godziny, wartości).
+        """
+        # ostatni wynik zostaje do zmiany danych albo zakresu (klatki po ruchu myszy, odsłonięciu okna)
+        key = (start_hour, end_hour, n_out, self.size, id(self.data))
+        if self._downsampled_key == key:
+            return self._downsampled
+        window = self.window(start_hour, end_hour)
+        hours = window["hour"]
+        out = {}
+        for name in self.COLUMNS[1:]:
+            idx = lttb(hours, window[name], n_out)
+            out[name] = (hours[idx], window[name][idx])
+        self._downsampled_key, self._downsampled = key, out
+        return out
+
+
+# === ZAKRES CZASU WYKRESU ===
+class ChartView:
+    """
+    Widoczny zakres godzin. Domyślnie cała historia; po przybliżeniu trzyma szerokość zakresu,
+    a gdy prawy brzeg jest przy bieżącej godzinie – przesuwa się razem z symulacją.
+    """
+
+    def __init__(self):
+        self.span = None  # None = cała historia
+        self.end = None   # None = prawy brzeg przy bieżącej godzinie
+
+    def reset(self):
+        self.span = None
+        self.end = None
+
+    def range(self, first, last):
+        end = last if self.end is None else max(first, min(self.end, last))
+        start = first if self.span is None else max(first, end - self.span)
+        return start, end
+
+    def _set(self, start, end, first, last):
+        # pełne godziny – podziałka osi i pasy dni liczone są na liczbach całkowitych
+        start, end = int(round(start)), int(round(end))
+        width = end - start
+        if width >= last - first:
+            self.reset()
+            return
+        if start < first:
+            start, end = first, first + width
+        if end >= last:
+            self.end = None
+        else:
+            self.end = end
+        self.span = width
+
+    def zoom(self, factor, anchor, first, last):
+        """Zmiana szerokości zakresu `factor` razy wokół punktu anchor (0..1 szerokości wykresu)."""
+        start, end = self.range(first, last)
+        width = end - start
+        new_width = max(MIN_SPAN_HOURS, width * factor)
+        pivot = start + anchor * width
+        new_start = pivot - anchor * new_width
+        self._set(new_start, new_start + new_width, first, last)
+
+    def pan(self, hours, first, last):
+        start, end = self.range(first, last)
+        if self.span is None:
+            return
+        shift = max(first - start, min(last - end, hours))
+        self._set(start + shift, end + shift, first, last)
@@ -1,19 +1,22 @@
 from __future__ import annotations
 import threading
-from collections import deque
+from contextlib import nullcontext
 from typing import Dict, Optional, Tuple
 import os
 import math
 import warnings
 import sys
-import csv
+import hashlib
+from collections import OrderedDict
+from functools import lru_cache
 
 # wyrzucenie komentarzy i warningów z Pygame
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "1"
 warnings.filterwarnings("ignore", category=UserWarning, message=".*pkg_resources is deprecated.*")
+import numpy as np
 import pygame
 
-from visualisation.map_download import get_map
+from visualisation.chart_data import ChartHistory, ChartView
 
 # Ustalanie ścieżek absolutnych
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -25,37 +28,34 @@ if PROJECT_ROOT not in sys.path:
 # Definicje ścieżek do danych (bezwzględne, żeby ściąganie mapki/wczytywanie z pliku działało)
 BOUNDS_PATH = os.path.join(PROJECT_ROOT, "data", "map_bounds.csv")
 MAP_IMAGE = os.path.join(PROJECT_ROOT, "visualisation", "map.png")
+# opcjonalny katalog na poziomy piramidy mapy (zapisane raz, wczytywane przy kolejnych startach)
+MAP_CACHE_DIR = os.environ.get("SEWER_MAP_CACHE") or None
 
-# ściąganie granic mapy
+# granice mapy – bez sieci i bez zatrzymywania programu (brak podkładu = tło bez mapy)
 def get_dynamic_map_bounds():
-    if not os.path.exists(BOUNDS_PATH) or not os.path.exists(MAP_IMAGE):
-        print(f"\n[INFO] Brak mapy lub granic. Rozpoczynam generowanie...")
-        try:
-            get_map()
-        except Exception as e:
-            print(f"[CRITICAL ERROR] Nie udało się wygenerować mapy: {e}")
-            print("Sprawdź czy plik 'data/wspolrzedne.csv' istnieje i czy masz internet.")
-            sys.exit(1)
-
-    try:
-        with open(BOUNDS_PATH, mode='r') as f:
-            reader = csv.reader(f)
-            next(reader)
-            row = next(reader)
-            return (float(row[0]), float(row[1]), float(row[2]), float(row[3]))
-    except Exception as e:
-        print(f"[ERROR] Plik granic uszkodzony: {e}")
-        print("Usuń plik data/map_bounds.csv i uruchom program ponownie.")
-        sys.exit(1)
+    # import dopiero tu – budowanie podkładu potrzebne tylko przy pierwszym uruchomieniu
+    from visualisation.map_download import ensure_map
+    return ensure_map(MAP_IMAGE, BOUNDS_PATH)
 
 
 # === Konfiguracja mapy ===
-MAP_BOUNDS = get_dynamic_map_bounds()
+# granice (i ewentualne generowanie mapy) dopiero przy pierwszym użyciu, nie przy imporcie modułu
+@lru_cache(maxsize=1)
+def map_bounds():
+    return get_dynamic_map_bounds()
+
+
+def __getattr__(name):
+    # zgodność ze starym API: gf.MAP_BOUNDS
+    if name == "MAP_BOUNDS":
+        return map_bounds()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # ====== Konfiguracja UI ======
 WINDOW_W, WINDOW_H = 1280, 720
 FPS = 60
-CHART_MAX_POINTS = 600
+IDLE_WAIT_MS = 100  # jak długo okno śpi w oczekiwaniu na zdarzenie, gdy nic się nie zmienia
 
 # Kolory
 WHITE = (255, 255, 255)
@@ -76,8 +76,8 @@ BROWN = (139, 69, 19)
 
 
 # ====== Funkcje Pomocnicze ======
-def geo_to_px(lat: float, lon: float, rect: pygame.Rect, bounds=MAP_BOUNDS) -> Tuple[int, int]:
-    min_lat, max_lat, min_lon, max_lon = bounds
+def geo_to_px(lat: float, lon: float, rect: pygame.Rect, bounds=None) -> Tuple[int, int]:
+    min_lat, max_lat, min_lon, max_lon = bounds or map_bounds()
     nx = (lon - min_lon) / (max_lon - min_lon)
     ny = (max_lat - lat) / (max_lat - min_lat)
     x = int(rect.left + nx * rect.width)
@@ -106,29 +106,176 @@ def draw_square(surface, x, y, size, color):
 
 
 def draw_blob(surface, x, y, radius, color, alpha=100):
+    surface.blit(_blob_surface(radius, tuple(color), alpha), (x - radius, y - radius))
+
+
+# ====== Cache zasobów rysowania (czcionki, napisy, powierzchnie) ======
+TEXT_CACHE_SIZE = 4096
+_text_cache = OrderedDict()
+
+
+@lru_cache(maxsize=None)
+def get_font(size: int, bold: bool = False) -> pygame.font.Font:
+    """Czcionka systemowa tworzona raz dla danego rozmiaru."""
+    return pygame.font.SysFont(None, size, bold=bold)
+
+
+def render_text(font: pygame.font.Font, text: str, color) -> pygame.Surface:
+    """Wyrenderowany napis z LRU (klucz: tekst, czcionka, kolor) – te same etykiety co klatkę."""
+    key = (text, font, tuple(color))
+    surf = _text_cache.get(key)
+    if surf is None:
+        surf = font.render(text, True, color)
+        _text_cache[key] = surf
+        if len(_text_cache) > TEXT_CACHE_SIZE:
+            _text_cache.popitem(last=False)
+    else:
+        _text_cache.move_to_end(key)
+    return surf
+
+
+@lru_cache(maxsize=64)
+def _blob_surface(radius, color, alpha):
     s = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
     pygame.draw.circle(s, (*color, alpha), (radius, radius), radius)
-    surface.blit(s, (x - radius, y - radius))
+    return s
+
+
+@lru_cache(maxsize=16)
+def _gradient_surface(w, h, c_start, c_end):
+    s = pygame.Surface((w, h + 1))
+    for i in range(w):
+        t = i / w
+        r = int(c_start[0] + (c_end[0] - c_start[0]) * t)
+        g = int(c_start[1] + (c_end[1] - c_start[1]) * t)
+        b = int(c_start[2] + (c_end[2] - c_start[2]) * t)
+        pygame.draw.line(s, (r, g, b), (i, 0), (i, h))
+    return s
+
+
+def clear_render_caches():
+    """Czyści cache czcionek i powierzchni (wymagane po pygame.quit() i ponownym pygame.init())."""
+    get_font.cache_clear()
+    _text_cache.clear()
+    _blob_surface.cache_clear()
+    _gradient_surface.cache_clear()
+    _map_layer.clear()
+    _chart_layer.clear()
+    draw_map._pyramid = None
+
+
+# ====== Warstwy statyczne (rysowane ponownie tylko przy zmianie klucza) ======
+class StaticLayer:
+    """
+    Powierzchnia o rozmiarze ekranu z częścią sceny, która zmienia się rzadko
+    (tło mapy z połączeniami, osie i siatka wykresów). draw_fn(target) rysuje ją
+    we współrzędnych ekranu; jest wołane tylko gdy zmieni się klucz albo rozmiar.
+    """
+
+    def __init__(self):
+        self.key = None
+        self.surface = None
+
+    def clear(self):
+        self.key = None
+        self.surface = None
+
+    def blit(self, surface: pygame.Surface, rect: pygame.Rect, key, draw_fn):
+        if self.surface is None or self.surface.get_size() != surface.get_size() or key != self.key:
+            if self.surface is None or self.surface.get_size() != surface.get_size():
+                self.surface = pygame.Surface(surface.get_size()).convert()
+            # to, co już jest pod warstwą (np. tło okna w zaokrąglonych rogach panelu)
+            self.surface.blit(surface, rect.topleft, area=rect)
+            draw_fn(self.surface)
+            self.key = key
+        surface.blit(self.surface, rect.topleft, area=rect)
+
+
+# ====== Piramida mapy (tło przeskalowane z góry) ======
+class MapPyramid:
+    """
+    Tło mapy przeskalowane raz do kilku poziomów (1×, 2×, 4× rozmiaru widoku, nie więcej niż
+    rozdzielczość map.png). Obraz dla bieżącej skali powstaje z najbliższego większego poziomu
+    tylko przy zmianie skali – przesuwanie i klatki bez zmian to samo blit.
+    Poziomy można zapisać na dysk (cache_dir), kluczem jest plik mapy i rozmiar widoku.
+    """
+
+    FACTORS = (1, 2, 4)
+
+    def __init__(self, image_path, view_size, cache_dir=None):
+        self.view_size = tuple(view_size)
+        self.levels = self._load_levels(image_path, cache_dir)  # [(współczynnik, Surface)] rosnąco
+        self._scaled_size = None
+        self._scaled = None
+
+    def _cache_key(self, image_path):
+        stat = os.stat(image_path)
+        raw = f"{os.path.abspath(image_path)}:{stat.st_size}:{stat.st_mtime_ns}:{self.view_size}"
+        return hashlib.md5(raw.encode()).hexdigest()[:16]
+
+    def _load_levels(self, image_path, cache_dir):
+        vw, vh = self.view_size
+        if not os.path.exists(image_path):
+            # dashboard bez podkładu (python -m visualisation.map_download build)
+            blank = pygame.Surface(self.view_size)
+            blank.fill(LIGHT_GRAY_BG)
+            return [(1, blank)]
+        paths = None
+        if cache_dir:
+            key = self._cache_key(image_path)
+            paths = [os.path.join(cache_dir, f"map_{key}_x{f}.png") for f in self.FACTORS]
+            if all(os.path.exists(p) for p in paths):
+                levels = [pygame.image.load(p).convert() for p in paths]
+                return [(lvl.get_width() / vw, lvl) for lvl in levels]
+
+        src = pygame.image.load(image_path).convert()
+        levels = []
+        current = src
+        # od największego poziomu w dół – każdy kolejny skalowany z poprzedniego, a nie z oryginału
+        for factor in sorted(self.FACTORS, reverse=True):
+            size = (min(int(vw * factor), src.get_width()), min(int(vh * factor), src.get_height()))
+            if current.get_size() != size:
+                current = pygame.transform.smoothscale(current, size)
+            levels.append(current)
+        levels.reverse()
+
+        if paths is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            for path, lvl in zip(paths, levels):
+                pygame.image.save(lvl, path)
+        return [(lvl.get_width() / vw, lvl) for lvl in levels]
+
+    def scaled(self, scale):
+        """Tło w rozmiarze widoku × scale (przeliczane tylko gdy zmieni się rozmiar)."""
+        size = (int(self.view_size[0] * scale), int(self.view_size[1] * scale))
+        if size != self._scaled_size:
+            level = next((lvl for factor, lvl in self.levels if factor >= scale), self.levels[-1][1])
+            self._scaled = level if level.get_size() == size else pygame.transform.smoothscale(level, size)
+            self._scaled_size = size
+        return self._scaled
 
 
 # ====== Rysowanie wykresów ======
-def draw_chart(surface: pygame.Surface, rect: pygame.Rect, points_est: deque, points_div: deque,
-               points_rain_int: deque, points_rain_dep: deque,
-               max_capacity: Optional[float], current_hour: int):
+_chart_layer = StaticLayer()
+
+
+def draw_chart(surface: pygame.Surface, rect: pygame.Rect, history: ChartHistory,
+               max_capacity: Optional[float], view: Optional[ChartView] = None):
     """
     Rysuje TRZY wykresy:
     1. Intensywność Opady [mm/h]
     2. Suma Opady (Depth) [mm]
     3. Przepływy [m3/h]
+    Pokazuje zakres godzin z `view` (domyślnie całą historię), a serie są zmniejszane metodą
+    LTTB do szerokości wykresu w pikselach. Tło, osie, siatka i podpisy są w warstwie statycznej
+    (przerysowanej tylko przy zmianie zakresu osi), co klatkę rysowane są same serie i legenda.
+    Zwraca (prostokąt osi czasu, pierwsza godzina, ostatnia godzina) – do zoomu myszą.
     """
-    # Tło panelu
-    pygame.draw.rect(surface, LIGHT, rect, border_radius=12)
-    pygame.draw.rect(surface, GRAY, rect, 2, border_radius=12)
-
-    if not points_est:
-        return
-
-    n_points = len(points_est)
+    if not len(history):
+        # Tło panelu
+        pygame.draw.rect(surface, LIGHT, rect, border_radius=12)
+        pygame.draw.rect(surface, GRAY, rect, 2, border_radius=12)
+        return None
 
     # Marginesy
     margin_left = 60
@@ -154,6 +301,92 @@ def draw_chart(surface: pygame.Surface, rect: pygame.Rect, points_est: deque, po
     rect_flow = pygame.Rect(rect.left + margin_left, rect_dep.bottom + gap,
                             rect.width - margin_left - margin_right, h_flow)
 
+    if view is None:
+        start_hour, end_hour = history.first_hour, history.last_hour
+    else:
+        start_hour, end_hour = view.range(history.first_hour, history.last_hour)
+    hour_range = max(1, end_hour - start_hour)
+
+    # Zakresy osi Y – z pełnych danych wycinka, żeby szczyty nie zależały od zmniejszania
+    window = history.window(start_hour, end_hour)
+    n_points = len(window["hour"])
+    max_int = max(10.0, window["rain_intensity"].max() * 1.2) if n_points else 10.0
+    max_dep = max(10.0, window["rain_depth"].max() * 1.1) if n_points else 10.0
+    max_all = max(window["plant_flow"].max(), window["diverted"].max()) if n_points else 0.0
+    if max_capacity: max_all = max(max_all, max_capacity)
+    max_flow = max(100.0, max_all * 1.1) if n_points or max_capacity else 2000.0
+
+    def draw_static(target):
+        _draw_chart_axes(target, rect, rect_int, rect_dep, rect_flow, start_hour, end_hour,
+                         max_int, max_dep, max_flow, max_capacity)
+
+    _chart_layer.blit(surface, rect,
+                      (tuple(rect), start_hour, end_hour, max_int, max_dep, max_flow, max_capacity),
+                      draw_static)
+
+    font_label = get_font(14)
+    # najwyżej jeden punkt na piksel szerokości wykresu
+    series = history.downsampled(start_hour, end_hour, rect_flow.width)
+
+    def to_px(r, hours):
+        return r.left + ((hours - start_hour) / hour_range * r.width).astype(int)
+
+    # === WYKRES 1: INTENSYWNOŚĆ (INT) ===
+    if n_points > 1:
+        hours, vals = series["rain_intensity"]
+        for px, val in zip(to_px(rect_int, hours).tolist(), vals.tolist()):
+            h = int((val / max_int) * rect_int.height)
+            if h > 0:
+                pygame.draw.line(surface, DARK_BLUE, (px, rect_int.bottom), (px, rect_int.bottom - h), 2)
+
+    # === WYKRES 2: GŁĘBOKOŚĆ (DEPTH) ===
+    if n_points > 1:
+        # Rysowanie jako wypełniony obszar pod wykresem
+        hours, vals = series["rain_depth"]
+        pys = rect_dep.bottom - (vals / max_dep * rect_dep.height).astype(int)
+        curve = list(zip(to_px(rect_dep, hours).tolist(), pys.tolist()))
+        poly_points = [(curve[0][0], rect_dep.bottom)] + curve + [(curve[-1][0], rect_dep.bottom)]
+
+        if len(poly_points) > 2:
+            pygame.draw.polygon(surface, (180, 240, 240), poly_points)  # Wypełnienie
+            pygame.draw.lines(surface, DARK_CYAN, False, curve, 2)  # Obrys
+
+    # === WYKRES 3: PRZEPŁYWY (FLOW) ===
+    # Rysowanie linii Est (Oczyszczalnia) i przelewu (0 rysowane na dole wykresu)
+    if n_points > 1:
+        hours, vals = series["plant_flow"]
+        pys = rect_flow.bottom - (vals / max_flow * rect_flow.height).astype(int)
+        pygame.draw.lines(surface, BLUE, False, list(zip(to_px(rect_flow, hours).tolist(), pys.tolist())), 2)
+
+        hours, vals = series["diverted"]
+        if (vals > 0).any():
+            pys = rect_flow.bottom - (np.maximum(vals, 0.0) / max_flow * rect_flow.height).astype(int)
+            pygame.draw.lines(surface, ORANGE, False, list(zip(to_px(rect_flow, hours).tolist(), pys.tolist())), 2)
+
+    # Legenda
+    lx = rect_flow.right - 120
+    ly = rect_flow.top + 10
+    pygame.draw.line(surface, BLUE, (lx, ly), (lx + 20, ly), 2)
+    surface.blit(render_text(font_label, "Oczyszczalnia", BLACK), (lx + 25, ly - 5))
+    pygame.draw.line(surface, ORANGE, (lx, ly + 20), (lx + 20, ly + 20), 2)
+    surface.blit(render_text(font_label, "Przelew", BLACK), (lx + 25, ly + 15))
+
+    if view is not None and view.span is not None:
+        hint = render_text(font_label, "Zoom: kółko myszy, przesuwanie: przeciąganie, Home – całość", GRAY)
+        surface.blit(hint, (rect_flow.left, rect.bottom - hint.get_height() - 6))
+
+    return rect_flow, start_hour, end_hour
+
+
+def _draw_chart_axes(surface, rect, rect_int, rect_dep, rect_flow, start_hour, end_hour,
+                     max_int, max_dep, max_flow, max_capacity):
+    """Warstwa statyczna wykresów: panel, pasy dni, siatka, podziałki, tytuły i linia limitu."""
+    # Tło panelu
+    pygame.draw.rect(surface, LIGHT, rect, border_radius=12)
+    pygame.draw.rect(surface, GRAY, rect, 2, border_radius=12)
+
+    hour_range = max(1, end_hour - start_hour)
+
     # Funkcja pomocnicza: Tło dni
     def draw_bg(target_rect, start_h, end_h):
         pygame.draw.rect(surface, WHITE, target_rect)
@@ -183,17 +416,13 @@ def draw_chart(surface: pygame.Surface, rect: pygame.Rect, points_est: deque, po
 
         pygame.draw.rect(surface, (200, 200, 200), target_rect, 1)
 
-    start_hour = max(0, current_hour - n_points + 1)
-    end_hour = current_hour
-    hour_range = max(1, end_hour - start_hour)
-
     draw_bg(rect_int, start_hour, end_hour)
     draw_bg(rect_dep, start_hour, end_hour)
     draw_bg(rect_flow, start_hour, end_hour)
 
-    font_title = pygame.font.SysFont(None, 18, bold=True)
-    font_label = pygame.font.SysFont(None, 14)
-    font_unit = pygame.font.SysFont(None, 14, bold=True)
+    font_title = get_font(18, bold=True)
+    font_label = get_font(14)
+    font_unit = get_font(14, bold=True)
 
     # === OŚ X - podziałka ===
     if hour_range < 24:
@@ -226,18 +455,18 @@ def draw_chart(surface: pygame.Surface, rect: pygame.Rect, points_est: deque, po
 
         # podziałki i etykiety
         pygame.draw.line(surface, BLACK, (px, rect_int.bottom), (px, rect_int.bottom + 4), 1)
-        lbl = font_label.render(str(curr_tick), True, BLACK)
+        lbl = render_text(font_label, str(curr_tick), BLACK)
         surface.blit(lbl, (px - lbl.get_width() // 2, rect_int.bottom + 6))
         pygame.draw.line(surface, BLACK, (px, rect_dep.bottom), (px, rect_dep.bottom + 4), 1)
-        lbl = font_label.render(str(curr_tick), True, BLACK)
+        lbl = render_text(font_label, str(curr_tick), BLACK)
         surface.blit(lbl, (px - lbl.get_width() // 2, rect_dep.bottom + 6))
         pygame.draw.line(surface, BLACK, (px, rect_flow.bottom), (px, rect_flow.bottom + 4), 1)
-        lbl = font_label.render(str(curr_tick), True, BLACK)
+        lbl = render_text(font_label, str(curr_tick), BLACK)
         surface.blit(lbl, (px - lbl.get_width() // 2, rect_flow.bottom + 6))
 
         curr_tick += step_x
 
-    lbl_x = font_unit.render("Czas symulacji [h]", True, BLACK)
+    lbl_x = render_text(font_unit, "Czas symulacji [h]", BLACK)
     surface.blit(lbl_x, (rect_flow.centerx - lbl_x.get_width() // 2, rect_flow.bottom + 20))
 
     # --- Funkcja pomocnicza do mapowania Y ---
@@ -246,59 +475,22 @@ def draw_chart(surface: pygame.Surface, rect: pygame.Rect, points_est: deque, po
             val = max_v * (i / steps)
             y = r.bottom - int((val / max_v) * r.height)
             pygame.draw.line(surface, (235, 235, 235), (r.left, y), (r.right, y))
-            lbl = font_label.render(format_str.format(val), True, GRAY)
+            lbl = render_text(font_label, format_str.format(val), GRAY)
             surface.blit(lbl, (r.left - lbl.get_width() - 5, y - lbl.get_height() // 2))
 
     # === WYKRES 1: INTENSYWNOŚĆ (INT) ===
-    vals_int = [v for _, v in points_rain_int]
-    max_int = max(10.0, max(vals_int) * 1.2) if vals_int else 10.0
-
-    surface.blit(font_title.render("Intensywność", True, BLACK), (rect_int.left, rect_int.top - 18))
-    surface.blit(font_unit.render("[mm/h]", True, DARK_BLUE), (rect_int.left - 45, rect_int.top + 10))
-
+    surface.blit(render_text(font_title, "Intensywność", BLACK), (rect_int.left, rect_int.top - 18))
+    surface.blit(render_text(font_unit, "[mm/h]", DARK_BLUE), (rect_int.left - 45, rect_int.top + 10))
     draw_y_grid(rect_int, max_int)
 
-    if n_points > 1:
-        for i, (_, val) in enumerate(points_rain_int):
-            rel_x = i / (n_points - 1)
-            px = rect_int.left + int(rel_x * rect_int.width)
-            h = int((val / max_int) * rect_int.height)
-            if h > 0:
-                pygame.draw.line(surface, DARK_BLUE, (px, rect_int.bottom), (px, rect_int.bottom - h), 2)
-
     # === WYKRES 2: GŁĘBOKOŚĆ (DEPTH) ===
-    vals_dep = [v for _, v in points_rain_dep]
-    max_dep = max(10.0, max(vals_dep) * 1.1) if vals_dep else 10.0
-
-    surface.blit(font_title.render("Poziom deszczu (na ziemi)", True, BLACK), (rect_dep.left, rect_dep.top - 18))
-    surface.blit(font_unit.render("[mm]", True, DARK_CYAN), (rect_dep.left - 45, rect_dep.top + 10))
-
+    surface.blit(render_text(font_title, "Poziom deszczu (na ziemi)", BLACK), (rect_dep.left, rect_dep.top - 18))
+    surface.blit(render_text(font_unit, "[mm]", DARK_CYAN), (rect_dep.left - 45, rect_dep.top + 10))
     draw_y_grid(rect_dep, max_dep)
 
-    if n_points > 1:
-        # Rysowanie jako wypełniony obszar pod wykresem
-        poly_points = [(rect_dep.left, rect_dep.bottom)]
-        for i, (_, val) in enumerate(points_rain_dep):
-            rel_x = i / (n_points - 1)
-            px = rect_dep.left + int(rel_x * rect_dep.width)
-            py = rect_dep.bottom - int((val / max_dep) * rect_dep.height)
-            poly_points.append((px, py))
-        poly_points.append((rect_dep.right, rect_dep.bottom))
-
-        if len(poly_points) > 2:
-            pygame.draw.polygon(surface, (180, 240, 240), poly_points)  # Wypełnienie
-            pygame.draw.lines(surface, DARK_CYAN, False, poly_points[1:-1], 2)  # Obrys
-
     # === WYKRES 3: PRZEPŁYWY (FLOW) ===
-    vals_est = [v for _, v in points_est]
-    vals_div = [v for _, v in points_div]
-    all_f = vals_est + vals_div
-    if max_capacity: all_f.append(max_capacity)
-    max_flow = max(100.0, max(all_f) * 1.1) if all_f else 2000.0
-
-    surface.blit(font_title.render("Przepływ", True, BLACK), (rect_flow.left, rect_flow.top - 18))
-    surface.blit(font_unit.render("[m3/h]", True, BLACK), (rect_flow.left - 45, rect_flow.top + 10))
-
+    surface.blit(render_text(font_title, "Przepływ", BLACK), (rect_flow.left, rect_flow.top - 18))
+    surface.blit(render_text(font_unit, "[m3/h]", BLACK), (rect_flow.left - 45, rect_flow.top + 10))
     draw_y_grid(rect_flow, max_flow, steps=5, format_str="{:.0f}")
 
     # Linia limitu
@@ -306,50 +498,21 @@ def draw_chart(surface: pygame.Surface, rect: pygame.Rect, points_est: deque, po
         y_cap = rect_flow.bottom - int((max_capacity / max_flow) * rect_flow.height)
         if rect_flow.top <= y_cap <= rect_flow.bottom:
             pygame.draw.line(surface, RED, (rect_flow.left, y_cap), (rect_flow.right, y_cap), 1)
-            lbl = font_label.render("Limit", True, RED)
+            lbl = render_text(font_label, "Limit", RED)
             surface.blit(lbl, (rect_flow.right - lbl.get_width() - 5, y_cap - 12))
 
-    # Rysowanie linii Est (Oczyszczalnia)
-    if n_points > 1:
-        pts_est = []
-        pts_div = []
-        for i in range(n_points):
-            rel_x = i / (n_points - 1)
-            px = rect_flow.left + int(rel_x * rect_flow.width)
-
-            v_est = points_est[i][1]
-            py_est = rect_flow.bottom - int((v_est / max_flow) * rect_flow.height)
-            pts_est.append((px, py_est))
-
-            v_div = points_div[i][1]
-            if v_div > 0:
-                py_div = rect_flow.bottom - int((v_div / max_flow) * rect_flow.height)
-                pts_div.append((px, py_div))
-            else:
-                # Przerwa w linii, jeśli 0?
-                # Dla uproszczenia rysujemy 0 na dole
-                pts_div.append((px, rect_flow.bottom))
-
-        pygame.draw.lines(surface, BLUE, False, pts_est, 2)
-        if any(v > 0 for _, v in points_div):
-            pygame.draw.lines(surface, ORANGE, False, pts_div, 2)
 
-    # Legenda
-    lx = rect_flow.right - 120
-    ly = rect_flow.top + 10
-    pygame.draw.line(surface, BLUE, (lx, ly), (lx + 20, ly), 2)
-    surface.blit(font_label.render("Oczyszczalnia", True, BLACK), (lx + 25, ly - 5))
-    pygame.draw.line(surface, ORANGE, (lx, ly + 20), (lx + 20, ly + 20), 2)
-    surface.blit(font_label.render("Przelew", True, BLACK), (lx + 25, ly + 15))
+# ====== Rysowanie mapy ======
+_map_layer = StaticLayer()
 
 
-# ====== Rysowanie mapy ======
-def draw_map(surface: pygame.Surface, rect: pygame.Rect, shared: Dict, lock: threading.Lock):
-    if not hasattr(draw_map, "_bg"):
-        draw_map._bg = pygame.image.load(MAP_IMAGE).convert()
-    srf = draw_map._bg
+def draw_map(surface: pygame.Surface, rect: pygame.Rect, shared: Dict, lock: Optional[threading.Lock] = None):
+    pyramid = getattr(draw_map, "_pyramid", None)
+    if pyramid is None or pyramid.view_size != tuple(rect.size):
+        map_bounds()  # przy braku map.png najpierw ją generuje
+        pyramid = draw_map._pyramid = MapPyramid(MAP_IMAGE, rect.size, cache_dir=MAP_CACHE_DIR)
 
-    with lock:
+    with lock if lock is not None else nullcontext():
         s = shared.get("map_scale", 1.0)
         ox, oy = shared.get("map_offset", (0, 0))
         sensors = shared.get("sensors", [])
@@ -360,37 +523,45 @@ def draw_map(surface: pygame.Surface, rect: pygame.Rect, shared: Dict, lock: thr
         plant_params = shared.get("plant_params", {})
         extra_points = shared.get("extra_points", [])
 
-    sw, sh = int(rect.width * s), int(rect.height * s)
-    img = pygame.transform.smoothscale(srf, (sw, sh))
-    surface.fill((244, 247, 252), rect)
-
-    # Clipowanie rysowania do prostokąta mapy
-    surface.set_clip(rect)
-    surface.blit(img, (rect.left + ox, rect.top + oy))
-
     def apply_view(lat, lon):
         x0, y0 = geo_to_px(lat, lon, rect)
         x = rect.left + ox + int((x0 - rect.left) * s)
         y = rect.top + oy + int((y0 - rect.top) * s)
         return x, y
 
-    # 1. Połączenia
-    for (start_loc, end_loc, flow) in connections:
-        sx, sy = apply_view(*start_loc)
-        ex, ey = apply_view(*end_loc)
-        col = (50, 50, 200) if flow > 1.0 else (180, 180, 180)
-        thick = 2 if flow > 1.0 else 1
-        draw_arrow(surface, (sx, sy), (ex, ey), col, thick)
+    font = get_font(16)
+    font_small = get_font(14)
+
+    # Warstwa statyczna: tło, połączenia i punkty dodatkowe – zmienia się tylko przy
+    # przesunięciu / zoomie albo gdy połączenie przejdzie między stanem aktywnym a pustym
+    def draw_static(target):
+        target.fill((244, 247, 252), rect)
+
+        # Clipowanie rysowania do prostokąta mapy
+        target.set_clip(rect)
+        target.blit(pyramid.scaled(s), (rect.left + ox, rect.top + oy))
+
+        # 1. Połączenia
+        for (start_loc, end_loc, flow) in connections:
+            sx, sy = apply_view(*start_loc)
+            ex, ey = apply_view(*end_loc)
+            col = (50, 50, 200) if flow > 1.0 else (180, 180, 180)
+            thick = 2 if flow > 1.0 else 1
+            draw_arrow(target, (sx, sy), (ex, ey), col, thick)
+
+        # 1.5 Extra Points
+        for pid, lat, lon in extra_points:
+            x, y = apply_view(lat, lon)
+            pygame.draw.circle(target, (180, 180, 180), (x, y), 5)
+            lbl = render_text(font_small, str(pid), (100, 100, 100))
+            target.blit(lbl, (x + 6, y - 6))
+        target.set_clip(None)
+
+    active = tuple(flow > 1.0 for _, _, flow in connections)
+    _map_layer.blit(surface, rect, (tuple(rect), s, ox, oy, active, id(extra_points)), draw_static)
 
-    font = pygame.font.SysFont(None, 16)
-    font_small = pygame.font.SysFont(None, 14)
-
-    # 1.5 Extra Points
-    for pid, lat, lon in extra_points:
-        x, y = apply_view(lat, lon)
-        pygame.draw.circle(surface, (180, 180, 180), (x, y), 5)
-        lbl = font_small.render(str(pid), True, (100, 100, 100))
-        surface.blit(lbl, (x + 6, y - 6))
+    # Clipowanie rysowania do prostokąta mapy
+    surface.set_clip(rect)
 
     # 2. Sensory (Kółka)
     SENSOR_RADIUS = 7
@@ -398,9 +569,9 @@ def draw_map(surface: pygame.Surface, rect: pygame.Rect, shared: Dict, lock: thr
         x, y = apply_view(lat, lon)
         color = GREEN if status == "NORMAL" else RED
         pygame.draw.circle(surface, color, (x, y), SENSOR_RADIUS)
-        lbl = font.render(f"{sid}", True, BLACK)
+        lbl = render_text(font, f"{sid}", BLACK)
         surface.blit(lbl, (x + 8, y - 8))
-        lbl_flow = font.render(f"{flow:.0f}", True, (50, 50, 50))
+        lbl_flow = render_text(font, f"{flow:.0f}", (50, 50, 50))
         surface.blit(lbl_flow, (x + 8, y + 4))
 
     # 3. Przelew KP26 (Trójkąt)
@@ -414,7 +585,7 @@ def draw_map(surface: pygame.Surface, rect: pygame.Rect, shared: Dict, lock: thr
         col = ORANGE if active else GRAY
         draw_triangle(surface, x, y, 9, col)
 
-        lbl = font.render(f"KP26: {diverted:.0f}", True, BLACK)
+        lbl = render_text(font, f"KP26: {diverted:.0f}", BLACK)
         surface.blit(lbl, (x + 12, y - 5))
 
     # 4. Oczyszczalnia
@@ -458,7 +629,7 @@ def draw_map(surface: pygame.Surface, rect: pygame.Rect, shared: Dict, lock: thr
         pygame.draw.rect(surface, p_col, (bx + 1, by + bar_h - fill_h, bar_w - 2, fill_h))
 
         # Etykieta pod ikoną
-        lbl_ocz = font.render(f"OCZ: {est:.0f}", True, BLACK)
+        lbl_ocz = render_text(font, f"OCZ: {est:.0f}", BLACK)
         surface.blit(lbl_ocz, (x - (lbl_ocz.get_width() // 2), y + PLANT_RADIUS + 4))
 
     surface.set_clip(None)
@@ -475,29 +646,24 @@ def draw_map(surface: pygame.Surface, rect: pygame.Rect, shared: Dict, lock: thr
     r_dep = rain.get("depth", 0.0)
 
     # czcionki
-    title_f = pygame.font.SysFont(None, 20, bold=True)
-    val_f = pygame.font.SysFont(None, 14)
+    title_f = get_font(20, bold=True)
+    val_f = get_font(14)
 
-    surface.blit(title_f.render("Opady deszczu", True, BLACK), (hud_x + 10, hud_y + 10))
+    surface.blit(render_text(title_f, "Opady deszczu", BLACK), (hud_x + 10, hud_y + 10))
 
     # Funkcja rysująca pojedynczy pasek
     def draw_gauge(x, y, w, h, val, max_v, c_start, c_end, title, unit):
         # Tytuł i wartość
-        surface.blit(val_f.render(title, True, BLACK), (x, y))
+        surface.blit(render_text(val_f, title, BLACK), (x, y))
         val_txt = f"{val:.1f} {unit}"
-        surface.blit(val_f.render(val_txt, True, BLACK), (x + w - 50, y))  # Wartość po prawej
+        surface.blit(render_text(val_f, val_txt, BLACK), (x + w - 50, y))  # Wartość po prawej
 
         # Pasek
         bar_y = y + 20
         pygame.draw.rect(surface, WHITE, (x, bar_y, w, h))
 
-        # Gradient
-        for i in range(w):
-            t = i / w
-            r = int(c_start[0] + (c_end[0] - c_start[0]) * t)
-            g = int(c_start[1] + (c_end[1] - c_start[1]) * t)
-            b = int(c_start[2] + (c_end[2] - c_start[2]) * t)
-            pygame.draw.line(surface, (r, g, b), (x + i, bar_y), (x + i, bar_y + h))
+        # Gradient (gotowa powierzchnia z cache)
+        surface.blit(_gradient_surface(w, h, c_start, c_end), (x, bar_y))
 
         pygame.draw.rect(surface, BLACK, (x, bar_y, w, h), 1)
 
@@ -548,9 +714,9 @@ def draw_control_bar(surface: pygame.Surface, rect: pygame.Rect, shared: Dict,
     is_paused = pause_evt.is_set()
 
     # Czcionki
-    font_ui = pygame.font.SysFont(None, 20)
-    font_bold = pygame.font.SysFont(None, 20, bold=True)
-    font_small = pygame.font.SysFont(None, 16)
+    font_ui = get_font(20)
+    font_bold = get_font(20, bold=True)
+    font_small = get_font(16)
 
     # === SEKCJA 1: PRZYCISKI  ===
     btn_w, btn_h = 80, 34
@@ -567,7 +733,7 @@ def draw_control_bar(surface: pygame.Surface, rect: pygame.Rect, shared: Dict,
 
     # Ikonka i tekst Reset
     pygame.draw.rect(surface, RED, (btn_reset.left + 10, btn_reset.centery - 4, 8, 8))
-    lbl_reset = font_ui.render("Reset", True, BLACK)
+    lbl_reset = render_text(font_ui, "Reset", BLACK)
     surface.blit(lbl_reset, (btn_reset.left + 26, btn_reset.centery - lbl_reset.get_height() // 2))
 
     # Przycisk PLAY/PAUSE
@@ -583,12 +749,12 @@ def draw_control_bar(surface: pygame.Surface, rect: pygame.Rect, shared: Dict,
                (btn_play.left + 12, btn_play.centery + 5),
                (btn_play.left + 20, btn_play.centery)]
         pygame.draw.polygon(surface, GREEN, pts)
-        lbl_play = font_ui.render("Start", True, BLACK)
+        lbl_play = render_text(font_ui, "Start", BLACK)
     else:
         # Ikonka Pauza (Dwie kreski)
         pygame.draw.rect(surface, BLACK, (btn_play.left + 12, btn_play.centery - 5, 3, 10))
         pygame.draw.rect(surface, BLACK, (btn_play.left + 17, btn_play.centery - 5, 3, 10))
-        lbl_play = font_ui.render("Pauza", True, BLACK)
+        lbl_play = render_text(font_ui, "Pauza", BLACK)
 
     surface.blit(lbl_play, (btn_play.left + 28, btn_play.centery - lbl_play.get_height() // 2))
 
@@ -598,7 +764,7 @@ def draw_control_bar(surface: pygame.Surface, rect: pygame.Rect, shared: Dict,
     slider_y = panel_rect.centery + 8
 
     # Etykieta nad suwakiem
-    lbl_speed_title = font_bold.render("Prędkość symulacji", True, BLACK)
+    lbl_speed_title = render_text(font_bold, "Prędkość symulacji", BLACK)
     surface.blit(lbl_speed_title, (slider_x + slider_w // 2 - lbl_speed_title.get_width() // 2, panel_rect.top + 15))
 
     # Pasek suwaka
@@ -619,8 +785,8 @@ def draw_control_bar(surface: pygame.Surface, rect: pygame.Rect, shared: Dict,
 
     # Podpisy pod suwakiem
     # Wolno = max_interval, Szybko = min_interval
-    lbl_slow = font_small.render(f"Wolno ({max_interval}s)", True, GRAY)
-    lbl_fast = font_small.render(f"Szybko ({min_interval}s)", True, GRAY)
+    lbl_slow = render_text(font_small, f"Wolno ({max_interval}s)", GRAY)
+    lbl_fast = render_text(font_small, f"Szybko ({min_interval}s)", GRAY)
 
     surface.blit(lbl_slow, (slider_rect.left, slider_rect.bottom + 5))
     surface.blit(lbl_fast, (slider_rect.right - lbl_fast.get_width(), slider_rect.bottom + 5))
@@ -629,7 +795,7 @@ def draw_control_bar(surface: pygame.Surface, rect: pygame.Rect, shared: Dict,
     time_x = slider_rect.right + 40
 
     # Etykieta
-    lbl_time_title = font_bold.render("Czas symulacji", True, BLACK)
+    lbl_time_title = render_text(font_bold, "Czas symulacji", BLACK)
     surface.blit(lbl_time_title, (time_x, panel_rect.top + 15))
 
     # Wartość
@@ -637,7 +803,7 @@ def draw_control_bar(surface: pygame.Surface, rect: pygame.Rect, shared: Dict,
     max_h = shared.get("max_hours", 168)
 
     time_str = f"{hour} / {max_h + 1} [h]"
-    lbl_time_val = font_ui.render(time_str, True, DARK_BLUE)  # Kolor akcentu
+    lbl_time_val = render_text(font_ui, time_str, DARK_BLUE)  # Kolor akcentu
     surface.blit(lbl_time_val, (time_x, panel_rect.centery + 5))
 
     # === LOGIKA INTERAKCJI SUWAKA ===
@@ -656,6 +822,45 @@ def draw_control_bar(surface: pygame.Surface, rect: pygame.Rect, shared: Dict,
     return btn_reset, btn_play, slider_rect, handle_rect
 
 
+# ====== Pomijanie klatek bez zmian ======
+class FrameGate:
+    """
+    Decyduje, czy klatkę trzeba narysować: tylko gdy przyszły zdarzenia okna (mysz,
+    klawiatura, odsłonięcie) albo zmienił się klucz widoku (wersja stanu z kanału, skala,
+    przesunięcie, pauza). Bez zmian okno nie rysuje i nie robi flip(), a w stanie
+    bezczynnym (pauza / koniec symulacji) blokuje się na pygame.event.wait().
+    """
+
+    def __init__(self, fps=FPS, idle_wait_ms=IDLE_WAIT_MS):
+        self.fps = fps
+        self.idle_wait_ms = idle_wait_ms
+        self.clock = pygame.time.Clock()
+        self.last_key = None
+        self.drawn = 0
+        self.skipped = 0
+
+    def poll(self, idle: bool):
+        """Zdarzenia okna; gdy ich nie ma, czeka na nie (w stanie bezczynnym dłużej)."""
+        events = pygame.event.get()
+        if not events:
+            event = pygame.event.wait(self.idle_wait_ms if idle else 1000 // self.fps)
+            if event.type != pygame.NOEVENT:
+                events = [event] + pygame.event.get()
+        return events
+
+    def should_draw(self, key, events) -> bool:
+        if events or key != self.last_key:
+            self.last_key = key
+            self.drawn += 1
+            return True
+        self.skipped += 1
+        return False
+
+    def tick(self):
+        """Ogranicza tempo do `fps` klatek – tylko po narysowanej klatce."""
+        self.clock.tick(self.fps)
+
+
 def handle_ui_click(event, btn_reset, btn_play, slider_rect, shared, pause_evt):
     if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
         mx, my = event.pos
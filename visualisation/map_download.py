@@ -1,79 +1,323 @@
-import pandas as pd
-import contextily as cx
-import matplotlib.pyplot as plt
-import os
+"""
+Podkład mapy dashboardu (visualisation/map.png + data/map_bounds.csv) budowany offline.
+
+Kafelki OpenStreetMap leżą w lokalnym katalogu w układzie serwera kafelków
+(<katalog>/<zoom>/<x>/<y>.png), więc katalog można skopiować na maszynę bez internetu.
+Sieć jest potrzebna tylko w poleceniu `fetch`. `build` składa mapę wyłącznie z kafelków z cache
+(albo z podanego rastra) dla zakresu wyliczonego z data/wspolrzedne.csv – ten sam zakres i te same
+kafelki dają ten sam plik. Klucz zakresu (granice + zoom + źródło) trafia do map_bounds.csv,
+a `build` nic nie robi, gdy mapa dla tego klucza już jest.
+
+    python -m visualisation.map_download fetch                       # brakujące kafelki (internet)
+    python -m visualisation.map_download build                       # map.png z kafelków z cache
+    python -m visualisation.map_download build --raster plan.png --raster_bounds S N W E
+    python -m visualisation.map_download info                        # zakres, klucz, brakujące kafelki
+
+Dashboard przy starcie woła tylko ensure_map(): brak mapy → próba złożenia z cache,
+a gdy kafelków nie ma – okno mapy rysuje się bez podkładu (nigdy nie czeka na sieć).
+"""
+import argparse
 import csv
+import hashlib
+import math
+import os
+import urllib.request
 
+import numpy as np
 
-def get_map():
-    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-    PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..'))
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..'))
+
+# Dane wejściowe są w głównym folderze w 'data'
+COORDS_PATH = os.path.join(PROJECT_ROOT, "data", "wspolrzedne.csv")
+MAP_IMAGE = os.path.join(SCRIPT_DIR, "map.png")
+BOUNDS_PATH = os.path.join(PROJECT_ROOT, "data", "map_bounds.csv")
+TILE_CACHE_DIR = os.environ.get("SEWER_TILE_CACHE") or os.path.join(SCRIPT_DIR, "tiles")
 
-    # Dane wejściowe są w głównym folderze w 'data'
-    csv_path = os.path.join(PROJECT_ROOT, "data", "wspolrzedne.csv")
+ZOOM = 14
+MARGIN = 0.01  # margines wokół skrajnych punktów [stopnie]
+TILE_SIZE = 256
+TILE_URL = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+USER_AGENT = "sanitary-network-simulation map build"
+BACKGROUND = (245, 245, 245)  # piksele spoza rastra
 
-    map_output_path = os.path.join(SCRIPT_DIR, "map.png")
-    bounds_output_path = os.path.join(PROJECT_ROOT, "data", "map_bounds.csv")
 
-    print(f"[MAPA] Szukam pliku CSV tutaj: {csv_path}")
+class MapAssetError(Exception):
+    """Mapy nie da się zbudować z tego, co jest na dysku (brak kafelków / pliku)."""
 
+
+# ===============================================
+# Zakres mapy
+# ===============================================
+def compute_bounds(csv_path=COORDS_PATH, margin=MARGIN):
+    """(south, north, west, east) – skrajne punkty z pliku współrzędnych plus margines."""
     if not os.path.exists(csv_path):
-        data_dir = os.path.dirname(csv_path)
-        print(f"[DEBUG] Folder data istnieje? {os.path.exists(data_dir)}")
-        if os.path.exists(data_dir):
-            print(f"[DEBUG] Zawartość folderu data: {os.listdir(data_dir)}")
-        raise FileNotFoundError(f"Błąd krytyczny: Nie znaleziono pliku {csv_path}")
-
-    print(f"[MAPA] Wczytuję dane z: {csv_path}")
-    df = pd.read_csv(csv_path)
-
-    # Skrajne punkty
-    min_lat = df["lat"].min()
-    max_lat = df["lat"].max()
-    min_lon = df["lon"].min()
-    max_lon = df["lon"].max()
-
-    # Margines
-    margin = 0.01
-    south = min_lat - margin
-    north = max_lat + margin
-    west = min_lon - margin
-    east = max_lon + margin
-
-    print(f"[MAPA] Generuję mapę dla zakresu Lat: {south:.4f}-{north:.4f}, Lon: {west:.4f}-{east:.4f}")
-
-    # Pobieranie mapy
-    fig, ax = plt.subplots(figsize=(12, 8))
-    ax.set_xlim([west, east])
-    ax.set_ylim([south, north])
+        raise MapAssetError(f"Nie znaleziono pliku {csv_path}")
+    lats, lons = [], []
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            if row.get("lat") and row.get("lon"):
+                lats.append(float(row["lat"]))
+                lons.append(float(row["lon"]))
+    if not lats:
+        raise MapAssetError(f"Brak współrzędnych w {csv_path}")
+    return min(lats) - margin, max(lats) + margin, min(lons) - margin, max(lons) + margin
 
-    try:
-        cx.add_basemap(ax, crs="EPSG:4326", source=cx.providers.OpenStreetMap.Mapnik, zoom=14)
-    except Exception as e:
-        print(f"[MAPA] Błąd pobierania kafelków: {e}")
-        # Rzucamy błąd dalej, żeby zatrzymać program główny
-        raise e
 
-    ax.axis('off')
-    plt.tight_layout(pad=0)
+def map_key(bounds, zoom, source="osm"):
+    """Klucz podkładu: zaokrąglone granice, zoom i źródło (kafelki albo hash rastra)."""
+    raw = ",".join(f"{v:.6f}" for v in bounds) + f":{zoom}:{source}"
+    return hashlib.md5(raw.encode()).hexdigest()[:16]
+
+
+def read_bounds(bounds_path=BOUNDS_PATH):
+    """(granice, klucz) z map_bounds.csv albo (None, None), gdy pliku nie ma lub jest uszkodzony."""
+    try:
+        with open(bounds_path, newline="") as f:
+            reader = csv.reader(f)
+            next(reader)
+            row = next(reader)
+            bounds = (float(row[0]), float(row[1]), float(row[2]), float(row[3]))
+            # starsze pliki (z contextily) nie mają kolumny z kluczem
+            return bounds, row[4] if len(row) > 4 else None
+    except (OSError, StopIteration, IndexError, ValueError):
+        return None, None
 
-    # Zapis mapy
-    os.makedirs(os.path.dirname(map_output_path), exist_ok=True)
-    plt.savefig(map_output_path, dpi=400, bbox_inches="tight", pad_inches=0)
-    plt.close(fig)
 
-    # Zapis granic do CSV
-    with open(bounds_output_path, mode='w', newline='') as f:
+def write_bounds(bounds, key, bounds_path=BOUNDS_PATH):
+    with open(bounds_path, mode='w', newline='') as f:
         writer = csv.writer(f)
-        writer.writerow(['south', 'north','west', 'east' ])
-        writer.writerow([south, north, west, east])
+        writer.writerow(['south', 'north', 'west', 'east', 'key'])
+        writer.writerow([*bounds, key])
+
+
+# ===============================================
+# Kafelki (Web Mercator, układ z/x/y)
+# ===============================================
+def lon_to_px(lon, zoom):
+    """Długość geograficzna → globalna współrzędna x w pikselach kafelków na danym zoomie."""
+    return (np.asarray(lon, dtype=float) + 180.0) / 360.0 * TILE_SIZE * 2 ** zoom
+
+
+def lat_to_px(lat, zoom):
+    """Szerokość geograficzna → globalna współrzędna y (Web Mercator) w pikselach kafelków."""
+    lat = np.radians(np.asarray(lat, dtype=float))
+    return (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0 * TILE_SIZE * 2 ** zoom
+
+
+def tile_range(bounds, zoom):
+    """Zakres kafelków (x0, x1, y0, y1) włącznie, pokrywający granice."""
+    south, north, west, east = bounds
+    x0, x1 = (int(lon_to_px(v, zoom) // TILE_SIZE) for v in (west, east))
+    y0, y1 = (int(lat_to_px(v, zoom) // TILE_SIZE) for v in (north, south))
+    return x0, x1, y0, y1
+
+
+def tile_path(tile_dir, zoom, x, y):
+    return os.path.join(tile_dir, str(zoom), str(x), f"{y}.png")
+
+
+def missing_tiles(bounds, zoom, tile_dir):
+    x0, x1, y0, y1 = tile_range(bounds, zoom)
+    return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)
+            if not os.path.exists(tile_path(tile_dir, zoom, x, y))]
+
+
+def fetch_tiles(bounds, zoom=ZOOM, tile_dir=TILE_CACHE_DIR, url=TILE_URL, timeout=20):
+    """Pobiera do cache kafelki, których jeszcze nie ma (jedyne miejsce, które używa sieci)."""
+    missing = missing_tiles(bounds, zoom, tile_dir)
+    print(f"[MAPA] Do pobrania: {len(missing)} kafelków (zoom {zoom}) do {tile_dir}")
+    for i, (x, y) in enumerate(missing, 1):
+        path = tile_path(tile_dir, zoom, x, y)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        request = urllib.request.Request(url.format(z=zoom, x=x, y=y), headers={"User-Agent": USER_AGENT})
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            data = response.read()
+        # zapis przez plik tymczasowy – przerwane pobieranie nie zostawia uciętego kafelka
+        with open(path + ".part", "wb") as f:
+            f.write(data)
+        os.replace(path + ".part", path)
+        if i % 20 == 0 or i == len(missing):
+            print(f"[MAPA] {i}/{len(missing)}")
+    return len(missing)
+
 
-    print(f"[MAPA] Sukces! Mapa zapisana w: {map_output_path}")
-    print(f"[MAPA] Granice zapisane w: {bounds_output_path}")
+# ===============================================
+# Składanie obrazu
+# ===============================================
+def _load_rgb(path):
+    import pygame
+    surf = pygame.image.load(path)
+    w, h = surf.get_size()
+    return np.frombuffer(pygame.image.tostring(surf, "RGB"), dtype=np.uint8).reshape(h, w, 3)
+
+
+def _save_rgb(image, path):
+    import pygame
+    h, w, _ = image.shape
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    pygame.image.save(pygame.image.frombuffer(np.ascontiguousarray(image).tobytes(), (w, h), "RGB"), path)
+
+
+def _sample(src, rows, cols):
+    """Najbliższy piksel src dla każdej pary (wiersz, kolumna); poza obrazem – BACKGROUND."""
+    rows = np.floor(rows).astype(int)
+    cols = np.floor(cols).astype(int)
+    out = np.empty((len(rows), len(cols), 3), dtype=np.uint8)
+    out[:] = BACKGROUND
+    r_ok = (rows >= 0) & (rows < src.shape[0])
+    c_ok = (cols >= 0) & (cols < src.shape[1])
+    out[np.ix_(r_ok, c_ok)] = src[np.ix_(rows[r_ok], cols[c_ok])]
+    return out
+
+
+def render_tiles(bounds, zoom=ZOOM, tile_dir=TILE_CACHE_DIR):
+    """
+    Obraz RGB dokładnie na granicach, liniowy w lat / lon (tak liczy geo_to_px).
+    Kafelki są w Web Mercator, więc wiersze wybierane są przez lat_to_px, a kolumny liniowo.
+    """
+    missing = missing_tiles(bounds, zoom, tile_dir)
+    if missing:
+        raise MapAssetError(f"Brak {len(missing)} kafelków (zoom {zoom}) w {tile_dir} – "
+                            f"python -m visualisation.map_download fetch")
+    south, north, west, east = bounds
+    x0, x1, y0, y1 = tile_range(bounds, zoom)
+    mosaic = np.empty(((y1 - y0 + 1) * TILE_SIZE, (x1 - x0 + 1) * TILE_SIZE, 3), dtype=np.uint8)
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            r, c = (y - y0) * TILE_SIZE, (x - x0) * TILE_SIZE
+            mosaic[r:r + TILE_SIZE, c:c + TILE_SIZE] = _load_rgb(tile_path(tile_dir, zoom, x, y))
+
+    # rozdzielczość natywna kafelków na tym zoomie
+    left, right = lon_to_px(west, zoom), lon_to_px(east, zoom)
+    top, bottom = lat_to_px(north, zoom), lat_to_px(south, zoom)
+    width, height = int(round(right - left)), int(round(bottom - top))
+    lats = north - (np.arange(height) + 0.5) / height * (north - south)
+    cols = left + (np.arange(width) + 0.5) / width * (right - left) - x0 * TILE_SIZE
+    return _sample(mosaic, lat_to_px(lats, zoom) - y0 * TILE_SIZE, cols)
+
+
+def render_raster(path, bounds, raster_bounds=None):
+    """
+    Lokalny raster jako podkład. Bez raster_bounds zakłada się, że obejmuje dokładnie granice mapy;
+    z raster_bounds (south, north, west, east) jest przycinany / dopełniany liniowo w lat / lon.
+    """
+    if not os.path.exists(path):
+        raise MapAssetError(f"Nie znaleziono rastra {path}")
+    src = _load_rgb(path)
+    if raster_bounds is None:
+        return src
+    south, north, west, east = bounds
+    r_south, r_north, r_west, r_east = raster_bounds
+    src_h, src_w = src.shape[:2]
+    # gęstość pikseli rastra zostaje bez zmian
+    width = max(1, int(round(src_w * (east - west) / (r_east - r_west))))
+    height = max(1, int(round(src_h * (north - south) / (r_north - r_south))))
+    lats = north - (np.arange(height) + 0.5) / height * (north - south)
+    lons = west + (np.arange(width) + 0.5) / width * (east - west)
+    rows = (r_north - lats) / (r_north - r_south) * src_h
+    cols = (lons - r_west) / (r_east - r_west) * src_w
+    return _sample(src, rows, cols)
+
+
+def _file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.md5(f.read()).hexdigest()[:16]
+
+
+def build_map(zoom=ZOOM, tile_dir=TILE_CACHE_DIR, raster=None, raster_bounds=None, force=False,
+              coords_path=COORDS_PATH, map_path=MAP_IMAGE, bounds_path=BOUNDS_PATH):
+    """Buduje map.png i map_bounds.csv bez sieci; zwraca granice. Gotowa mapa z tym samym kluczem zostaje."""
+    bounds = compute_bounds(coords_path)
+    source = "osm"
+    if raster:
+        # ten sam plik z innymi raster_bounds daje inny obraz – granice rastra też są w kluczu
+        source = f"raster:{_file_hash(raster)}"
+        if raster_bounds is not None:
+            source += ":" + ",".join(f"{v:.6f}" for v in raster_bounds)
+    key = map_key(bounds, zoom, source)
+    if not force and os.path.exists(map_path) and read_bounds(bounds_path)[1] == key:
+        print(f"[MAPA] Mapa aktualna (klucz {key})")
+        return bounds
+
+    south, north, west, east = bounds
+    print(f"[MAPA] Składam mapę dla zakresu Lat: {south:.4f}-{north:.4f}, Lon: {west:.4f}-{east:.4f}")
+    if raster:
+        image = render_raster(raster, bounds, raster_bounds)
+    else:
+        image = render_tiles(bounds, zoom, tile_dir)
+    _save_rgb(image, map_path)
+    write_bounds(bounds, key, bounds_path)
+
+    print(f"[MAPA] Sukces! Mapa {image.shape[1]}×{image.shape[0]} zapisana w: {map_path}")
+    print(f"[MAPA] Granice zapisane w: {bounds_path} (klucz {key})")
+    return bounds
+
+
+def get_map():
+    """Dawne zachowanie: dociąga brakujące kafelki (internet) i buduje mapę."""
+    fetch_tiles(compute_bounds())
+    return build_map()
+
+
+# ===============================================
+# Start dashboardu
+# ===============================================
+def ensure_map(map_path=MAP_IMAGE, bounds_path=BOUNDS_PATH, tile_dir=TILE_CACHE_DIR):
+    """
+    Granice mapy dla dashboardu – bez sieci i bez przerywania programu.
+    Gotowa mapa jest używana tak, jak jest; brak mapy → złożenie z kafelków z cache;
+    brak kafelków → granice z wspolrzedne.csv i okno bez podkładu.
+    """
+    bounds, _ = read_bounds(bounds_path)
+    if bounds is not None and os.path.exists(map_path):
+        return bounds
+    try:
+        return build_map(tile_dir=tile_dir, map_path=map_path, bounds_path=bounds_path)
+    except MapAssetError as e:
+        print(f"[MAPA] {e}")
+        print("[MAPA] Dashboard bez podkładu mapy (python -m visualisation.map_download build).")
+        return bounds if bounds is not None else compute_bounds()
 
 
 if __name__ == "__main__":
+    # opcje wspólne dla poleceń (bez polecenia: fetch + build z wartościami domyślnymi)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--tiles", type=str, default=TILE_CACHE_DIR, help="Katalog cache kafelków (z/x/y.png)")
+    common.add_argument("--zoom", type=int, default=ZOOM)
+
+    parser = argparse.ArgumentParser(description="Podkład mapy dashboardu z lokalnego cache kafelków.",
+                                     parents=[common])
+    sub = parser.add_subparsers(dest="command")
+
+    sub.add_parser("fetch", parents=[common], help="Pobierz brakujące kafelki OSM do cache (wymaga internetu)")
+
+    p_build = sub.add_parser("build", parents=[common], help="Zbuduj map.png i map_bounds.csv bez sieci")
+    p_build.add_argument("--raster", type=str, default=None, help="Lokalny obraz zamiast kafelków")
+    p_build.add_argument("--raster_bounds", type=float, nargs=4, default=None,
+                         metavar=("SOUTH", "NORTH", "WEST", "EAST"), help="Zasięg rastra (domyślnie granice mapy)")
+    p_build.add_argument("--force", action="store_true", help="Buduj także, gdy mapa z tym kluczem istnieje")
+
+    sub.add_parser("info", parents=[common], help="Zakres, klucz i stan cache kafelków")
+
+    args = parser.parse_args()
     try:
-        get_map()
+        bounds = compute_bounds()
+        if args.command == "fetch":
+            fetch_tiles(bounds, args.zoom, args.tiles)
+        elif args.command == "build":
+            build_map(args.zoom, args.tiles, args.raster, args.raster_bounds, args.force)
+        elif args.command == "info":
+            x0, x1, y0, y1 = tile_range(bounds, args.zoom)
+            stored_key = read_bounds()[1]
+            key = map_key(bounds, args.zoom)
+            print(f"[MAPA] Zakres (S, N, W, E): {', '.join(f'{v:.6f}' for v in bounds)}")
+            print(f"[MAPA] Kafelki zoom {args.zoom}: x {x0}-{x1}, y {y0}-{y1} "
+                  f"({(x1 - x0 + 1) * (y1 - y0 + 1)}, brakuje {len(missing_tiles(bounds, args.zoom, args.tiles))})")
+            print(f"[MAPA] Klucz (kafelki): {key}; zapisana mapa: {stored_key or '-'}"
+                  f"{'' if os.path.exists(MAP_IMAGE) else ' (brak map.png)'}")
+        else:
+            fetch_tiles(bounds, args.zoom, args.tiles)
+            build_map(args.zoom, args.tiles)
     except Exception as e:
-        print(f"BŁĄD: {e}")
\ No newline at end of file
+        print(f"BŁĄD: {e}")
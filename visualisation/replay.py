@@ -0,0 +1,323 @@
+"""
+Zapis i odtwarzanie stanów symulacji dla dashboardu.
+
+Każdy stan publikowany przez SimulationThread (ten sam płaski rekord float64, który trafia
+do SnapshotChannel) można dopisać do pliku o stałej długości rekordu. Odtwarzanie czyta plik
+przez np.memmap i publikuje rekordy do zwykłego kanału, więc okna mapy i wykresów działają
+bez zmian – dochodzi tylko przewijanie (seek), przyspieszanie i odtwarzanie wstecz.
+
+    python run_visualisation.py --record data/burza.snap       # zapis przebiegu na żywo
+    python run_visualisation.py --replay data/burza.snap       # odtwarzanie w oknach
+    python -m visualisation.replay record --rain_file data/rain.csv --out data/rain.snap
+    python -m visualisation.replay batch data/rain_experiments/*.csv --out_dir data/replays
+    python -m visualisation.replay info data/rain.snap
+
+Układ pliku: MAGIC, długość nagłówka (uint32), nagłówek JSON (pola stanu, liczba przepływomierzy,
+długość rekordu, StateLayout), dopełnienie do 8 bajtów, dalej rekordy float64 jeden po drugim.
+"""
+import argparse
+import json
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from visualisation.shared_state import STATE_FIELDS, SnapshotChannel, StateLayout
+
+MAGIC = b"SEWERLOG"
+FORMAT_VERSION = 1
+MAX_PLAYBACK_RATE = 64
+
+
+def _field_index(name):
+    return 1 + STATE_FIELDS.index(name)
+
+
+# === ZAPIS ===
+class SnapshotLogWriter:
+    """Dopisuje rekordy stanu do pliku (po każdym dopisaniu flush – plik da się czytać w trakcie)."""
+
+    def __init__(self, path, layout, record_size=None):
+        self.path = path
+        self.layout = layout
+        self.record_size = record_size or 1 + len(STATE_FIELDS) + 2 * layout.n_sensors
+        self.count = 0
+
+        header = json.dumps({
+            "version": FORMAT_VERSION,
+            "state_fields": list(STATE_FIELDS),
+            "n_sensors": layout.n_sensors,
+            "record_size": self.record_size,
+            "layout": layout.to_dict(),
+        }).encode("utf-8")
+        # rekordy zaczynają się od pełnych 8 bajtów (memmap float64 bez kopiowania)
+        pad = -(len(MAGIC) + 4 + len(header)) % 8
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, "wb")
+        self.file.write(MAGIC + struct.pack("<I", len(header) + pad) + header + b" " * pad)
+        self.file.flush()
+
+    def append(self, record):
+        record = np.asarray(record, dtype="<f8")
+        if record.shape != (self.record_size,):
+            raise ValueError(f"Rekord ma {record.size} wartości, oczekiwano {self.record_size}")
+        self.file.write(record.tobytes())
+        self.file.flush()
+        self.count += 1
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# === ODCZYT ===
+class SnapshotLogReader:
+    """Rekordy pliku jako tablica (rekordy × record_size) w np.memmap – bez wczytywania całości."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"To nie jest zapis stanów symulacji: {path}")
+            (header_len,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_len))
+        if header["state_fields"] != list(STATE_FIELDS):
+            raise ValueError(f"Zapis {path} ma inny układ pól stanu niż ta wersja programu")
+        self.header = header
+        self.layout = StateLayout.from_dict(header["layout"])
+        self.record_size = header["record_size"]
+        self.offset = len(MAGIC) + 4 + header_len
+        self.records = None
+        self.refresh()
+
+    def refresh(self):
+        """Mapuje plik na nowo, jeśli przybyło rekordów (np. zapis wciąż trwa). Zwraca liczbę rekordów."""
+        # niepełny ostatni rekord (zapis w toku) jest pomijany
+        n = (os.path.getsize(self.path) - self.offset) // (8 * self.record_size)
+        if self.records is None or n != len(self.records):
+            self.records = np.memmap(self.path, dtype="<f8", mode="r", offset=self.offset,
+                                     shape=(n, self.record_size)) if n else np.zeros((0, self.record_size))
+        return n
+
+    def __len__(self):
+        return len(self.records)
+
+    def record(self, index):
+        return self.records[index]
+
+    def column(self, name):
+        """Jedno pole stanu (STATE_FIELDS) dla wszystkich rekordów."""
+        return self.records[:, _field_index(name)]
+
+    def sensor_flows(self):
+        start = 1 + len(STATE_FIELDS)
+        return self.records[:, start:start + self.layout.n_sensors]
+
+    def history(self, pos, n=None):
+        """
+        Rekordy kończące się na pos (najwyżej n), ale nie sprzed ostatniego resetu modelu
+        (godzina maleje) – tyle, ile okno wykresu zebrałoby po dojściu do pos na żywo.
+        Zwraca (godzina, oczyszczalnia, przelew, intensywność, depth).
+        """
+        lo = 0 if n is None else max(0, pos - n + 1)
+        hours = self.column("hour")[lo:pos + 1]
+        resets = np.nonzero(np.diff(hours) < 0)[0]
+        if resets.size:
+            lo += int(resets[-1]) + 1
+        window = self.records[lo:pos + 1]
+        return tuple(window[:, _field_index(name)] for name in
+                     ("hour", "plant_flow", "overflow_diverted", "rain_intensity", "rain_depth"))
+
+
+# === ODTWARZANIE ===
+class ReplayThread(threading.Thread):
+    """
+    Zastępuje SimulationThread: zamiast liczyć model, publikuje kolejne rekordy z pliku.
+    Sterowanie przez pola kanału: sim_interval (suwak) – czas między klatkami,
+    playback_rate – ile rekordów na klatkę (ujemne = wstecz), seek_cmd – skok do rekordu
+    seek_cmd - 1, reset_cmd – powrót na początek. Bieżący rekord trafia do replay_pos.
+    """
+
+    def __init__(self, reader, interval: float, channel, stop_evt, pause_evt):
+        super().__init__(daemon=True)
+        self.reader = reader
+        self.default_interval = interval
+        self.channel = channel
+        self.controls = channel.controls
+        self.stop_evt = stop_evt
+        self.pause_evt = pause_evt
+        self.pos = 0
+
+    def _show(self, pos):
+        self.pos = max(0, min(len(self.reader) - 1, pos))
+        self.controls["replay_pos"] = self.pos
+        self.channel.publish_record(self.reader.record(self.pos))
+
+    def run(self):
+        print(f"[REPLAY] start: {self.reader.path} ({len(self.reader)} stanów)")
+        if not len(self.reader):
+            print("[REPLAY] Pusty zapis.")
+            return
+        self._show(0)
+
+        while not self.stop_evt.is_set():
+            if self.controls["reset_cmd"]:
+                self.controls["reset_cmd"] = False
+                self.pause_evt.set()
+                self._show(0)
+                continue
+
+            seek = int(self.controls["seek_cmd"])
+            if seek:
+                self.controls["seek_cmd"] = 0
+                self._show(seek - 1)
+
+            if not self.pause_evt.is_set():
+                rate = int(self.controls["playback_rate"]) or 1
+                if rate > 0 and self.pos + rate >= len(self.reader):
+                    self.reader.refresh()  # zapis mógł urosnąć w trakcie odtwarzania
+                target = max(0, min(len(self.reader) - 1, self.pos + rate))
+                if target != self.pos:
+                    self._show(target)
+                else:
+                    self.pause_evt.set()
+                    print("[REPLAY] Koniec zapisu." if rate > 0 else "[REPLAY] Początek zapisu.")
+
+            interval = self.controls.get("sim_interval")
+            self._wait(self.default_interval if interval is None else interval)
+        print("[REPLAY] stop")
+
+    def _wait(self, interval):
+        """Przerwa między klatkami, przerywana przez przewijanie i reset (suwak bywa ustawiony na 1.5 s)."""
+        deadline = time.monotonic() + interval
+        while not self.stop_evt.is_set() and time.monotonic() < deadline:
+            if self.controls["seek_cmd"] or self.controls["reset_cmd"]:
+                return
+            time.sleep(min(0.02, max(0.0, deadline - time.monotonic())))
+
+
+# === ZAPIS BEZ OKIEN ===
+def record_model_run(model, path):
+    """Liczy model do końca i zapisuje każdy stan (jak SimulationThread z recorder, ale bez czekania)."""
+    channel = SnapshotChannel.create(StateLayout.from_model(model))
+    try:
+        with SnapshotLogWriter(path, channel.layout, channel.record_size) as log:
+            channel.publish(model)
+            log.append(channel.state_record())
+            while model.running:
+                model.step()
+                channel.publish(model)
+                log.append(channel.state_record())
+            return log.count
+    finally:
+        channel.close()
+
+
+def write_batch_logs(result, directory, model):
+    """
+    Zapis każdego scenariusza z model.batch.BatchResult jako osobny plik <nazwa>.snap.
+    model – SewerSystemModel o tej samej sieci i parametrach co przebieg wsadowy
+    (położenia węzłów i progi oczyszczalni), jeszcze nieliczony: jego stan początkowy jest
+    pierwszym rekordem każdego pliku, jak w record_model_run.
+    """
+    layout = StateLayout.from_model(model)
+    # stan przed pierwszym krokiem (godzina 1, zerowe przepływy) – wspólny dla scenariuszy
+    channel = SnapshotChannel.create(layout)
+    try:
+        channel.publish(model)
+        initial = channel.state_record()
+    finally:
+        channel.close()
+    n = layout.n_sensors
+    column = {sid: j for j, sid in enumerate(result.sensor_ids)}
+    order = [column[sid] for sid, _, _ in layout.sensors]
+    hours = result.total_flow.shape[1]
+    start = time.time()
+
+    paths = []
+    for i, name in enumerate(result.names):
+        records = np.zeros((hours, 1 + len(STATE_FIELDS) + 2 * n))
+        fields = {
+            # jak w SimulationThread: stan po kroku t pokazuje godzinę t + 2
+            "hour": np.arange(hours) + 2,
+            "max_hours": model.max_hours,
+            "running": np.arange(hours) < hours - 1,
+            "max_capacity": model.max_capacity,
+            "rain_intensity": result.rain_intensity[i],
+            "rain_depth": result.rain_depth[i],
+            "plant_flow": result.total_flow[i],
+            "overflow_active": result.overflow_active[i],
+            "overflow_diverted": result.diverted_flow[i],
+            "nominal": model.nominal_capacity,
+            "warning": model.warning_threshold,
+            "hydraulic": model.hydraulic_capacity,
+            "timestamp": start + np.arange(hours),
+        }
+        for field, values in fields.items():
+            records[:, _field_index(field)] = values
+        flows = 1 + len(STATE_FIELDS)
+        records[:, flows:flows + n] = result.sensor_flow[i][:, order]
+        records[:, flows + n:] = result.sensor_alert[i][:, order]
+
+        path = os.path.join(directory, f"{name}.snap")
+        with SnapshotLogWriter(path, layout, channel.record_size) as log:
+            log.append(initial)
+            for record in records:
+                log.append(record)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    from model.batch import run_batch_files
+    from model.log import configure_logging
+    from model.model import SewerSystemModel
+
+    parser = argparse.ArgumentParser(description="Zapis i podgląd przebiegów do odtwarzania w dashboardzie.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_rec = sub.add_parser("record", help="Policz jeden przebieg bez okien i zapisz wszystkie stany")
+    p_rec.add_argument("--rain_file", type=str, default="data/rain.csv")
+    p_rec.add_argument("--max_hours", type=int, default=168)
+    p_rec.add_argument("--max_capacity", type=int, default=2000)
+    p_rec.add_argument("--out", type=str, required=True)
+
+    p_batch = sub.add_parser("batch", help="Policz scenariusze wsadowo (run_batch) i zapisz każdy osobno")
+    p_batch.add_argument("rain_files", nargs="+")
+    p_batch.add_argument("--max_hours", type=int, default=168)
+    p_batch.add_argument("--max_capacity", type=int, default=2000)
+    p_batch.add_argument("--out_dir", type=str, required=True)
+
+    p_info = sub.add_parser("info", help="Podsumowanie pliku zapisu")
+    p_info.add_argument("path")
+
+    args = parser.parse_args()
+    configure_logging(quiet=True)
+
+    if args.command == "record":
+        model = SewerSystemModel(rain_file=args.rain_file, max_hours=args.max_hours, max_capacity=args.max_capacity)
+        count = record_model_run(model, args.out)
+        print(f"[REPLAY] Zapisano {count} stanów: {args.out}")
+    elif args.command == "batch":
+        result = run_batch_files(args.rain_files, max_hours=args.max_hours, max_capacity=args.max_capacity)
+        model = SewerSystemModel(max_hours=args.max_hours, max_capacity=args.max_capacity, rain_intensity=[])
+        for path in write_batch_logs(result, args.out_dir, model):
+            print(f"[REPLAY] Zapisano: {path}")
+    else:
+        reader = SnapshotLogReader(args.path)
+        hours = reader.column("hour")
+        print(f"{args.path}: {len(reader)} stanów, {reader.layout.n_sensors} przepływomierzy, "
+              f"godziny {int(hours.min()) if len(reader) else '-'}–{int(hours.max()) if len(reader) else '-'}")
+        if len(reader):
+            print(f"  szczyt oczyszczalni: {reader.column('plant_flow').max():.0f} m3/h, "
+                  f"godziny z przelewem: {int(reader.column('overflow_active').sum())}")
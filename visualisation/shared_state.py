@@ -0,0 +1,328 @@
+"""
+Stan symulacji dla okien dashboardu przez pamięć współdzieloną (zamiast mp.Manager().dict()).
+
+Wątek symulacji zapisuje po każdym kroku liczby (przepływy i statusy przepływomierzy,
+oczyszczalnia, przelew, opad, godzina) do stałego bufora float64 w SharedMemory.
+Okna map / wykresów czytają go bez blokad i bez pickle – spójność zapewnia licznik
+sekwencji (seqlock): nieparzysty = zapis w toku, czytelnik ponawia odczyt, gdy licznik
+zmienił się w trakcie kopiowania.
+
+Rzeczy stałe w czasie symulacji (ID i położenia węzłów, połączenia, punkty dodatkowe)
+trafiają do procesów okien raz, razem z opisem układu bufora (StateLayout).
+Sterowanie z UI (suwak prędkości, reset, przewijanie odtwarzania) ma osobny, mały obszar
+w tym samym bloku.
+"""
+import math
+import time
+from datetime import datetime
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# pola nagłówka stanu (po liczniku sekwencji)
+STATE_FIELDS = (
+    "hour", "max_hours", "running", "max_capacity",
+    "rain_intensity", "rain_depth",
+    "plant_flow", "overflow_active", "overflow_diverted",
+    "nominal", "warning", "hydraulic",
+    "timestamp",
+)
+# sterowanie pisane przez okna, czytane przez wątek symulacji
+# (seek_cmd, playback_rate i replay_pos używa tylko odtwarzanie zapisu – visualisation.replay)
+CONTROL_FIELDS = ("ui_slider_val", "sim_interval", "reset_cmd", "seek_cmd", "playback_rate", "replay_pos")
+# pola, które do pierwszego ustawienia nie mają wartości (NaN; SharedControls.get zwraca None),
+# żeby jawne 0 – np. sim_interval = 0, symulacja bez przerw – nie znaczyło "brak ustawienia"
+OPTIONAL_CONTROLS = ("sim_interval",)
+
+
+# === UKŁAD BUFORA I CZĘŚĆ STAŁA STANU ===
+class StateLayout:
+    """
+    Część stanu, która nie zmienia się w trakcie symulacji (także po resecie modelu):
+      - sensors      – [(ID, lat, lon)] w kolejności model.sensors,
+      - overflow     – (ID, lat, lon) przelewu,
+      - plant        – (lat, lon) oczyszczalni,
+      - connections  – [(start_loc, end_loc, indeks przepływomierza źródłowego albo -1)],
+      - extra_points – [(ID, lat, lon)] punktów spoza modelu (z pliku współrzędnych).
+    """
+
+    def __init__(self, sensors, overflow, plant, connections, extra_points):
+        self.sensors = sensors
+        self.overflow = overflow
+        self.plant = plant
+        self.connections = connections
+        self.extra_points = extra_points
+
+    @classmethod
+    def from_model(cls, model):
+        sensors = [(s.location_id, s.location[0], s.location[1]) for s in model.sensors.values()]
+        index = {sid: i for i, (sid, _, _) in enumerate(sensors)}
+        overflow = model.overflow_point
+        plant = model.plant
+
+        loc_map = {s.location_id: s.location for s in model.sensors.values()}
+        loc_map[model.overflow_id] = overflow.location
+        loc_map[model.plant_id] = plant.location
+        active_ids = set(loc_map) | {overflow.location_id}
+
+        extra_points = []
+        if getattr(model, "coords", None):
+            for pid, coord in model.coords.items():
+                if pid not in active_ids:
+                    lat = coord.get("lat")
+                    lon = coord.get("lon")
+                    if lat and lon:
+                        extra_points.append((pid, lat, lon))
+
+        connections = []
+        for src, targets in model.graph.items():
+            if src in loc_map:
+                for tgt in targets:
+                    if tgt in loc_map:
+                        connections.append((loc_map[src], loc_map[tgt], index.get(src, -1)))
+
+        return cls(
+            sensors,
+            (overflow.location_id, overflow.location[0], overflow.location[1]),
+            (plant.location[0], plant.location[1]),
+            connections,
+            extra_points,
+        )
+
+    @property
+    def n_sensors(self):
+        return len(self.sensors)
+
+    def to_dict(self):
+        return {
+            "sensors": [list(s) for s in self.sensors],
+            "overflow": list(self.overflow),
+            "plant": list(self.plant),
+            "connections": [[list(start), list(end), i] for start, end, i in self.connections],
+            "extra_points": [list(p) for p in self.extra_points],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            [tuple(s) for s in data["sensors"]],
+            tuple(data["overflow"]),
+            tuple(data["plant"]),
+            [(tuple(start), tuple(end), int(i)) for start, end, i in data["connections"]],
+            [tuple(p) for p in data["extra_points"]],
+        )
+
+
+# === KANAŁ STANU ===
+class SnapshotChannel:
+    """
+    Bufor float64: [seq | pola STATE_FIELDS | przepływy N | statusy N | sterowanie].
+    Jeden pisarz (wątek symulacji), dowolnie wielu czytelników (procesy okien).
+    Obiekt można przekazać do mp.Process – po stronie potomka podłącza się do tego samego bloku.
+    """
+
+    def __init__(self, shm, layout, owner=False):
+        self.shm = shm
+        self.layout = layout
+        self.owner = owner
+        n = layout.n_sensors
+        self._state_end = 1 + len(STATE_FIELDS) + 2 * n
+        size = self._state_end + len(CONTROL_FIELDS)
+        self.buffer = np.ndarray((size,), dtype=np.float64, buffer=shm.buf)
+        self._flows = slice(1 + len(STATE_FIELDS), 1 + len(STATE_FIELDS) + n)
+        self._status = slice(1 + len(STATE_FIELDS) + n, self._state_end)
+        self.controls = SharedControls(self.buffer[self._state_end:])
+        self._last_seq = -1
+        self._last_state = None
+
+    @classmethod
+    def create(cls, layout, **controls):
+        n_values = 1 + len(STATE_FIELDS) + 2 * layout.n_sensors + len(CONTROL_FIELDS)
+        shm = shared_memory.SharedMemory(create=True, size=8 * n_values)
+        channel = cls(shm, layout, owner=True)
+        channel.buffer[:] = 0.0
+        for name in OPTIONAL_CONTROLS:
+            channel.controls[name] = math.nan
+        for name, value in controls.items():
+            channel.controls[name] = value
+        return channel
+
+    @classmethod
+    def attach(cls, name, layout):
+        return cls(shared_memory.SharedMemory(name=name), layout)
+
+    def __reduce__(self):
+        # do procesu potomnego trafia tylko nazwa bloku i część stała stanu
+        return SnapshotChannel.attach, (self.shm.name, self.layout)
+
+    def close(self):
+        self.buffer = None
+        self.controls = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    # ===============================================
+    # Zapis (wątek symulacji)
+    # ===============================================
+    @property
+    def record_size(self):
+        """Liczba wartości float64 w jednym stanie (licznik sekwencji + pola + przepływy + statusy)."""
+        return self._state_end
+
+    def publish(self, model):
+        flows, alerts = model.sensor_state()
+        plant = model.plant
+        overflow = model.overflow_point
+        values = (
+            model.current_hour, model.max_hours, model.running, model.max_capacity,
+            model.current_rain_intensity, model.current_rain_depth,
+            getattr(plant, "estimated_flow", 0.0), getattr(overflow, "active", False),
+            getattr(overflow, "diverted_flow", 0.0),
+            getattr(model, "nominal_capacity", 1700), getattr(model, "warning_threshold", 2000),
+            getattr(model, "hydraulic_capacity", 2200),
+            time.time(),
+        )
+        buf = self.buffer
+        seq = buf[0]
+        buf[0] = seq + 1  # nieparzysty: zapis w toku
+        buf[1:1 + len(values)] = values
+        buf[self._flows] = flows
+        buf[self._status] = alerts
+        buf[0] = seq + 2
+
+    def publish_record(self, record):
+        """Publikuje stan zapisany wcześniej przez state_record() (licznik sekwencji z zapisu pomijany)."""
+        buf = self.buffer
+        seq = buf[0]
+        buf[0] = seq + 1
+        buf[1:self._state_end] = record[1:self._state_end]
+        buf[0] = seq + 2
+
+    def state_record(self):
+        """Kopia bieżącego stanu jako płaski rekord float64 (do zapisu; woła tylko pisarz)."""
+        return self.buffer[:self._state_end].copy()
+
+    # ===============================================
+    # Odczyt (okna)
+    # ===============================================
+    def sequence(self):
+        return int(self.buffer[0])
+
+    @property
+    def version(self):
+        """Numer sekwencji stanu zwróconego ostatnio przez read() (klucz do pomijania klatek)."""
+        return int(self._last_seq)
+
+    def read(self):
+        """Spójna kopia stanu jako słownik w układzie dawnego shared dict (cache do kolejnej zmiany)."""
+        buf = self.buffer
+        while True:
+            seq = buf[0]
+            if seq == self._last_seq and self._last_state is not None:
+                return self._last_state
+            if int(seq) % 2:
+                time.sleep(0)
+                continue
+            data = buf[:self._state_end].copy()
+            if buf[0] == seq:
+                break
+        self._last_seq = seq
+        self._last_state = self._to_state(data)
+        return self._last_state
+
+    def _to_state(self, data):
+        layout = self.layout
+        fields = dict(zip(STATE_FIELDS, data[1:1 + len(STATE_FIELDS)].tolist()))
+        flows = data[self._flows].tolist()
+        status = data[self._status].tolist()
+
+        est = fields["plant_flow"]
+        div = fields["overflow_diverted"]
+        oid, olat, olon = layout.overflow
+        plat, plon = layout.plant
+        return {
+            "sensors": [(sid, lat, lon, flow, "ALERT" if alert else "NORMAL")
+                        for (sid, lat, lon), flow, alert in zip(layout.sensors, flows, status)],
+            "overflow": (oid, olat, olon, bool(fields["overflow_active"]), div),
+            "plant": (plat, plon, est),
+            "point": (datetime.fromtimestamp(fields["timestamp"]), est, div) if fields["timestamp"] else None,
+            "plant_params": {
+                "nominal": fields["nominal"],
+                "warning": fields["warning"],
+                "hydraulic": fields["hydraulic"],
+            },
+            "rain": {"intensity": fields["rain_intensity"], "depth": fields["rain_depth"]},
+            "connections": [(start, end, flows[i] if i >= 0 else 0.0) for start, end, i in layout.connections],
+            "extra_points": layout.extra_points,
+            "max_capacity": fields["max_capacity"],
+            "running": bool(fields["running"]),
+            "hour": int(fields["hour"]),
+            "max_hours": int(fields["max_hours"]),
+        }
+
+
+# === STEROWANIE Z OKIEN ===
+class SharedControls:
+    """Słownikowy widok na pola CONTROL_FIELDS (pojedyncze zapisy float – bez blokad)."""
+
+    def __init__(self, values):
+        self._values = values
+        self._index = {name: i for i, name in enumerate(CONTROL_FIELDS)}
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __getitem__(self, key):
+        value = float(self._values[self._index[key]])
+        return bool(value) if key == "reset_cmd" else value
+
+    def __setitem__(self, key, value):
+        self._values[self._index[key]] = float(value)
+
+    def get(self, key, default=None):
+        """Wartość pola albo default, gdy pola nie ma lub nie zostało jeszcze ustawione (NaN)."""
+        if key not in self._index:
+            return default
+        value = self[key]
+        return default if value != value else value
+
+
+# === WIDOK DLA FUNKCJI RYSUJĄCYCH ===
+class DashboardView:
+    """
+    Zastępuje shared dict w draw_map / draw_control_bar / handle_ui_click:
+    stan symulacji z kanału, sterowanie w pamięci współdzielonej, reszta (np. map_scale,
+    map_offset) lokalnie w procesie okna.
+    """
+
+    def __init__(self, channel, local=None):
+        self.channel = channel
+        self.local = dict(local or {})
+        self.state = channel.read()
+
+    def refresh(self):
+        self.state = self.channel.read()
+        return self
+
+    def __contains__(self, key):
+        return key in self.local or key in self.channel.controls or key in self.state
+
+    def __getitem__(self, key):
+        if key in self.local:
+            return self.local[key]
+        if key in self.channel.controls:
+            return self.channel.controls[key]
+        return self.state[key]
+
+    def __setitem__(self, key, value):
+        if key in self.channel.controls:
+            self.channel.controls[key] = value
+        else:
+            self.local[key] = value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
@@ -1,85 +1,30 @@
 import threading
-from typing import Dict
-import pandas as pd
 import time
 
 
 # ====== Wątek symulacji ======
 class SimulationThread(threading.Thread):
-    def __init__(self, model_factory_fn, interval: float, shared: Dict, lock: threading.Lock,
-                 stop_evt: threading.Event, pause_evt: threading.Event):
+    def __init__(self, model_factory_fn, interval: float, channel, stop_evt, pause_evt, model=None,
+                 recorder=None):
         super().__init__(daemon=True)
         # Fabryka nie instancja, żeby działał reset
         self.model_factory = model_factory_fn
-        self.model = self.model_factory()
+        self.model = model if model is not None else self.model_factory()
 
         self.default_interval = interval
-        self.shared = shared
-        self.lock = lock
+        # stan dla okien idzie przez pamięć współdzieloną (visualisation.shared_state.SnapshotChannel)
+        self.channel = channel
+        self.controls = channel.controls
         self.stop_evt = stop_evt
         self.pause_evt = pause_evt
+        # opcjonalny zapis każdego stanu do pliku (visualisation.replay.SnapshotLogWriter)
+        self.recorder = recorder
 
     def _update_shared_state(self):
         """Pomocnicza funkcja do zrzutu stanu, używana w pętli i po resecie"""
-        est = getattr(self.model.plant, 'estimated_flow', 0.0)
-        div = getattr(self.model.overflow_point, 'diverted_flow', 0.0)
-
-        active_ids = set()
-        loc_map = {}
-        for s in self.model.sensors.values():
-            loc_map[s.location_id] = s.location
-            active_ids.add(s.location_id)
-
-        loc_map["KP26"] = self.model.overflow_point.location
-        active_ids.add("KP26")
-        active_ids.add(self.model.overflow_point.location_id)
-        loc_map["Oczyszczalnia"] = self.model.plant.location
-        active_ids.add("Oczyszczalnia")
-
-        extra_points = []
-        if hasattr(self.model, "coords") and self.model.coords:
-            for pid, coord in self.model.coords.items():
-                if pid not in active_ids:
-                    lat = coord.get('lat')
-                    lon = coord.get('lon')
-                    if lat and lon: extra_points.append((pid, lat, lon))
-
-        connections = []
-        for src, targets in self.model.graph.items():
-            if src in loc_map:
-                src_loc = loc_map[src]
-                src_flow = 0.0
-                if src in self.model.sensors: src_flow = self.model.sensors[src].current_flow
-                for tgt in targets:
-                    if tgt in loc_map: connections.append((src_loc, loc_map[tgt], src_flow))
-
-        snapshot = {
-            "sensors": [(s.location_id, s.location[0], s.location[1], getattr(s, 'current_flow', 0.0),
-                         getattr(s, 'status', 'NORMAL')) for s in self.model.sensors.values()],
-            "overflow": (self.model.overflow_point.location_id, self.model.overflow_point.location[0],
-                         self.model.overflow_point.location[1], getattr(self.model.overflow_point, 'active', False),
-                         getattr(self.model.overflow_point, 'diverted_flow', 0.0)),
-            "plant": (self.model.plant.location[0], self.model.plant.location[1],
-                      getattr(self.model.plant, 'estimated_flow', 0.0)),
-            "point": (pd.Timestamp.now().to_pydatetime(), est, div),
-            "plant_params": {
-                "nominal": getattr(self.model, "nominal_capacity", 1700),
-                "warning": getattr(self.model, "warning_threshold", 2000),
-                "hydraulic": getattr(self.model, "hydraulic_capacity", 2200)
-            },
-            "rain": {
-                "intensity": self.model.current_rain_intensity,
-                "depth": self.model.current_rain_depth
-            },
-            "connections": connections,
-            "extra_points": extra_points,
-            "max_capacity": self.model.max_capacity,
-            "running": self.model.running,
-            "hour": self.model.current_hour,
-            "max_hours": self.model.max_hours
-        }
-        with self.lock:
-            self.shared.update(snapshot)
+        self.channel.publish(self.model)
+        if self.recorder is not None:
+            self.recorder.append(self.channel.state_record())
 
     def run(self):
         print("[SIM] start")
@@ -89,10 +34,10 @@ class SimulationThread(threading.Thread):
         try:
             while not self.stop_evt.is_set():
                 # 1. Obsługa RESETU
-                if self.shared.get("reset_cmd", False):
+                if self.controls["reset_cmd"]:
                     print("[SIM] RESETOWANIE MODELU...")
                     self.model = self.model_factory()  # Tworzenie nowy, czysty model
-                    self.shared["reset_cmd"] = False  # Kasowanie flagi
+                    self.controls["reset_cmd"] = False  # Kasowanie flagi
                     self.pause_evt.set()  # Pauza po resecie
 
                     # Czyszczenie historii
@@ -112,7 +57,10 @@ class SimulationThread(threading.Thread):
 
                 # 3. Dynamiczne opóźnienie (prędkość)
                 # Pobieramy interwał z shared (ustawiany suwakiem) lub domyślny
-                current_interval = self.shared.get("sim_interval", self.default_interval)
+                # jawne 0 (bez przerw) jest poprawną wartością – domyślny tylko, gdy pola nie ustawiono
+                current_interval = self.controls.get("sim_interval")
+                if current_interval is None:
+                    current_interval = self.default_interval
                 time.sleep(current_interval)
 
         except Exception as e:
@@ -120,4 +68,6 @@ class SimulationThread(threading.Thread):
             import traceback
             traceback.print_exc()
         finally:
+            if self.recorder is not None:
+                self.recorder.close()
             print("[SIM] stop")
\ No newline at end of file